@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+
+## Runs the checks of check_migrations, check_upload and check_imported in a single process.
+## Each check runs when its scan interval has passed, and the migration and upload checks also
+## run as soon as a migration record changes or a job finishes, so that queued sites start
+## without waiting for the next scan.
+
+import os
+import argparse
+import time
+import logging
+
+from pathlib import Path
+from functools import partial
+
+import config.config
+import config.logging_config
+import lib.local_auth
+import lib.db
+import lib.sakai
+
+import check_imported as imported
+
+from lib.utils import process_check
+from lib.workers import preload
+from lib.d2l import d2l_api_version
+from check_migrations import check_migrations
+from check_upload import check_upload
+
+def main():
+    APP = config.config.APP
+    parser = argparse.ArgumentParser(description="This runs the migration, upload and import checks in a single process.",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('-p', '--preload', action='store_true', help="Fork jobs from this process instead of starting a new python3 process for each site")
+    args = vars(parser.parse_args())
+    APP['debug'] = APP['debug'] or args['debug']
+    APP['preload_jobs'] = APP['preload_jobs'] or args['preload']
+
+    if APP['debug']:
+        config.logging_config.logger.setLevel(logging.DEBUG)
+
+    tick = APP['scan_interval']['scheduler']
+    exit_flag_file = APP['exit_flag']['scheduler']
+
+    # Migration database
+    mdb = lib.db.MigrationDb(APP)
+
+    # Sakai webservices
+    sakai_ws = lib.sakai.Sakai(APP)
+    sakai_version = sakai_ws.config("version.sakai")
+    logging.info(f"Sakai at {sakai_ws.url()} version is version {sakai_version}")
+
+    # Brightspace webservices
+    base_url = APP['brightspace_api']['base_url']
+    le_version = d2l_api_version(APP, "le")
+    lp_version = d2l_api_version(APP, "lp")
+    logging.info(f"Brightspace at {base_url} has API versions le:{le_version} lp:{lp_version}")
+
+    if APP['preload_jobs']:
+        for job_type in ['workflow', 'upload', 'update']:
+            preload(APP, job_type)
+
+    # check, scan interval, run when records change
+    checks = {
+        'workflow': (partial(check_migrations, APP, pause=False), APP['scan_interval']['workflow'], True),
+        'upload': (partial(check_upload, APP), APP['scan_interval']['upload'], True),
+        'import': (partial(imported.check_imported, APP, sakai_ws), APP['scan_interval']['import'], False),
+    }
+
+    logging.info(f"Checking for changes every {tick} seconds until {Path(exit_flag_file).name} exists")
+
+    process_list = []
+    last_checked = {name: 0 for name in checks}
+    watermark = None
+
+    while not os.path.exists(exit_flag_file):
+
+        finished = process_check(process_list)
+
+        # One query to see if anything changed since the last tick
+        current = mdb.get_watermark()
+        changed = (current is None) or (current != watermark) or len(finished) > 0
+        watermark = current
+
+        for (name, (check, interval, on_change)) in checks.items():
+            if (on_change and changed) or (time.time() - last_checked[name] >= interval):
+                last_checked[name] = time.time()
+                try:
+                    check(process_list)
+                except Exception:
+                    logging.exception(f"Error in {name} check")
+
+        time.sleep(tick)
+
+    os.remove(exit_flag_file)
+    logging.info("Done")
+
+if __name__ == '__main__':
+    main()
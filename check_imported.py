@@ -15,7 +15,6 @@ from pathlib import Path
 from stat import S_ISREG
 from pymysql.cursors import DictCursor
 from datetime import datetime, timedelta
-from subprocess import Popen, DEVNULL
 
 import config.config
 import config.logging_config
@@ -24,9 +23,13 @@ import lib.db
 import lib.sakai
 
 from lib.utils import send_template_email, process_check
+from lib.workers import start_job, preload
 from lib.jira_rest import create_jira
 from lib.d2l import middleware_d2l_api, d2l_api_version, web_login, get_import_history, get_first_import_status, get_first_import_job_log
 
+# Brightspace web session, renewed every 30 minutes
+brightspace_last_login = None
+brightspace_session = None
 
 def update_import_id(APP, db_config, link_id, site_id, org_unit_id, log):
 
@@ -172,12 +175,8 @@ def check_for_update(APP, mdb, link_id, site_id, started_by, notification, searc
         if (refsite_id > 0) and ('status' in import_status) and (import_status['status'] == "Complete"):
             mdb.set_to_state(link_id, site_id, "updating")
 
-            cmd = "python3 {}/run_update.py {} {}".format(APP['script_folder'], link_id, site_id).split()
-            if APP['debug']:
-                cmd.append("-d")
-
             # async
-            p = Popen(cmd, stdout=DEVNULL, stderr=DEVNULL)
+            p = start_job(APP, 'update', link_id, site_id, APP['debug'])
             logging.info("Import completed: starting PID[{}] for {} : {} ({})".format(p.pid, link_id, site_id, title))
             return p
 
@@ -334,8 +333,10 @@ def main():
     parser = argparse.ArgumentParser(description="This runs periodically - start workflow on sites that have been imported and need to be updated.",
                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('-p', '--preload', action='store_true', help="Fork jobs from this process instead of starting a new python3 process for each site")
     args = vars(parser.parse_args())
     APP['debug'] = APP['debug'] or args['debug']
+    APP['preload_jobs'] = APP['preload_jobs'] or args['preload']
 
     if APP['debug']:
         config.logging_config.logger.setLevel(logging.DEBUG)
@@ -360,6 +361,9 @@ def main():
 
     logging.info(f"Scanning for new imports every {scan_interval} seconds until {Path(exit_flag_file).name} exists")
 
+    if APP['preload_jobs']:
+        preload(APP, 'update')
+
     process_list = []
 
     while not os.path.exists(exit_flag_file):
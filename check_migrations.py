@@ -8,7 +8,6 @@ import time
 import logging
 
 from datetime import timedelta
-from subprocess import Popen, DEVNULL
 from pathlib import Path
 
 import config.config
@@ -17,8 +16,12 @@ import lib.local_auth
 import lib.db
 
 from lib.utils import process_check
+from lib.workers import start_job, preload
+from lib.admission import get_admission
+from lib.checkpoint import has_checkpoint
 
-def check_migrations(APP, process_list):
+# pause: wait between starting jobs, and when no more jobs can start
+def check_migrations(APP, process_list, pause = True):
 
     logging.debug("Checking form migration records")
 
@@ -39,16 +42,21 @@ def check_migrations(APP, process_list):
 
     if (active_exports >= max_jobs):
         logging.debug("Too many exports running - pausing")
-        time.sleep(30)
+        if pause:
+            time.sleep(30)
         return
 
     if (active_workflows >= max_workflows):
         logging.debug("Too many workflows running - pausing")
-        time.sleep(30)
+        if pause:
+            time.sleep(30)
         return
 
     started = 0
 
+    # Resource budgets (optional)
+    admission = get_admission(APP, mdb) if want_to_migrate else None
+
     for site in want_to_migrate:
 
         if (active_exports + started) >= max_jobs:
@@ -57,6 +65,10 @@ def check_migrations(APP, process_list):
         if (active_workflows + started) >= max_workflows:
             break
 
+        # Try the next site, which may be smaller
+        if admission and not admission.admit('workflow', site):
+            continue
+
         started += 1
         site_id = site['site_id']
         link_id = site['link_id']
@@ -66,17 +78,18 @@ def check_migrations(APP, process_list):
             if (not mdb.another_running(link_id, site_id)):
                 mdb.set_running(link_id, site_id)
 
-                logging.info(f"migration started for {site_id} from {link_id}")
+                # A site queued again after its workflow failed continues from the checkpoint, if the
+                # archive is unchanged
+                resume = APP['workflow']['resume_retries'] and has_checkpoint(APP, site_id)
 
-                cmd = "python3 {}/run_workflow.py {} {}".format(APP['script_folder'],site['link_id'],site['site_id']).split()
-                # if APP['debug']:
-                #     cmd.append("-d")
+                logging.info(f"migration {'resumed' if resume else 'started'} for {site_id} from {link_id}")
 
-                p = Popen(cmd, stderr=DEVNULL, stdout=DEVNULL)
+                p = start_job(APP, 'workflow', site['link_id'], site['site_id'], resume=resume)
                 process_list.append(p)
                 logging.info("\tRunning PID[{}] {} : {}".format(p.pid, site['link_id'],site['site_id']))
 
-                time.sleep(5)
+                if pause:
+                    time.sleep(5)
             else:
                 logging.info(f"Migration for {site_id} from {link_id} queued, but another task is running for this site")
 
@@ -90,8 +103,10 @@ def main():
     parser = argparse.ArgumentParser(description="This runs periodically - start workflow on sites that want to migrate.",
                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('-p', '--preload', action='store_true', help="Fork jobs from this process instead of starting a new python3 process for each site")
     args = vars(parser.parse_args())
     APP['debug'] = APP['debug'] or args['debug']
+    APP['preload_jobs'] = APP['preload_jobs'] or args['preload']
 
     if APP['debug']:
         config.logging_config.logger.setLevel(logging.DEBUG)
@@ -101,6 +116,9 @@ def main():
 
     logging.info(f"Scanning for new migrations every {scan_interval} seconds until {Path(exit_flag_file).name} exists")
 
+    if APP['preload_jobs']:
+        preload(APP, 'workflow')
+
     process_list = []
 
     while not os.path.exists(exit_flag_file):
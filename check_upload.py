@@ -11,7 +11,6 @@ import pymysql
 
 from pathlib import Path
 from datetime import datetime, timedelta
-from subprocess import Popen, DEVNULL
 from pymysql.cursors import DictCursor
 
 import config.config
@@ -20,6 +19,8 @@ import lib.local_auth
 import lib.db
 
 from lib.utils import send_template_email, process_check
+from lib.workers import start_job, preload
+from lib.admission import get_admission
 from lib.jira_rest import create_jira
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -65,12 +66,8 @@ def upload(APP, mdb, link_id, site_id, title):
     try:
         mdb.set_to_state(link_id, site_id, "uploading")
 
-        cmd = "python3 {}/run_upload.py {} {}".format(APP['script_folder'], link_id, site_id).split()
-        if APP['debug']:
-            cmd.append("-d")
-
         # async
-        p = Popen(cmd, stdout=DEVNULL, stderr=DEVNULL)
+        p = start_job(APP, 'upload', link_id, site_id, APP['debug'])
         logging.info("Upload : starting PID[{}] for {} : {} ({})".format(p.pid, link_id, site_id, title))
 
         return p
@@ -129,6 +126,9 @@ def check_upload(APP, process_list):
         logging.debug("----- No sites to upload")
         return
 
+    # Resource budgets (optional)
+    admission = get_admission(APP, mdb)
+
     for site in want_to_process:
 
         active_imports = mdb.get_state_count('importing')
@@ -145,6 +145,10 @@ def check_upload(APP, process_list):
                 logging.warning(f"Skipping {site_id} {site_title} - missing files and/or workflow")
                 continue
 
+            # Try the next site, which may be smaller
+            if admission and not admission.admit('upload', site):
+                continue
+
             logging.info(f"Upload for '{site_title}' {site_id}")
 
             # run upload workflow
@@ -162,8 +166,10 @@ def main():
     parser = argparse.ArgumentParser(description="This runs periodically - start workflow on sites that need to be uploaded.",
                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('-p', '--preload', action='store_true', help="Fork jobs from this process instead of starting a new python3 process for each site")
     args = vars(parser.parse_args())
     APP['debug'] = APP['debug'] or args['debug']
+    APP['preload_jobs'] = APP['preload_jobs'] or args['preload']
 
     if APP['debug']:
         config.logging_config.logger.setLevel(logging.DEBUG)
@@ -173,6 +179,9 @@ def main():
 
     logging.info(f"Scanning for new uploads every {scan_interval} seconds until {Path(exit_flag_file).name} exists")
 
+    if APP['preload_jobs']:
+        preload(APP, 'upload')
+
     process_list = []
 
     while not os.path.exists(exit_flag_file):
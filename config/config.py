@@ -46,6 +46,12 @@ APP = {
   # Temporary logs for workflows and operations
   'log_folder' : Path(SCRIPT_FOLDER) / 'log',
 
+  # Performance metrics for each workflow step (see utils/step_metrics.py)
+  'metrics': {
+    'enabled': True,
+    'file': Path(SCRIPT_FOLDER) / 'metrics' / 'steps.jsonl',
+  },
+
   # test / production
   'environment': 'production',
   'script_folder' : SCRIPT_FOLDER,
@@ -71,13 +77,20 @@ APP = {
   'scan_interval' : {
     'workflow' : 5,
     'upload' : 10,
-    'import' : 30
+    'import' : 30,
+    # check_all.py: check for changed records every second
+    'scheduler' : 1
   },
 
+  # Fork workflow, upload and update jobs from the scan scripts, which preload the workflow code,
+  # instead of starting a new python3 process for each site (or use --preload)
+  'preload_jobs' : False,
+
   'exit_flag' : {
     'workflow' : Path(SCRIPT_FOLDER) / 'workflow.exit',
     'upload' : Path(SCRIPT_FOLDER) / 'upload.exit',
     'import' : Path(SCRIPT_FOLDER) / 'import.exit',
+    'scheduler' : Path(SCRIPT_FOLDER) / 'scheduler.exit',
   },
 
   # Create migration failure issues in this JIRA project.
@@ -101,7 +114,9 @@ APP = {
   'content': {
     'mime-types': Path(SCRIPT_FOLDER) / 'config' / 'mime_types.yaml',
     'restricted-ext': Path(SCRIPT_FOLDER) / 'config' / 'restricted_ext.yaml',
-    'max_files' : 5000
+    'max_files' : 5000,
+    # Remove Resources files which aren't referenced from any other tool (content_remove_orphans)
+    'remove_orphans' : False
   },
 
   'email': {
@@ -163,6 +178,24 @@ APP = {
   # Max workflows to run concurrently
   'workflow': {
         'max_jobs': 30,
+        # Processes for running independent steps of a workflow concurrently (1 = run steps in order)
+        'step_workers': 4,
+        # Continue a failed workflow from its last checkpoint, without archiving the site again,
+        # if the checkpoint is less than this many hours old and the archive is unchanged (0 = only with --resume).
+        # Off by default: a site fixed in Sakai after a failure needs a new archive.
+        'resume_hours': 0,
+        # check_migrations: continue the workflow of a site queued again after a failure from its checkpoint
+        # (as --resume). Delete log/<site_id>_checkpoint.json to archive the site again instead.
+        'resume_retries': True,
+        # Restore the archive files changed by a step which fails, from the workflow snapshot (lib/snapshot.py)
+        'rollback_failed': True,
+  },
+
+  # xml_valid: processes for checking the archive XML files, and whether to build the full tree for each
+  # file (otherwise only check that it is well-formed). Unchanged files are only checked once per site.
+  'xml_valid': {
+        'workers': 4,
+        'full_parse': False,
   },
 
   # Max jobs to run concurrently for site archiving
@@ -172,6 +205,34 @@ APP = {
         'limit': 35000000000
   },
 
+  # Start workflows and uploads only while the estimated resource use of running jobs fits in these budgets
+  # (cpu: cores, memory: GB, disk: GB, bandwidth: MB/s). Job costs are estimated from the site size,
+  # as base + per_gb * size in GB. The max_jobs limits still apply.
+  'admission': {
+      'enabled': False,
+      'budget': {'cpu': 16, 'memory': 48, 'disk': 1000, 'bandwidth': 100},
+      'cost': {
+          'workflow': {
+              'cpu': {'base': 1, 'per_gb': 0.5},
+              'memory': {'base': 1, 'per_gb': 0.5},
+              'disk': {'base': 0.1, 'per_gb': 2.5},
+              'bandwidth': {'base': 5, 'per_gb': 2},
+          },
+          'upload': {
+              'cpu': {'base': 0.2, 'per_gb': 0},
+              'memory': {'base': 0.2, 'per_gb': 0},
+              'disk': {'base': 0, 'per_gb': 0},
+              'bandwidth': {'base': 10, 'per_gb': 5},
+          },
+          'update': {
+              'cpu': {'base': 0.5, 'per_gb': 0},
+              'memory': {'base': 0.5, 'per_gb': 0},
+              'disk': {'base': 0, 'per_gb': 0},
+              'bandwidth': {'base': 1, 'per_gb': 0},
+          },
+      }
+  },
+
   # Max jobs to allow in uploading and import states  before uploading new jobs,
   # import expiry time in minutes after upload (360 = 6 hours, 1440 = 24 hours)
   # limit for zip file size for package uploads in update workflow
@@ -230,7 +291,12 @@ APP = {
                        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
                        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'],
       'ext_to_link': ['pdf','ppt','xls','pptx','xlsx'],
-      'max_depth' : 5
+      'max_depth' : 5,
+      # processes for the HTML changes to Lessons text items (lib/htmltransforms.py) on large sites
+      'html_workers': 4,
+      # results of the HTML changes kept for repeat conversions of a site (lib/htmlcache.py), or None
+      'html_cache': Path(SCRIPT_FOLDER) / 'tmp' / 'lessons_html.db',
+      'html_cache_mb': 500
   },
 
   'qna': {
@@ -0,0 +1,118 @@
+# Admission of workflow and upload jobs by their estimated resource use, in addition to the max_jobs limits.
+#
+# The cost of a job for each resource is estimated from the size of the site:
+#   cost = base + per_gb * size in GB
+# and a job is started if the costs of the running jobs and the new job fit in the budgets
+# configured in APP['admission'] (cpu: cores, memory: GB, disk: GB, bandwidth: MB/s).
+
+import os
+import sys
+import shutil
+import logging
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import lib.sakai
+
+from lib.utils import format_bytes
+
+GB = 1024 ** 3
+
+# Job type for the records in each state which use local resources
+RUNNING_STATES = {
+    'exporting': 'workflow',
+    'running': 'workflow',
+    'uploading': 'upload',
+    'updating': 'update',
+}
+
+# Resources collection sizes by site id, looked up once per process
+site_sizes = {}
+sakai_ws = None
+
+# Size of a site in bytes: the zip file size once the workflow has created it,
+# otherwise the size of the site's Resources collection in Sakai
+def site_size(APP, site):
+
+    global sakai_ws
+
+    if site.get('zip_size'):
+        return int(site['zip_size'])
+
+    site_id = site['site_id']
+
+    if site_id not in site_sizes:
+        if sakai_ws is None:
+            sakai_ws = lib.sakai.Sakai(APP)
+
+        try:
+            site_sizes[site_id] = max(sakai_ws.get_site_collection_size(site_id), 0)
+        except Exception as e:
+            logging.warning(f"Could not get Resources size for {site_id}: {e}")
+            return 0
+
+    return site_sizes[site_id]
+
+def job_cost(APP, job_type, size):
+    costs = APP['admission']['cost'][job_type]
+    return {resource: cost['base'] + cost['per_gb'] * size / GB for (resource, cost) in costs.items()}
+
+# Resources used by the running jobs, and the jobs admitted while checking a queue
+class Admission:
+
+    def __init__(self, APP, running_sites):
+        self.APP = APP
+        self.budget = APP['admission']['budget']
+        self.used = {resource: 0 for resource in self.budget}
+        self.jobs = 0
+
+        for site in running_sites:
+            self.add(job_cost(APP, RUNNING_STATES[site['state']], site_size(APP, site)))
+
+    def add(self, cost):
+        for resource in self.used:
+            self.used[resource] += cost.get(resource, 0)
+
+        self.jobs += 1
+
+    def fits(self, cost):
+
+        for resource in self.budget:
+            if self.used[resource] + cost.get(resource, 0) > self.budget[resource]:
+                return False
+
+        # Space for the archive and zip files
+        if 'disk' in cost:
+            free_gb = shutil.disk_usage(self.APP['archive_folder']).free / GB
+            if cost['disk'] > free_gb:
+                return False
+
+        return True
+
+    # Admit a job if its estimated cost fits in the budgets. A job bigger than the budgets
+    # is admitted when nothing else is running, so that large sites still run eventually.
+    def admit(self, job_type, site):
+
+        size = site_size(self.APP, site)
+        cost = job_cost(self.APP, job_type, size)
+
+        if self.jobs > 0 and not self.fits(cost):
+            logging.info(f"Not starting {job_type} for {site['site_id']} ({format_bytes(size)}) - over resource budget")
+            return False
+
+        self.add(cost)
+        return True
+
+# Admission for the running jobs in the migration database, or None if admission control is disabled
+def get_admission(APP, mdb):
+
+    if not APP['admission']['enabled']:
+        return None
+
+    running_sites = []
+    for state in RUNNING_STATES:
+        running_sites.extend(mdb.get_records(state=state))
+
+    return Admission(APP, running_sites)
@@ -0,0 +1,210 @@
+# Classes and functions for working with a site archive folder
+
+import os
+import sys
+import logging
+import lxml.etree as ET
+
+from fnmatch import fnmatch
+from contextlib import contextmanager
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.utils import remove_unwanted_characters
+from lib.textrules import TextRules
+from lib.htmltransforms import HtmlTransforms
+from lib.htmlcache import HtmlCache
+from lib.lessons import LessonsDocument
+from lib.snapshot import write_tree
+
+LESSONS = 'lessonbuilder.xml'
+
+# A workflow session over the XML files in a site archive.
+# Files are parsed with lxml the first time a step asks for them, and steps that opt in
+# (use_archive in workflow.yaml) edit the trees in memory. Changed files are written
+# back once, when the runner flushes the session.
+class SiteArchive:
+
+    def __init__(self, APP, SITE_ID):
+        self.site_id = SITE_ID
+        self.folder = r'{}{}-archive/'.format(APP['archive_folder'], SITE_ID)
+        self.trees = {}
+        self.dirty = set()
+        self.text_rules = TextRules()
+        self.lessons_transforms = HtmlTransforms()
+        self.html_workers = APP.get('lessons', {}).get('html_workers', 1)
+        self.html_cache = APP.get('lessons', {}).get('html_cache')
+        self.html_cache_mb = APP.get('lessons', {}).get('html_cache_mb', 500)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def exists(self, name):
+        return name in self.trees or os.path.exists(self.path(name))
+
+    def is_loaded(self, name):
+        return name in self.trees
+
+    # Names of all the XML files in the archive, including qti/
+    def xml_files(self):
+
+        names = sorted(entry.name for entry in os.scandir(self.folder) if entry.name.endswith('.xml'))
+
+        qti_folder = self.path('qti')
+        if os.path.isdir(qti_folder):
+            names += sorted(f'qti/{entry.name}' for entry in os.scandir(qti_folder) if entry.name.endswith('.xml'))
+
+        return names
+
+    # Parsed tree for an archive file, e.g. 'lessonbuilder.xml' or 'qti/assessment123.xml'
+    # sanitize: run remove_unwanted_characters on the file before it is first parsed
+    def tree(self, name, sanitize = False):
+
+        if name == LESSONS and len(self.lessons_transforms):
+            self.apply_lessons_transforms()
+
+        return self._load(name, sanitize)
+
+    def _load(self, name, sanitize):
+
+        if len(self.text_rules):
+            self.apply_text_rules()
+
+        if name not in self.trees:
+            xml_src = self.path(name)
+
+            if not os.path.exists(xml_src):
+                raise Exception(f"Archive file {xml_src} not found")
+
+            if sanitize:
+                remove_unwanted_characters(xml_src)
+
+            self.trees[name] = ET.parse(xml_src)
+
+        return self.trees[name]
+
+    def root(self, name, sanitize = False):
+        return self.tree(name, sanitize).getroot()
+
+    # Mark a file as modified so that it is written on the next flush
+    def changed(self, name):
+        if name not in self.trees:
+            raise Exception(f"Archive file {name} has not been loaded")
+
+        self.dirty.add(name)
+
+    # The previous version of the file is kept in the running step's snapshot (lib/snapshot.py)
+    def write(self, name):
+        write_tree(self.trees[name], self.path(name), encoding='utf-8', xml_declaration=True)
+        self.dirty.discard(name)
+        logging.debug(f"Archive session wrote {name}")
+
+    # Changes which haven't been written to the archive files yet
+    def pending(self):
+        return len(self.dirty) > 0 or len(self.text_rules) > 0 or len(self.lessons_transforms) > 0
+
+    # Whether files matching the patterns (e.g. 'qti/*') may have changes which haven't been written yet
+    def is_pending(self, patterns):
+
+        names = self.dirty | ({LESSONS} if len(self.lessons_transforms) else set())
+        return len(self.text_rules) > 0 or any(fnmatch(name, p) for name in names for p in patterns)
+
+    # Add text rules (lib/textrules.py) to apply to all the archive XML files. Rules from consecutive
+    # steps are applied together, in one pass over the files, on the next flush or when a file is loaded.
+    def rewrite_text(self, rules):
+        self.apply_lessons_transforms()
+        self.text_rules.extend(rules)
+
+    # Add HTML transforms (lib/htmltransforms.py) for the text items in lessonbuilder.xml. Transforms from
+    # consecutive steps are applied together, with one parse of each item's HTML, on the next flush or
+    # when the file is used by a step which isn't a transform.
+    # sanitize: as for tree(), if the file hasn't been loaded yet
+    def transform_lessons(self, transforms, sanitize = False):
+
+        # Changes from earlier steps are applied first
+        self._load(LESSONS, sanitize)
+        self.lessons_transforms.extend(transforms)
+
+    def apply_lessons_transforms(self):
+
+        if not len(self.lessons_transforms):
+            return
+
+        (transforms, self.lessons_transforms) = (self.lessons_transforms, HtmlTransforms())
+
+        lessons = LessonsDocument(self._load(LESSONS, False))
+        if lessons.root.tag == 'archive':
+            cache = HtmlCache.open(self.html_cache, self.html_cache_mb)
+            try:
+                transforms.apply(lessons, workers = self.html_workers, cache = cache)
+            finally:
+                if cache is not None:
+                    cache.close()
+
+            self.changed(LESSONS)
+
+    # Returns the number of files changed
+    def apply_text_rules(self):
+
+        if not len(self.text_rules):
+            return 0
+
+        # The rules apply to the files as changed so far
+        for name in sorted(self.dirty):
+            self.write(name)
+
+        changed = self.text_rules.apply(self.folder, self.xml_files())
+        self.text_rules = TextRules()
+
+        # Re-read changed files when next used
+        for name in changed:
+            self.trees.pop(name, None)
+
+        return len(changed)
+
+    # Write modified files back to the archive folder
+    def flush(self):
+
+        self.apply_lessons_transforms()
+
+        flushed = len(self.dirty)
+        for name in sorted(self.dirty):
+            self.write(name)
+
+        return flushed + self.apply_text_rules()
+
+    # Write out and drop the trees for files matching the given patterns (e.g. 'qti/*'),
+    # so that another process can work on those files
+    def release(self, patterns):
+
+        self.apply_lessons_transforms()
+        self.apply_text_rules()
+
+        for name in [name for name in self.trees if any(fnmatch(name, p) for p in patterns)]:
+            if name in self.dirty:
+                self.write(name)
+
+            del self.trees[name]
+
+    # Flush and drop all parsed trees, so that the next access re-reads the files on disk.
+    # Used before steps which read or write the archive files directly.
+    def reset(self):
+        flushed = self.flush()
+        self.trees.clear()
+
+        return flushed
+
+# Use the workflow's shared session if there is one, otherwise a private session
+# which is flushed when the step completes (e.g. when a step is run from the command line).
+@contextmanager
+def site_archive(APP, SITE_ID, archive = None):
+
+    if archive is not None:
+        yield archive
+        return
+
+    session = SiteArchive(APP, SITE_ID)
+    yield session
+    session.flush()
@@ -0,0 +1,141 @@
+# Checkpoints for resuming a failed workflow on the existing site archive
+
+import os
+import sys
+import json
+import hashlib
+import logging
+
+from pathlib import Path
+from datetime import datetime
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+def file_hash(path):
+
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+# Size, modification time and hash of the XML files in a site archive folder: {name: {size, mtime, sha1}}.
+# Files with the same size and modification time as in known (from an earlier call) aren't read again.
+def archive_files(archive_folder, known = None):
+
+    known = known or {}
+    folder = Path(archive_folder)
+    files = {}
+
+    for xml_file in sorted(folder.rglob('*.xml')):
+        name = str(xml_file.relative_to(folder))
+        stat = xml_file.stat()
+        last = known.get(name, {})
+
+        if last.get('size') == stat.st_size and last.get('mtime') == stat.st_mtime_ns:
+            files[name] = last
+        else:
+            files[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': file_hash(xml_file)}
+
+    return files
+
+# Hash of the names and hashes from archive_files
+def files_hash(files):
+
+    sha = hashlib.sha1()
+    for (name, record) in files.items():
+        sha.update(name.encode('utf-8'))
+        sha.update(record['sha1'].encode('utf-8'))
+
+    return sha.hexdigest()
+
+# Hash of the XML files in a site archive folder (names and content)
+def archive_hash(archive_folder, known = None):
+    return files_hash(archive_files(archive_folder, known))
+
+# The steps completed by a workflow run, saved to the log folder as {site_id}_checkpoint.json.
+def checkpoint_file(APP, SITE_ID):
+    return Path(APP['log_folder']) / f'{SITE_ID}_checkpoint.json'
+
+# Whether a workflow for the site stopped without completing (the checkpoint is removed when it completes)
+def has_checkpoint(APP, SITE_ID):
+    return checkpoint_file(APP, SITE_ID).exists()
+
+# A checkpoint is only valid while the archive XML files are unchanged since it was saved. Files are only
+# hashed again if their size or modification time has changed since the last save.
+class WorkflowCheckpoint:
+
+    def __init__(self, APP, SITE_ID, steps):
+        self.site_id = SITE_ID
+        self.file = checkpoint_file(APP, SITE_ID)
+        self.archive_folder = r'{}{}-archive/'.format(APP['archive_folder'], SITE_ID)
+        self.actions = [step['action'] for step in steps]
+        self.completed = set()
+        self.data = {}
+
+    # Load the checkpoint of a previous run of the same workflow.
+    # max_hours: ignore checkpoints older than this (None for any age)
+    # Returns True if the run can continue from it.
+    def load(self, max_hours = None):
+
+        if not self.file.exists():
+            return False
+
+        try:
+            with open(self.file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.file}: {e}")
+            return False
+
+        if data.get('actions') != self.actions:
+            logging.info(f"Checkpoint for {self.site_id} is for a different workflow")
+            return False
+
+        age = datetime.now() - datetime.fromisoformat(data['saved_at'])
+        if max_hours is not None and age.total_seconds() > max_hours * 3600:
+            logging.info(f"Checkpoint for {self.site_id} is older than {max_hours} hours")
+            return False
+
+        if not os.path.exists(self.archive_folder) or archive_hash(self.archive_folder, data.get('archive_files')) != data['archive_hash']:
+            logging.info(f"Archive for {self.site_id} has changed since the checkpoint")
+            return False
+
+        self.data = data
+        self.completed = set(data['completed'])
+
+        return True
+
+    def get(self, key, default = None):
+        return self.data.get(key, default)
+
+    def is_completed(self, index):
+        return index in self.completed
+
+    # Record completed steps, with values to restore when resuming (new_id, state, output files)
+    def save(self, completed, **values):
+
+        self.completed = set(completed)
+        files = archive_files(self.archive_folder, self.data.get('archive_files'))
+
+        self.data.update(values)
+        self.data.update({
+            'actions': self.actions,
+            'completed': sorted(self.completed),
+            'archive_files': files,
+            'archive_hash': files_hash(files),
+            'saved_at': datetime.now().isoformat(timespec='seconds')
+        })
+
+        tmp_file = self.file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.data, f, indent=2)
+
+        os.replace(tmp_file, self.file)
+
+    def clear(self):
+        if self.file.exists():
+            os.remove(self.file)
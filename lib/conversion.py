@@ -16,6 +16,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 from lib.resources import get_resource_ids
+from lib.lessons import ItemType
 
 # A1 Lessons pages more than 3 levels
 #  in: site_folder
@@ -172,96 +173,44 @@ def lessons_question_correct(lessons_soup):
                 if answer['correct']:
                     return True
 
-# AMA-726 Flag highlighted links in Lessons html content (replaces a9)
-# data-type:link attribute is set by the workflow operation lessonbuilder_highlight_tools
-def lessons_hyperlinks(lessons_soup):
-    data = set()
-
-    items = lessons_soup.find_all("item", attrs={"type": "5"})
-    for item in items:
-        parsed_html = BeautifulSoup(item.attrs['html'], 'html.parser')
-        link = parsed_html.find(attrs={"data-type": "link"})
-        parent = lessons_soup.find_all('page', attrs={'pageid': item['pageId']})
-        if len(parent) > 0 and link:
-            title = parent[0]['title']
-            data.add(title)
-
-    if len(data) > 0:
-        return sorted(data)
-    else:
-        return None
+# Sorted titles of the Lessons pages with text items that match found(parsed html), or None
+def lessons_pages_with(lessons, found):
 
-# AMA-726 Flag highlighted tool names in Lessons html content
-# data-type:tool attribute is set by the workflow operation lessonbuilder_highlight_external_links
-def lessons_tools(lessons_soup):
-    data = set()
-
-    items = lessons_soup.find_all("item", attrs={"type": "5"})
-    for item in items:
-        parsed_html = BeautifulSoup(item.attrs['html'], 'html.parser')
-        tool = parsed_html.find("span", attrs={"data-type": "tool"})
-        parent = lessons_soup.find_all('page', attrs={'pageid': item['pageId']})
-        if len(parent) > 0 and tool:
-            title = parent[0]['title']
-            data.add(title)
-
-    if len(data) > 0:
-        return sorted(data)
-    else:
+    if lessons is None:
         return None
 
-# AMA-716 Flag embedded folder lists
-# data-type:folder-list attribute is set by the workflow operation lessonbuilder_merge_items
-def lessons_folder_list(lessons_soup):
     data = set()
 
-    items = lessons_soup.find_all("item", attrs={"type": "5"})
-    for item in items:
-        parsed_html = BeautifulSoup(item.attrs['html'], 'html.parser')
-        tool = parsed_html.find("div", attrs={"data-type": "folder-list"})
-        parent = lessons_soup.find_all('page', attrs={'pageid': item['pageId']})
-        if len(parent) > 0 and tool:
-            title = parent[0]['title']
-            data.add(title)
+    for item in lessons.items_of_type(ItemType.TEXT):
+        page = lessons.page(item.get('pageId'))
+        if page is not None and found(BeautifulSoup(item.get('html', ''), 'html.parser')):
+            data.add(page.get('title'))
 
     if len(data) > 0:
         return sorted(data)
     else:
         return None
 
-def lessons_embedded_content(lessons_soup):
-    data = set()
-
-    items = lessons_soup.find_all("item", attrs={"type": "5"})
-    for item in items:
-        parsed_html = BeautifulSoup(item.attrs['html'], 'html.parser')
-        tool = parsed_html.find("p", attrs={"data-type": "placeholder"})
-        parent = lessons_soup.find_all('page', attrs={'pageid': item['pageId']})
-        if len(parent) > 0 and tool:
-            title = parent[0]['title']
-            data.add(title)
+# AMA-726 Flag highlighted links in Lessons html content (replaces a9)
+# data-type:link attribute is set by the workflow operation lessonbuilder_highlight_tools
+def lessons_hyperlinks(lessons):
+    return lessons_pages_with(lessons, lambda html: html.find(attrs={"data-type": "link"}))
 
-    if len(data) > 0:
-        return sorted(data)
-    else:
-        return None
+# AMA-726 Flag highlighted tool names in Lessons html content
+# data-type:tool attribute is set by the workflow operation lessonbuilder_highlight_external_links
+def lessons_tools(lessons):
+    return lessons_pages_with(lessons, lambda html: html.find("span", attrs={"data-type": "tool"}))
 
-def lessons_missing_content(lessons_soup):
-    data = set()
+# AMA-716 Flag embedded folder lists
+# data-type:folder-list attribute is set by the workflow operation lessonbuilder_merge_items
+def lessons_folder_list(lessons):
+    return lessons_pages_with(lessons, lambda html: html.find("div", attrs={"data-type": "folder-list"}))
 
-    items = lessons_soup.find_all("item", attrs={"type": "5"})
-    for item in items:
-        parsed_html = BeautifulSoup(item.attrs['html'], 'html.parser')
-        tool = parsed_html.find("p", attrs={"data-type": "missing-content"})
-        parent = lessons_soup.find_all('page', attrs={'pageid': item['pageId']})
-        if len(parent) > 0 and tool:
-            title = parent[0]['title']
-            data.add(title)
+def lessons_embedded_content(lessons):
+    return lessons_pages_with(lessons, lambda html: html.find("p", attrs={"data-type": "placeholder"}))
 
-    if len(data) > 0:
-        return sorted(data)
-    else:
-        return None
+def lessons_missing_content(lessons):
+    return lessons_pages_with(lessons, lambda html: html.find("p", attrs={"data-type": "missing-content"}))
 
 # B1 Resources - Hidden folders and files
 #  in: content_soup
@@ -18,6 +18,9 @@ from lib.local_auth import getAuth
 
 class MigrationDb:
 
+    # Databases already validated by this process (inherited by forked jobs, see lib/workers.py)
+    validated = set()
+
     def __init__(self, APP):
 
         auth = getAuth(APP['auth']['db'], ['hostname', 'database', 'username', 'password'])
@@ -40,8 +43,13 @@ class MigrationDb:
             if opt_param in auth:
                 self.db_config[opt_param] = auth[opt_param]
 
-        if not self.validate_connection():
-            raise Exception(f"Unable to validate connection to mysql db: {auth['hostname']}:{auth['database']}:{auth['username']}")
+        db_key = (auth['hostname'], auth['database'], auth['username'])
+
+        if db_key not in MigrationDb.validated:
+            if not self.validate_connection():
+                raise Exception(f"Unable to validate connection to mysql db: {auth['hostname']}:{auth['database']}:{auth['username']}")
+
+            MigrationDb.validated.add(db_key)
 
 
     def validate_connection(self):
@@ -125,6 +133,22 @@ class MigrationDb:
                    (SELECT email FROM lti_user C WHERE C.user_id = A.started_by) AS started_by_email
                    FROM migration_site A WHERE {where} {order_sql} {limit_sql}""".rstrip() + ";"
 
+    # Latest change to the migration records, to check for changes without fetching the records
+    def get_watermark(self):
+        try:
+            connection = pymysql.connect(**self.db_config, cursorclass=DictCursor)
+            with connection:
+                with connection.cursor() as cursor:
+
+                    sql = """SELECT MAX(modified_at) as modified_at, COUNT(*) as records FROM migration_site;"""
+                    cursor.execute(sql)
+                    row = cursor.fetchone()
+                    return (row['modified_at'], row['records'])
+
+        except Exception as e:
+            logging.error(f"Could not retrieve migration watermark: {e}")
+            return None
+
     def get_state_count(self, state):
         try:
             connection = pymysql.connect(**self.db_config, cursorclass=DictCursor)
@@ -0,0 +1,120 @@
+# Persistent cache of the transformed HTML of Lessons text items
+#
+# A site is often converted more than once (a test conversion, the full conversion, retries after a
+# failure), with the same Lessons HTML each time. The result of a chain of HtmlTransforms
+# (lib/htmltransforms.py) for an item is kept in an SQLite database, keyed by a hash of the item's html,
+# its page title and the version of the chain, so that a repeat conversion only transforms the items
+# which have changed. The least recently used results are removed when the database grows past its
+# size limit.
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# Bump to ignore all the results cached so far, e.g. after upgrading a library the transforms use
+CACHE_VERSION = 1
+
+# Keys per query
+BATCH = 500
+
+class HtmlCache:
+
+    def __init__(self, path, max_mb = 500):
+        self.path = str(path)
+        self.max_size = max_mb * 1024 * 1024
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok = True)
+
+        # Conversions of other sites may be using the cache at the same time
+        self.db = sqlite3.connect(self.path, timeout = 60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS html "
+                        "(key TEXT PRIMARY KEY, html TEXT NOT NULL, changed TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS html_used ON html (used)")
+        self.db.commit()
+
+    # Returns a cache for the path, or None if there's no path or the database can't be opened
+    @staticmethod
+    def open(path, max_mb = 500):
+
+        if not path:
+            return None
+
+        try:
+            return HtmlCache(path, max_mb)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"\tHTML cache {path} not used: {e}")
+            return None
+
+    def close(self):
+        self.db.close()
+
+    # version: identifies the transforms (see HtmlTransforms.version)
+    @staticmethod
+    def key(version, html, title):
+        return hashlib.sha256(json.dumps([CACHE_VERSION, version, title, html]).encode('utf-8')).hexdigest()
+
+    # Returns {key: (html, changed)} for the keys which are in the cache, where changed says which of the
+    # transforms changed the item
+    def get(self, keys):
+
+        found = {}
+        keys = list(keys)
+
+        try:
+            for start in range(0, len(keys), BATCH):
+                batch = keys[start:start + BATCH]
+                rows = self.db.execute(f"SELECT key, html, changed FROM html WHERE key IN ({','.join('?' * len(batch))})", batch)
+                for (key, html, changed) in rows:
+                    found[key] = (html, json.loads(changed))
+
+            now = time.time()
+            self.db.executemany("UPDATE html SET used = ? WHERE key = ?", [(now, key) for key in found])
+            self.db.commit()
+
+        except sqlite3.Error as e:
+            logging.warning(f"\tHTML cache {self.path} not read: {e}")
+            return {}
+
+        return found
+
+    # Add results, as pairs of (key, (html, changed))
+    def put(self, results):
+
+        now = time.time()
+        rows = [(key, html, json.dumps(changed), len(html), now) for (key, (html, changed)) in results]
+
+        try:
+            self.db.executemany("INSERT OR REPLACE INTO html (key, html, changed, size, used) VALUES (?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+            self.evict()
+        except sqlite3.Error as e:
+            logging.warning(f"\tHTML cache {self.path} not updated: {e}")
+
+    # Remove the least recently used results if the cache is over its size limit, down to 90% of it.
+    # Returns the number removed.
+    def evict(self):
+
+        (size,) = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM html").fetchone()
+        if size <= self.max_size:
+            return 0
+
+        remove = []
+        for (key, item_size) in self.db.execute("SELECT key, size FROM html ORDER BY used"):
+            if size <= self.max_size * 0.9:
+                break
+            remove.append((key,))
+            size -= item_size
+
+        self.db.executemany("DELETE FROM html WHERE key = ?", remove)
+        self.db.commit()
+
+        logging.info(f"\tHTML cache: removed {len(remove)} result(s)")
+        return len(remove)
@@ -0,0 +1,190 @@
+# Transforms for the HTML of Lessons text items
+#
+# Steps which change the HTML of each text item in lessonbuilder.xml (e.g. lessonbuilder_add_css,
+# lessonbuilder_fix_headings) add their transform to an HtmlTransforms set. The transforms are applied
+# to each item in turn, in the order they were added: the item's HTML is parsed once, passed through the
+# transforms, and serialised once. Text transforms work on the serialised HTML instead, so the item is
+# only serialised (and parsed again) where a text transform comes between two DOM transforms.
+# The results can be kept in an HtmlCache (lib/htmlcache.py) for repeat conversions of a site.
+
+import os
+import sys
+import json
+import hashlib
+import inspect
+import logging
+import functools
+
+from bs4 import BeautifulSoup
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.utils import make_well_formed
+from lib.lessons import ItemType, map_text_items
+from lib.htmlcache import HtmlCache
+
+# Hash of a source file, or None if there isn't one
+@functools.lru_cache(maxsize = None)
+def source_hash(path):
+
+    if path is None or not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# Source files of a function's module and of the lib modules it uses (e.g. lib/styles.py)
+def module_files(func):
+
+    module = sys.modules.get(func.__module__)
+    if module is None:
+        return []
+
+    names = {func.__module__}
+    for value in vars(module).values():
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+        if isinstance(name, str) and name.startswith('lib.'):
+            names.add(name)
+
+    return sorted(filter(None, (getattr(sys.modules.get(name), '__file__', None) for name in names)))
+
+class HtmlTransform:
+
+    def __init__(self, name, func, well_formed = False, text = False, key = None, sources = None):
+        self.name = name
+        self.func = func
+        self.well_formed = well_formed
+        self.text = text
+        self.key = key
+        self.sources = sources if sources is not None else module_files(func)
+        self.hits = 0
+
+    # The transform's settings and code, for HtmlTransforms.version()
+    def version(self):
+
+        sources = self.sources + ([f'{parent}/lib/utils.py', f'{parent}/templates/styled.html'] if self.well_formed else [])
+        return [self.name, self.well_formed, self.text, self.key, [source_hash(path) for path in sources]]
+
+    # Returns (the parsed html with the transform applied, whether it changed the item)
+    def apply(self, html, title):
+
+        new_html = make_well_formed(html, title) if self.well_formed else html
+
+        # The step leaves the item as it was
+        if self.func(new_html, title) is False:
+            return (html, False)
+
+        return (new_html, True)
+
+class HtmlTransforms:
+
+    def __init__(self):
+        self.transforms = []
+
+    def __len__(self):
+        return len(self.transforms)
+
+    # Change the parsed html of an item (BeautifulSoup) in place with func(html, title), where title is the
+    # item's page title. If func returns False, the item is left as it was before the transform.
+    # well_formed: pass the html through make_well_formed(html, title) first. As that returns the html
+    # itself when it's already well formed, func should only return False if it hasn't changed it.
+    # key: the settings func uses (e.g. from APP), if any, so that cached results are only reused with
+    # the same settings. Changes to the code in func's module, or the lib modules it uses, are picked up
+    # without one.
+    def dom(self, name, func, well_formed = False, key = None):
+        self.transforms.append(HtmlTransform(name, func, well_formed, key = key))
+
+    # Replace the html of an item with func(text)
+    def text(self, name, func, key = None):
+
+        def apply(text, title):
+            return func(text)
+
+        self.transforms.append(HtmlTransform(name, apply, text = True, key = key, sources = module_files(func)))
+
+    # Add the transforms from another set
+    def extend(self, other):
+        self.transforms.extend(other.transforms)
+
+    # Returns (the html text with the transforms applied, which of the transforms changed it)
+    def transform_html(self, text, title = None):
+
+        html = None
+        changed = []
+
+        for transform in self.transforms:
+            if transform.text:
+                if html is not None:
+                    (text, html) = (str(html), None)
+
+                text = transform.func(text, title)
+                changed.append(True)
+            else:
+                if html is None:
+                    html = BeautifulSoup(text, 'html.parser')
+
+                (html, hit) = transform.apply(html, title)
+                changed.append(hit)
+
+        return (str(html) if html is not None else text, changed)
+
+    def count(self, changed):
+        for (transform, hit) in zip(self.transforms, changed):
+            transform.hits += hit
+
+    # Returns the html text with the transforms applied
+    def apply_html(self, text, title = None):
+
+        (text, changed) = self.transform_html(text, title)
+        self.count(changed)
+
+        return text
+
+    # Identifies the transforms, their settings and their code, for the HtmlCache
+    def version(self):
+        return hashlib.sha256(json.dumps([transform.version() for transform in self.transforms], default = str).encode('utf-8')).hexdigest()
+
+    # Apply the transforms to the text items of a LessonsDocument (lib/lessons.py), in a pool of
+    # worker processes for a large site (see map_text_items)
+    # cache: an HtmlCache with results from earlier conversions, which is updated with the new results
+    def apply(self, lessons, workers = 1, cache = None):
+
+        def merge(item, result):
+            (html, changed) = result
+            item.set('html', html)
+            self.count(changed)
+
+        items = lessons.items_of_type(ItemType.TEXT)
+        todo = items
+        found = {}
+
+        if cache is not None:
+            version = self.version()
+            keys = [HtmlCache.key(version, item.get('html'), lessons.page_title(item)) for item in items]
+            found = cache.get(keys)
+
+            todo = []
+            todo_keys = []
+            for (item, key) in zip(items, keys):
+                if key in found:
+                    merge(item, found[key])
+                else:
+                    todo.append(item)
+                    todo_keys.append(key)
+
+        results = []
+
+        def add(item, result):
+            merge(item, result)
+            results.append(result)
+
+        map_text_items(lessons, self.transform_html, add, workers = workers, items = todo)
+
+        if cache is not None and results:
+            cache.put(zip(todo_keys, results))
+
+        hits = ", ".join(f"{transform.name} {transform.hits}" for transform in self.transforms)
+        cached = f", {len(items) - len(todo)} cached" if cache is not None else ""
+        logging.info(f"\tHTML transforms: {len(items)} item(s){cached} ({hits})")
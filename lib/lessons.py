@@ -6,8 +6,11 @@ import sys
 import oembed
 import requests
 import logging
+import multiprocessing
+import lxml.etree as ET
 from bs4 import BeautifulSoup
 from html import escape
+from concurrent.futures import ProcessPoolExecutor
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
@@ -15,6 +18,7 @@ sys.path.append(parent)
 
 from lib.utils import read_yaml
 from lib.resources import get_content_displayname
+from lib.snapshot import write_tree
 
 # Lessons item types
 # https://github.com/cilt-uct/sakai/blob/21.x/lessonbuilder/api/src/java/org/sakaiproject/lessonbuildertool/SimplePageItem.java#L36
@@ -40,6 +44,152 @@ class ItemType:
     TWITTER = '18'
     CALENDAR = '19'
 
+# lessonbuilder.xml parsed once, with lookups for pages by pageid and by parent, and items by id and type.
+# Lists are in document order (sites can have duplicate ids, the first match is used). Pages and items
+# added later go at the end. The lookups stay current if the id, type, pageid and parent attributes are
+# changed with set(), and elements are added and removed with add() and remove().
+# Each lookup keeps {element: None} per value, which keeps the order elements were indexed in and lets
+# them be added and removed without searching.
+class LessonsDocument:
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.root = tree.getroot()
+
+        self.pages = {}
+        self.subpages = {}
+        self.items = {}
+        self.types = {}
+
+        for el in self.root.iter('page', 'item'):
+            self.index(el)
+
+    @staticmethod
+    def parse(xml_src):
+        return LessonsDocument(ET.parse(xml_src))
+
+    # The lookups for an element, by the attribute they are keyed on
+    def _lookups(self, el):
+        if el.tag == 'page':
+            return (('pageid', self.pages), ('parent', self.subpages))
+
+        return (('id', self.items), ('type', self.types))
+
+    # Add an element to its lookups, or only to the one for the attribute name
+    def index(self, el, name = None):
+        for (attr, lookup) in self._lookups(el):
+            key = el.get(attr)
+            if key is not None and name in (None, attr):
+                lookup.setdefault(key, {})[el] = None
+
+    def unindex(self, el, name = None):
+        for (attr, lookup) in self._lookups(el):
+            found = lookup.get(el.get(attr))
+            if found is not None and name in (None, attr):
+                found.pop(el, None)
+
+    # First page with this pageid, otherwise None
+    def page(self, pageid):
+        return next(iter(self.pages.get(pageid, ())), None)
+
+    # First item with this id, otherwise None
+    def item(self, item_id):
+        return next(iter(self.items.get(item_id, ())), None)
+
+    # Pages whose parent is this pageid
+    def subpages_of(self, pageid):
+        return list(self.subpages.get(pageid, ()))
+
+    # Items of an ItemType
+    def items_of_type(self, item_type):
+        return list(self.types.get(item_type, ()))
+
+    # The page containing an item, otherwise None
+    def page_of(self, item):
+        page = item.getparent()
+        return page if page is not None and page.tag == 'page' else None
+
+    def page_title(self, item):
+        page = self.page_of(item)
+        return page.get('title') if page is not None else None
+
+    # Set an attribute of a page or item. Only the lookup for the attribute changes.
+    def set(self, el, name, value):
+        self.unindex(el, name)
+        el.set(name, value)
+        self.index(el, name)
+
+    # Add a page or item (with its items) to a parent element (at position, otherwise at the end)
+    def add(self, parent, el, position = None):
+
+        if position is None:
+            parent.append(el)
+        else:
+            parent.insert(position, el)
+
+        for child in el.iter('page', 'item'):
+            self.index(child)
+
+    def remove(self, el):
+
+        for child in el.iter('page', 'item'):
+            self.unindex(child)
+
+        el.getparent().remove(el)
+
+    def write(self, xml_dest):
+        write_tree(self.tree, xml_dest, encoding='utf-8', xml_declaration=True)
+
+# Use a process pool in map_text_items when there are at least this many items
+POOL_MIN_ITEMS = 200
+
+# The function being mapped, inherited by the forked workers
+_map_func = None
+
+def _map_item(html, title):
+    return _map_func(html, title)
+
+# Run func(html, title) for each text item in a LessonsDocument, with the item's page title, and pass the
+# item and the result to merge(item, result) in document order (by default, setting the item's html to
+# the result). Returns the items.
+# items: the text items to map, if not all of them
+# The items are split into batches for a pool of worker processes if there are at least min_items
+# (default POOL_MIN_ITEMS) of them, otherwise they are done in this process. The workers are forked,
+# so func needn't be picklable, but its result must be, and changes it makes to anything other than
+# its result are lost.
+def map_text_items(lessons, func, merge = None, workers = 1, min_items = None, items = None):
+
+    global _map_func
+
+    if min_items is None:
+        min_items = POOL_MIN_ITEMS
+
+    if items is None:
+        items = lessons.items_of_type(ItemType.TEXT)
+
+    htmls = [item.attrib['html'] for item in items]
+    titles = [lessons.page_title(item) for item in items]
+
+    workers = min(workers, len(items), os.cpu_count() or 1)
+
+    if workers > 1 and len(items) >= min_items:
+        _map_func = func
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_map_item, htmls, titles, chunksize=max(1, len(items) // (workers * 4))))
+        finally:
+            _map_func = None
+    else:
+        results = [func(html, title) for (html, title) in zip(htmls, titles)]
+
+    for (item, result) in zip(items, results):
+        if merge is None:
+            item.set('html', result)
+        else:
+            merge(item, result)
+
+    return items
+
 # https://regexr.com/3dj5t
 YOUTUBE_RE = "^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$"
 YOUTUBE_PARAMS_RE = "t=([0-9]+)"
@@ -0,0 +1,121 @@
+# Performance metrics for workflow steps, appended as JSON lines to APP['metrics']['file']
+# (see utils/step_metrics.py for a summary)
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import resource
+
+from datetime import datetime
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# Bytes read and written by this process (Linux only)
+def process_io():
+    try:
+        with open('/proc/self/io', 'r') as f:
+            io = dict(line.split(': ') for line in f.read().splitlines())
+            return (int(io['rchar']), int(io['wchar']))
+    except (OSError, KeyError, ValueError):
+        return (0, 0)
+
+# Modification time and size of each file in a folder, or only of the files matching the glob patterns
+# (relative to the folder, e.g. 'qti/*')
+def folder_files(folder, patterns = None):
+
+    if patterns is None:
+        paths = [os.path.join(base, name) for (base, dirs, names) in os.walk(folder) for name in names]
+    else:
+        paths = {path for pattern in patterns for path in glob.glob(os.path.join(glob.escape(folder), pattern))}
+
+    files = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            files[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+
+    return files
+
+def cpu_time():
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage_self.ru_utime + usage_self.ru_stime + usage_children.ru_utime + usage_children.ru_stime
+
+# Measures the resources used by a step: wall and cpu time (including child processes such as ffmpeg),
+# peak memory of the process, bytes read and written, and the files changed in a folder (e.g. the site
+# archive), or only those matching the patterns (e.g. the files a step declares it writes)
+class StepMetrics:
+
+    def __init__(self, folder = None, patterns = None):
+        self.folder = folder if (folder and os.path.isdir(folder)) else None
+        self.patterns = patterns
+
+    def start(self):
+        self.start_time = time.time()
+        self.start_cpu = cpu_time()
+        self.start_io = process_io()
+        self.start_files = folder_files(self.folder, self.patterns) if self.folder else {}
+
+    def stop(self):
+
+        io = process_io()
+        metrics = {
+            'wall': round(time.time() - self.start_time, 3),
+            'cpu': round(cpu_time() - self.start_cpu, 3),
+            # Peak resident memory of this process (for its lifetime, not just the step) and of the largest
+            # child process so far, in KB
+            'process_max_rss': max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                           resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss),
+            'read_bytes': io[0] - self.start_io[0],
+            'write_bytes': io[1] - self.start_io[1],
+        }
+
+        if self.folder:
+            files = folder_files(self.folder, self.patterns)
+            changed = [path for (path, stat) in files.items() if self.start_files.get(path) != stat]
+            metrics['files_changed'] = len(changed)
+            metrics['bytes_changed'] = sum(files[path][1] for path in changed)
+
+        return metrics
+
+# For a step which ran at the same time as other steps: cpu time in the workflow process includes the
+# worker processes which finished during the step, so it is dropped for steps run there (local).
+# Steps in worker processes, and the files changed by steps which declare what they write, are still
+# measured on their own.
+def mark_overlap(metrics, local):
+
+    metrics['overlap'] = True
+    if local:
+        metrics.pop('cpu', None)
+
+# Append a step's metrics to the metrics file
+def save_step_metrics(APP, workflow, link_id, site_id, result):
+
+    if not APP['metrics']['enabled'] or not result.metrics:
+        return
+
+    entry = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'workflow': workflow,
+        'link_id': link_id,
+        'site_id': site_id,
+        'action': result.action,
+        'status': result.status,
+        'errors': result.errors,
+        'warnings': result.warnings,
+    }
+    entry.update(result.metrics)
+
+    try:
+        os.makedirs(os.path.dirname(APP['metrics']['file']), exist_ok=True)
+        with open(APP['metrics']['file'], 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        logging.warning(f"Could not save metrics for step {result.action}: {e}")
@@ -0,0 +1,177 @@
+# Local stand-ins for the services used by a workflow run (migration database, Sakai, Jira and email),
+# for running a workflow against an archive folder on disk, e.g. to profile or regression-test
+# the workflow steps (run_workflow.py --offline).
+
+import os
+import sys
+import logging
+import pymysql
+import lxml.etree as ET
+
+from contextlib import contextmanager
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import lib.db
+import lib.sakai
+import lib.utils
+import lib.jira_rest
+
+# SQL statements are logged and discarded; queries return no rows
+class OfflineCursor:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, args = None):
+        logging.debug(f"Offline database: {' '.join(sql.split())} {args}")
+        return 0
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+class OfflineConnection:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def cursor(self, *args, **kwargs):
+        return OfflineCursor()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def offline_connect(*args, **kwargs):
+    return OfflineConnection()
+
+# Migration database with the records of the offline runs
+class OfflineMigrationDb(lib.db.MigrationDb):
+
+    records = {}
+
+    def __init__(self, APP):
+        self.db_config = {}
+
+    @staticmethod
+    def add_record(link_id, site_id, state = 'exporting'):
+        OfflineMigrationDb.records[(link_id, site_id)] = {
+            'link_id': link_id,
+            'site_id': site_id,
+            'state': state,
+            'test_conversion': 0,
+            'url': site_id,
+            'failure_type': None,
+            'failure_detail': None,
+            'workflow': '[]',
+            'notification': None,
+            'started_by_email': None,
+            'imported_site_id': None,
+            'report_url': None,
+            'zip_size': None,
+        }
+
+    def get_record(self, link_id: str = None, site_id: str = None):
+        return OfflineMigrationDb.records.get((link_id, site_id))
+
+# Sakai server for a site archive which is already in the archive folder
+class OfflineSakai:
+
+    def __init__(self, APP):
+        self.base_url = APP['sakai_url']
+        self.APP = APP
+
+    def config(self, config_name):
+        return None
+
+    def url(self):
+        return self.base_url
+
+    # From the site.xml file in the archive
+    def get_site_title(self, SITE_ID):
+
+        site_xml = r'{}{}-archive/site.xml'.format(self.APP['archive_folder'], SITE_ID)
+
+        if os.path.exists(site_xml):
+            site = ET.parse(site_xml).getroot().find(".//site[@title]")
+            if site is not None:
+                return site.get('title')
+
+        return None
+
+    def get_site_collection_size(self, SITE_ID):
+        return None
+
+    def archive_site(self, SITE_ID, force:bool = False):
+        return os.path.isdir(r'{}{}-archive/'.format(self.APP['archive_folder'], SITE_ID))
+
+    def archive_site_retry(self, SITE_ID, force:bool = False, max_tries:int = 3):
+        return self.archive_site(SITE_ID, force)
+
+    def set_site_properties(self, SITE_ID, property_set):
+        logging.debug(f"Offline Sakai: site {SITE_ID} properties {property_set}")
+        return True
+
+    def set_site_property(self, SITE_ID, property_name, property_value):
+        return self.set_site_properties(SITE_ID, {property_name: property_value})
+
+def offline_email(*args, **kwargs):
+    logging.debug("Offline email: not sent")
+    return True
+
+def offline_jira(*args, **kwargs):
+    logging.debug("Offline Jira: no issue updated")
+
+class OfflineJira:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        return offline_jira
+
+# Replace the services with the offline stand-ins in all loaded modules, including names imported
+# with 'from ... import', e.g. send_template_email in run_workflow.
+# Modules imported inside the context should be imported beforehand, so that they are restored afterwards.
+@contextmanager
+def offline_services():
+
+    stand_ins = {
+        id(pymysql.connect): offline_connect,
+        id(lib.db.MigrationDb): OfflineMigrationDb,
+        id(lib.sakai.Sakai): OfflineSakai,
+        id(lib.utils.send_email): offline_email,
+        id(lib.utils.send_template_email): offline_email,
+        id(lib.jira_rest.MyJira): OfflineJira,
+        id(lib.jira_rest.create_jira): offline_jira,
+        id(lib.jira_rest.close_jira): offline_jira,
+    }
+
+    replaced = []
+    for module in list(sys.modules.values()):
+        for (name, value) in list(getattr(module, '__dict__', {}).items()):
+            if id(value) in stand_ins:
+                replaced.append((module, name, value))
+                setattr(module, name, stand_ins[id(value)])
+
+    try:
+        yield
+    finally:
+        for (module, name, value) in replaced:
+            setattr(module, name, value)
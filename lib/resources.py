@@ -4,15 +4,273 @@ import os
 import lxml.etree as ET
 import copy
 import base64
+import urllib.parse
 from pathlib import Path
+from contextlib import contextmanager
+
+from lib.snapshot import write_tree
+
+# Parsed files by path: ((mtime, size), object)
+_cache = {}
+
+def _cached(xml_src, load):
+
+    stat = os.stat(xml_src)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    if xml_src in _cache and _cache[xml_src][0] == signature:
+        return _cache[xml_src][1]
+
+    obj = load(xml_src)
+    _cache[xml_src] = (signature, obj)
+
+    return obj
+
+# Drop a cached file, e.g. after a failed change
+def _forget(xml_src):
+    _cache.pop(xml_src, None)
+
+# An index of the resources and collections in content.xml or attachment.xml, with lookups by id,
+# rel-id, filename and body-location. Indexes are cached by file and re-read when the file changes,
+# so the elements are shared between callers: use the methods below (or a content_batch) to change them.
+class ContentIndex:
+
+    def __init__(self, xml_src):
+        self.src = xml_src
+        self.tree = ET.parse(xml_src)
+        self.root = self.tree.getroot()
+        self.container = self.root.find("org.sakaiproject.content.api.ContentHostingService")
+        self.dirty = False
+
+        self.resources = {}
+        self.collections = {}
+        self.rel_ids = {}
+        self.filenames = {}
+        self.body_locations = {}
+        self.props = {}
+
+        for el in self.root.iter('resource', 'collection'):
+            self.index(el)
+
+    # Cached index for a file
+    @staticmethod
+    def load(xml_src):
+        return _cached(xml_src, ContentIndex)
+
+    def index(self, el):
+
+        sakai_id = el.get('id')
+        (self.resources if el.tag == 'resource' else self.collections).setdefault(sakai_id, el)
+
+        if el.get('rel-id') is not None:
+            self.rel_ids.setdefault(el.get('rel-id'), el)
+
+        if el.tag == 'resource':
+            self.filenames.setdefault(sakai_id.split("/")[-1], []).append(el)
+
+            if el.get('body-location') is not None:
+                self.body_locations.setdefault(el.get('body-location'), el)
+
+    def unindex(self, el):
+
+        sakai_id = el.get('id')
+        for (lookup, key) in ((self.resources, sakai_id), (self.collections, sakai_id),
+                              (self.rel_ids, el.get('rel-id')), (self.body_locations, el.get('body-location'))):
+            if lookup.get(key) is el:
+                del lookup[key]
+
+        same_name = self.filenames.get(sakai_id.split("/")[-1], [])
+        if el in same_name:
+            same_name.remove(el)
+
+        self.props.pop(sakai_id, None)
+
+    # Resource IDs in document order
+    def resource_ids(self):
+        return [el.get('id') for el in self.root.iter('resource')]
+
+    # Resource or collection with this id (resources first), otherwise None
+    def find(self, sakai_id):
+        el = self.resources.get(sakai_id)
+        return el if el is not None else self.collections.get(sakai_id)
+
+    def exists(self, sakai_id):
+        return self.find(sakai_id) is not None
+
+    def find_rel_id(self, rel_id):
+        return self.rel_ids.get(rel_id)
+
+    # Resources whose ID ends with /filename, in document order
+    def find_filename(self, filename):
+        return list(self.filenames.get(filename, []))
+
+    def find_body_location(self, body_location):
+        return self.body_locations.get(body_location)
+
+    # Decoded value of a property of a resource or collection, or None if it doesn't have the property
+    def property(self, sakai_id, name):
+
+        if sakai_id not in self.props:
+            el = self.find(sakai_id)
+            if el is None:
+                raise Exception(f"Resource {sakai_id} not found in {self.src}")
+
+            # Decoded on first use
+            self.props[sakai_id] = {prop.get('name'): prop for prop in el.findall('./properties/property')}
+
+        prop = self.props[sakai_id].get(name)
+        if prop is None:
+            return None
+
+        if not isinstance(prop, str):
+            prop = base64.b64decode(prop.get('value')).decode('utf-8')
+            self.props[sakai_id][name] = prop
+
+        return prop
+
+    def displayname(self, sakai_id):
+        return self.property(sakai_id, "DAV:displayname")
+
+    def creator(self, sakai_id):
+        return self.property(sakai_id, "CHEF:creator")
+
+    # Add a resource or collection to the container (at position, otherwise at the end)
+    def add(self, el, position = None):
+
+        if position is None:
+            self.container.append(el)
+        else:
+            self.container.insert(position, el)
+
+        self.index(el)
+        self.dirty = True
+
+    def remove(self, el):
+        self.unindex(el)
+        el.getparent().remove(el)
+        self.dirty = True
+
+    # Change the id and rel-id of an item
+    def rename(self, el, new_id, rel_id):
+        self.unindex(el)
+        el.set('id', new_id)
+        el.set('rel-id', rel_id)
+        self.index(el)
+        self.dirty = True
+
+    def write(self):
+
+        if not self.dirty:
+            return False
+
+        write_tree(self.tree, self.src, encoding='utf-8', xml_declaration=True)
+        self.dirty = False
+
+        # Still current
+        stat = os.stat(self.src)
+        _cache[self.src] = ((stat.st_mtime_ns, stat.st_size), self)
+
+        return True
+
+# Map of user id to eid from user.xml
+def get_user_eids(site_folder):
+
+    def load(user_src):
+        return {user.get('id'): user.get('eid') for user in ET.parse(user_src).getroot().iter('user')}
+
+    return _cached(f'{site_folder}/user.xml', load)
+
+# Finds references to a set of ids (plain or URL-quoted) in text. All the ids are stored in a trie
+# after their common prefix (e.g. /group/<site_id>/), so each occurrence of the prefix is checked
+# against every id at once.
+class RefScanner:
+
+    def __init__(self, ids):
+
+        forms = {}
+        for sakai_id in ids:
+            forms[urllib.parse.quote(sakai_id)] = (sakai_id, 'found-escaped')
+
+        # Plain ids take precedence where quoting makes no difference
+        for sakai_id in ids:
+            forms[sakai_id] = (sakai_id, 'found-plain')
+
+        self.prefix = os.path.commonprefix(list(forms)) if forms else ''
+        self.trie = {}
+
+        for (form, found) in forms.items():
+            node = self.trie
+            for char in form[len(self.prefix):]:
+                node = node.setdefault(char, {})
+            node[None] = found
+
+    # Add the ids referenced in the text to found: {id: 'found-plain' or 'found-escaped'}.
+    # Also returns the ids which are followed by the end of a path (not a longer path)
+    def scan(self, text, found):
+
+        whole = set()
+        if not self.trie:
+            return whole
+
+        start = len(self.prefix)
+        pos = text.find(self.prefix)
+
+        while pos >= 0:
+            node = self.trie
+            i = pos + start
+
+            while True:
+                if None in node:
+                    (sakai_id, how) = node[None]
+                    found.setdefault(sakai_id, how)
+
+                    if i == len(text) or text[i] in PATH_END:
+                        whole.add(sakai_id)
+
+                if i == len(text) or text[i] not in node:
+                    break
+
+                node = node[text[i]]
+                i += 1
+
+            pos = text.find(self.prefix, pos + 1)
+
+        return whole
+
+# Characters which end a path in XML or HTML
+PATH_END = set('"\'<> \t\r\n?#&')
+
+# Resources in content.xml which are referenced from the other XML files in the archive (including qti/)
+# Returns (used, orphaned, whole) where used and orphaned are {id: size}, and whole is the set of
+# resources and collections which are referenced by their full path
+def find_orphans(site_folder):
+
+    content = ContentIndex.load(f'{site_folder}/content.xml')
+    content_sizes = {sakai_id: el.get('content-length') for (sakai_id, el) in content.resources.items()}
+    scanner = RefScanner(list(content.resources) + list(content.collections))
+
+    xml_files = [entry.path for entry in os.scandir(site_folder)
+                 if entry.name.endswith('.xml') and entry.name not in ('content.xml', 'archive.xml')]
+
+    qti_folder = f'{site_folder}/qti'
+    if os.path.isdir(qti_folder):
+        xml_files += [entry.path for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
+
+    found = {}
+    whole = set()
+    for xml_file in xml_files:
+        with open(xml_file, 'r', encoding='utf-8', errors='replace') as f:
+            whole |= scanner.scan(f.read(), found)
+
+    used = {sakai_id: size for (sakai_id, size) in content_sizes.items() if sakai_id in found}
+    orphaned = {sakai_id: size for (sakai_id, size) in content_sizes.items() if sakai_id not in found}
+
+    return (used, orphaned, whole)
 
 # Return a set of resource IDs in the site
 def get_resource_ids(xml_src):
     if os.path.exists(xml_src):
-        tree = ET.parse(xml_src)
-        root = tree.getroot()
-        ids = [x.get('id') for x in root.findall(".//resource")]
-        return ids
+        return ContentIndex.load(xml_src).resource_ids()
     else:
         return []
 
@@ -20,9 +278,8 @@ def get_resource_ids(xml_src):
 def get_resource_sizes(xml_src):
 
     if os.path.exists(xml_src):
-        tree = ET.parse(xml_src)
-        root = tree.getroot()
-        ids = {x.get('id'):x.get('content-length') for x in root.findall(".//resource")}
+        root = ContentIndex.load(xml_src).root
+        ids = {x.get('id'):x.get('content-length') for x in root.iter("resource")}
         return ids
     else:
         return {}
@@ -41,24 +298,16 @@ def get_content_owner(site_folder, sakai_id):
         return (None, None)
 
     content_src = f'{site_folder}/content.xml'
+    content = ContentIndex.load(content_src)
 
-    item = find_content(site_folder, sakai_id)
-    if item is None:
+    if not content.exists(sakai_id):
         raise Exception(f"Resource {sakai_id} not found in {content_src}")
 
-    owner = item.find('./properties/property[@name="CHEF:creator"]')
-    if owner is None:
+    owner_userid = content.creator(sakai_id)
+    if owner_userid is None:
         raise Exception(f"No creator property found for {sakai_id} in {content_src}")
 
-    owner_userid_enc = owner.get('value')
-    owner_userid = base64.b64decode(owner_userid_enc).decode("utf-8")
-
-    user_src = f'{site_folder}/user.xml'
-    user_tree = ET.parse(user_src)
-    user_root = user_tree.getroot()
-
-    user = user_root.find(f".//user[@id='{owner_userid}']")
-    owner_eid = user.get('eid') if user is not None else None
+    owner_eid = get_user_eids(site_folder).get(owner_userid)
 
     return (owner_userid, owner_eid)
 
@@ -74,28 +323,7 @@ def find_content(site_folder, sakai_id):
         # Not a real Sakai ID - used in Lessons
         return None
 
-    content_src = f'{site_folder}/content.xml'
-    content_tree = ET.parse(content_src)
-    content_root = content_tree.getroot()
-
-    if "'" not in sakai_id:
-        # Fast search
-        el = content_root.find(f".//resource[@id='{sakai_id}']")
-        if el is not None:
-            return el
-
-        el = content_root.find(f".//collection[@id='{sakai_id}']")
-        if el is not None:
-            return el
-
-        return None
-    else:
-        # Iterate through because of escaping issues with lxml.find()
-        for el in content_root.findall('.//resource') + content_root.findall('.//collection'):
-            if el.get('id') == sakai_id:
-                return el
-
-        return None
+    return ContentIndex.load(f'{site_folder}/content.xml').find(sakai_id)
 
 # Return display name for a content item, if available otherwise None
 def get_content_displayname(site_folder, sakai_id):
@@ -104,19 +332,7 @@ def get_content_displayname(site_folder, sakai_id):
         # Not a real Sakai ID - used in Lessons
         return None
 
-    content_src = f'{site_folder}/content.xml'
-
-    item = find_content(site_folder, sakai_id)
-
-    if item is None:
-        raise Exception(f"Resource {sakai_id} not found in {content_src}")
-
-    displayprop = item.find('./properties/property[@name="DAV:displayname"]')
-    if displayprop is None:
-        return None
-
-    displayname = str(base64.b64decode(displayprop.get("value")).decode('utf-8'))
-    return displayname
+    return ContentIndex.load(f'{site_folder}/content.xml').displayname(sakai_id)
 
 # Add a property subnode
 def add_prop(props, prop_name, prop_val):
@@ -129,173 +345,194 @@ def add_prop(props, prop_name, prop_val):
 
     return
 
-# Move from attachment.xml to content.xml
-def move_attachments(SITE_ID, site_folder, collection, move_list):
+# Changes to content.xml and attachment.xml in a site archive, made on the cached indexes.
+# Each file is written once, when the batch is written.
+class ContentBatch:
 
-    if len(move_list) == 0:
-        # Nothing to do
-        return
+    def __init__(self, site_folder):
+        self.site_folder = site_folder
+        self.indexes = {}
 
-    content_src = f'{site_folder}/content.xml'
-    content_tree = ET.parse(content_src)
-    content_root = content_tree.getroot()
+    def index(self, name):
+        if name not in self.indexes:
+            self.indexes[name] = ContentIndex.load(f'{self.site_folder}/{name}')
 
-    attach_src = f'{site_folder}/attachment.xml'
-    attach_tree = ET.parse(attach_src)
-    attach_root = attach_tree.getroot()
+        return self.indexes[name]
 
-    content_container = content_root.find("org.sakaiproject.content.api.ContentHostingService")
-    attach_container = attach_root.find("org.sakaiproject.content.api.ContentHostingService")
+    @property
+    def content(self):
+        return self.index('content.xml')
 
-    collection_id = f"/group/{SITE_ID}/{collection}/"
+    @property
+    def attachments(self):
+        return self.index('attachment.xml')
 
-    rewrite = False
+    # Move from attachment.xml to content.xml
+    def move_attachments(self, SITE_ID, collection, move_list):
 
-    if content_root.find(f".//collection[@id='{collection_id}']") is None:
-        # Create the target collection under <org.sakaiproject.content.api.ContentHostingService>
-        print(f"CREATE collection {collection_id}")
+        if len(move_list) == 0:
+            # Nothing to do
+            return
 
-        collection_el = ET.Element("collection")
-        collection_el.set('id', collection_id)
-        collection_el.set('rel-id', collection)
-        collection_el.set('resource-type', 'org.sakaiproject.content.types.folder')
+        collection_id = f"/group/{SITE_ID}/{collection}/"
 
-        props = ET.Element("properties")
-        add_prop(props, "CHEF:creator", "admin")
-        add_prop(props, "DAV:displayname", collection)
-        add_prop(props, "CHEF:modifiedby", "admin")
-        add_prop(props, "CHEF:description", "")
-        add_prop(props, "CHEF:is-collection", "true")
-        add_prop(props, "DAV:getlastmodified", "20240309112237083")
-        add_prop(props, "SAKAI:conditionalrelease", "false")
-        add_prop(props, "DAV:creationdate", "20240309112237081")
-        add_prop(props, "SAKAI:conditionalNotificationId", "")
+        if self.content.collections.get(collection_id) is None:
+            # Create the target collection under <org.sakaiproject.content.api.ContentHostingService>
+            print(f"CREATE collection {collection_id}")
 
-        collection_el.append(props)
-        content_container.append(collection_el)
+            collection_el = ET.Element("collection")
+            collection_el.set('id', collection_id)
+            collection_el.set('rel-id', collection)
+            collection_el.set('resource-type', 'org.sakaiproject.content.types.folder')
 
-    # Iterate
-    for attach_id in move_list:
-        # print(f"Moving {attach_id} to {move_list[attach_id]})")
+            props = ET.Element("properties")
+            add_prop(props, "CHEF:creator", "admin")
+            add_prop(props, "DAV:displayname", collection)
+            add_prop(props, "CHEF:modifiedby", "admin")
+            add_prop(props, "CHEF:description", "")
+            add_prop(props, "CHEF:is-collection", "true")
+            add_prop(props, "DAV:getlastmodified", "20240309112237083")
+            add_prop(props, "SAKAI:conditionalrelease", "false")
+            add_prop(props, "DAV:creationdate", "20240309112237081")
+            add_prop(props, "SAKAI:conditionalNotificationId", "")
 
-        attach_item = attach_root.find(f".//resource[@id='{attach_id}']")
-        if attach_item is not None:
-            # Move it to content
+            collection_el.append(props)
+            self.content.add(collection_el)
 
-            content_item = copy.deepcopy(attach_item)
+        # Iterate
+        for attach_id in move_list:
 
-            new_id = move_list[attach_id]
-            rel_id = new_id.replace(f"/group/{SITE_ID}/","")
+            attach_item = self.attachments.resources.get(attach_id)
+            if attach_item is not None:
+                # Move it to content
 
-            content_item.set('id', new_id)
-            content_item.set('rel-id', rel_id)
+                content_item = copy.deepcopy(attach_item)
 
-            # Add it to content, remove it from attachment
-            content_container.append(content_item)
-            attach_container.remove(attach_item)
+                new_id = move_list[attach_id]
+                rel_id = new_id.replace(f"/group/{SITE_ID}/","")
 
-            rewrite = True
-        else:
-            raise Exception(f"not found! {attach_id}")
+                content_item.set('id', new_id)
+                content_item.set('rel-id', rel_id)
 
-    # Rewrite both
-    if rewrite:
-        content_tree.write(content_src, encoding='utf-8', xml_declaration=True)
-        attach_tree.write(attach_src, encoding='utf-8', xml_declaration=True)
+                # Add it to content, remove it from attachment
+                self.content.add(content_item)
+                self.attachments.remove(attach_item)
+            else:
+                raise Exception(f"not found! {attach_id}")
 
-    return
+    # Add a file to content.xml
+    # The file should already be in site_folder
+    def add_resource(self, SITE_ID, file_path, display_name, content_type, collection):
 
-# Add a file to content.xml
-# The file should already be in site_folder
-def add_resource(SITE_ID, site_folder, file_path, display_name, content_type, collection):
+        if len(collection) and not collection.endswith("/"):
+            collection += "/"
 
-    if len(collection) and not collection.endswith("/"):
-        collection += "/"
+        file_name = Path(file_path).name
+        collection_id = f"/group/{SITE_ID}/{collection}"
 
-    file_name = Path(file_path).name
-    content_src = f'{site_folder}/content.xml'
-    content_tree = ET.parse(content_src)
-    content_root = content_tree.getroot()
-    content_container = content_root.find("org.sakaiproject.content.api.ContentHostingService")
-    collection_id = f"/group/{SITE_ID}/{collection}"
+        if self.content.collections.get(collection_id) is None:
+            # Create the target collection under <org.sakaiproject.content.api.ContentHostingService>
+            print(f"CREATE collection {collection_id}")
+
+            collection_el = ET.Element("collection")
+            collection_el.set('id', collection_id)
+            collection_el.set('rel-id', collection)
+            collection_el.set('resource-type', 'org.sakaiproject.content.types.folder')
 
-    if content_root.find(f".//collection[@id='{collection_id}']") is None:
-        # Create the target collection under <org.sakaiproject.content.api.ContentHostingService>
-        print(f"CREATE collection {collection_id}")
+            props = ET.Element("properties")
+            add_prop(props, "CHEF:creator", "admin")
+            add_prop(props, "CHEF:modifiedby", "admin")
+            add_prop(props, "DAV:displayname", collection.replace("/",""))
+            add_prop(props, "CHEF:description", "")
+            add_prop(props, "CHEF:is-collection", "true")
+            add_prop(props, "DAV:getlastmodified", "20240309112237083")
+            add_prop(props, "SAKAI:conditionalrelease", "false")
+            add_prop(props, "DAV:creationdate", "20240309112237081")
 
-        collection_el = ET.Element("collection")
-        collection_el.set('id', collection_id)
-        collection_el.set('rel-id', collection)
-        collection_el.set('resource-type', 'org.sakaiproject.content.types.folder')
+            collection_el.append(props)
+            self.content.add(collection_el, 1)
+
+        # Copy the file
+
+        content_item = ET.Element('resource')
+        content_item.set('id', f'/group/{SITE_ID}/{collection}{file_name}')
+        content_item.set('rel-id', f'{collection}{file_name}')
+        content_item.set('content-type', content_type)
+        content_item.set('filePath', '/migration/')
+        content_item.set('resource-type', 'org.sakaiproject.content.types.fileUpload')
+        content_item.set('content-length', str(os.path.getsize(file_path)))
+        content_item.set('body-location', file_name)
 
         props = ET.Element("properties")
         add_prop(props, "CHEF:creator", "admin")
+        add_prop(props, "DAV:displayname", display_name)
         add_prop(props, "CHEF:modifiedby", "admin")
-        add_prop(props, "DAV:displayname", collection.replace("/",""))
         add_prop(props, "CHEF:description", "")
-        add_prop(props, "CHEF:is-collection", "true")
         add_prop(props, "DAV:getlastmodified", "20240309112237083")
-        add_prop(props, "SAKAI:conditionalrelease", "false")
-        add_prop(props, "DAV:creationdate", "20240309112237081")
-
-        collection_el.append(props)
-        content_container.insert(1, collection_el)
-
-    # Copy the file
-
-    content_item = ET.Element('resource')
-    content_item.set('id', f'/group/{SITE_ID}/{collection}{file_name}')
-    content_item.set('rel-id', f'{collection}{file_name}')
-    content_item.set('content-type', content_type)
-    content_item.set('filePath', '/migration/')
-    content_item.set('resource-type', 'org.sakaiproject.content.types.fileUpload')
-    content_item.set('content-length', str(os.path.getsize(file_path)))
-    content_item.set('body-location', file_name)
-
-    props = ET.Element("properties")
-    add_prop(props, "CHEF:creator", "admin")
-    add_prop(props, "DAV:displayname", display_name)
-    add_prop(props, "CHEF:modifiedby", "admin")
-    add_prop(props, "CHEF:description", "")
-    add_prop(props, "DAV:getlastmodified", "20240309112237083")
-
-    content_item.append(props)
-    content_container.append(content_item)
-    content_tree.write(content_src, encoding='utf-8', xml_declaration=True)
 
-    return
+        content_item.append(props)
+        self.content.add(content_item)
 
-# Rename files in attachment.xml
-def rename_attachments(SITE_ID, site_folder, collection, rename_list):
+    # Rename files in attachment.xml
+    def rename_attachments(self, SITE_ID, collection, rename_list):
+
+        # Iterate
+        for attach_id in rename_list:
+
+            attach_item = self.attachments.resources.get(attach_id)
+            if attach_item is not None:
 
-    if len(rename_list) == 0:
-        # Nothing to do
-        return
+                new_id = rename_list[attach_id]
+                rel_id = new_id.replace(f"/group/{SITE_ID}/","")
 
-    attach_src = f'{site_folder}/attachment.xml'
+                self.attachments.rename(attach_item, new_id, rel_id)
 
-    attach_tree = ET.parse(attach_src)
-    attach_root = attach_tree.getroot()
+                print(f"Renaming {attach_id} to {new_id} in attachment.xml")
 
-    rewrite = False
+    # Write the changed files
+    def write(self):
+        for index in self.indexes.values():
+            index.write()
 
-    # Iterate
-    for attach_id in rename_list:
-        # print(f"Moving {attach_id} to {move_list[attach_id]})")
+    # Drop the changed indexes from the cache without writing them
+    def discard(self):
+        for index in self.indexes.values():
+            if index.dirty:
+                _forget(index.src)
 
-        attach_item = attach_root.find(f".//resource[@id='{attach_id}']")
-        if attach_item is not None:
+# Batch changes to content.xml and attachment.xml, e.g.
+#   with content_batch(site_folder) as batch:
+#       batch.add_resource(...)
+#       batch.move_attachments(...)
+# The changed files are written once at the end, or not at all if there is an exception.
+@contextmanager
+def content_batch(site_folder):
 
-            new_id = rename_list[attach_id]
-            rel_id = new_id.replace(f"/group/{SITE_ID}/","")
+    batch = ContentBatch(site_folder)
 
-            attach_item.set('id', new_id)
-            attach_item.set('rel-id', rel_id)
+    try:
+        yield batch
+    except Exception:
+        batch.discard()
+        raise
+
+    batch.write()
+
+# Move from attachment.xml to content.xml
+def move_attachments(SITE_ID, site_folder, collection, move_list):
 
-            print(f"Renaming {attach_id} to {new_id} in attachment.xml")
+    with content_batch(site_folder) as batch:
+        batch.move_attachments(SITE_ID, collection, move_list)
 
-            rewrite = True
+# Add a file to content.xml
+# The file should already be in site_folder
+def add_resource(SITE_ID, site_folder, file_path, display_name, content_type, collection):
+
+    with content_batch(site_folder) as batch:
+        batch.add_resource(SITE_ID, file_path, display_name, content_type, collection)
+
+# Rename files in attachment.xml
+def rename_attachments(SITE_ID, site_folder, collection, rename_list):
 
-    # Rewrite if updated
-    if rewrite:
-        attach_tree.write(attach_src, encoding='utf-8', xml_declaration=True)
+    with content_batch(site_folder) as batch:
+        batch.rename_attachments(SITE_ID, collection, rename_list)
@@ -0,0 +1,102 @@
+# Rewriting references to renamed resources and attachments in the archive XML files
+#
+# Steps which rename items collect the old -> new ids for each file in a RefRewriter, and each file
+# is then read and written once, with all of its ids matched in a single regex pass.
+
+import os
+import re
+import sys
+import logging
+import functools
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.snapshot import open_replace
+
+# Regex for a trie of ids: {char: subtrie}, with '' marking the end of an id
+def _trie_regex(trie):
+
+    # Characters shared by all the ids below this point
+    prefix = ''
+    while len(trie) == 1 and '' not in trie:
+        (char, trie) = next(iter(trie.items()))
+        prefix += re.escape(char)
+
+    alternatives = [re.escape(char) + _trie_regex(subtrie) for (char, subtrie) in sorted(trie.items()) if char]
+    if not alternatives:
+        return prefix
+
+    group = alternatives[0] if len(alternatives) == 1 else '(?:{})'.format('|'.join(alternatives))
+
+    # Optional when an id ends here, so that the longest id matches
+    return prefix + (f'(?:{group})?' if '' in trie else group)
+
+# A regex which matches any of the ids, preferring the longest. The ids are arranged as a trie so
+# that ids with a common prefix (e.g. /attachment/<id>/Tests_Quizzes/) are matched together.
+@functools.lru_cache(maxsize=64)
+def ref_regex(ids):
+
+    trie = {}
+    for ref in ids:
+        node = trie
+        for char in ref:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    return re.compile(_trie_regex(trie))
+
+# Replace the ids in a file in one pass: mapping is {find_id: replace_id}.
+# Returns the ids which were found, in the order of the mapping.
+def rewrite_refs(xml_path, mapping):
+
+    if not os.path.exists(xml_path):
+        logging.warning(f"Tool path {xml_path} not found")
+        return []
+
+    mapping = {find_id: replace_id for (find_id, replace_id) in mapping.items() if find_id and find_id != replace_id}
+    if not mapping:
+        return []
+
+    with open(xml_path, 'r', encoding='utf-8', newline='') as f:
+        data = f.read()
+
+    found = set()
+
+    def replace(m):
+        found.add(m.group(0))
+        return mapping[m.group(0)]
+
+    data = ref_regex(tuple(sorted(mapping))).sub(replace, data)
+
+    if found:
+        with open_replace(xml_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(data)
+
+    return [find_id for find_id in mapping if find_id in found]
+
+# Collects the id changes for a set of files, and rewrites each file once
+class RefRewriter:
+
+    def __init__(self):
+        # path: {find_id: replace_id}
+        self.files = {}
+
+    # Replace find_id with replace_id in the files (paths or os.DirEntry)
+    def add(self, files, find_id, replace_id):
+        for file in files:
+            self.files.setdefault(os.fspath(file), {})[find_id] = replace_id
+
+    # Rewrite the files. Returns {path: [ids found]} for the files which changed.
+    def rewrite(self):
+
+        changed = {}
+        for (path, mapping) in self.files.items():
+            found = rewrite_refs(path, mapping)
+            if found:
+                changed[path] = found
+
+        self.files.clear()
+
+        return changed
@@ -120,6 +120,38 @@ class Sakai:
             logging.error("Webservices error calling method on {} with username {}".format(self.ARCHIVE['url'], self.ARCHIVE['username']))
             raise Exception(fault)
 
+    ## Get the size of a site's Resources collection in bytes (-1 for an invalid site id)
+    def get_site_collection_size(self, SITE_ID):
+
+        # Use the archive server configuration rather than general Sakai configuration
+        archive_url = self.ARCHIVE['url']
+
+        session = Session()
+        # Disable SSL cert validation (only if needed)
+        session.verify = False
+
+        transport = zeep.Transport(session=session, timeout=60)
+
+        # Zeep client for login and out
+        login_client = zeep.Client(wsdl=f"{archive_url}/sakai-ws/soap/login?wsdl", transport=transport)
+
+        try:
+            session_id = login_client.service.login(self.ARCHIVE['username'], self.ARCHIVE['password'])
+
+            sakai_content = zeep.Client(wsdl=f"{archive_url}/sakai-ws/soap/contenthosting?wsdl", transport=transport)
+
+            # Returns size in KB, -1 if invalid site id
+            size_result = int(sakai_content.service.getSiteCollectionSize(session_id, SITE_ID))
+
+            # logout
+            login_client.service.logout(session_id)
+
+            return size_result * 1024 if size_result >= 0 else -1
+
+        except zeep.exceptions.Fault as fault:
+            logging.error("Webservices error calling method on {} with username {}".format(self.ARCHIVE['url'], self.ARCHIVE['username']))
+            raise Exception(fault)
+
     ## Archive a site
     def archive_site(self, SITE_ID, force:bool = False):
 
@@ -131,6 +163,21 @@ class Sakai:
 
         succeeded = False
 
+        # Check max permitted content size
+        max_size = self.APP['export']['limit']
+
+        logging.info(f"Checking Sakai site resources size for {SITE_ID} on server {archive_url}")
+        size_result = self.get_site_collection_size(SITE_ID)
+
+        if size_result >= 0:
+            if (size_result < max_size):
+                logging.info(f"Resources size for {SITE_ID} is {format_bytes(size_result)}")
+            else:
+                if force:
+                    logging.warning(f"Resources size in {SITE_ID} of {format_bytes(size_result)} exceeds limit {format_bytes(max_size)}, [{force=}] proceeeding ...")
+                else:
+                    raise SizeExceededError(f"Resources size in {SITE_ID} of {format_bytes(size_result)} exceeds limit {format_bytes(max_size)}")
+
         # Disable SSL cert validation (for srvubuclexxx direct URLs)
         session = Session()
         session.verify = False
@@ -144,27 +191,6 @@ class Sakai:
         try:
             session_id = login_client.service.login(self.ARCHIVE['username'], self.ARCHIVE['password'])
 
-            # Check max permitted content size
-            max_size = self.APP['export']['limit']
-
-            sakai_content = zeep.Client(wsdl=f"{archive_url}/sakai-ws/soap/contenthosting?wsdl", transport=transport)
-
-            logging.info(f"Checking Sakai site resources size for {SITE_ID} on server {archive_url}")
-
-            # Returns size in KB, -1 if invalid site id
-            size_result = sakai_content.service.getSiteCollectionSize(session_id, SITE_ID)
-
-            if int(size_result) >= 0:
-                size_result = size_result * 1024
-                if (size_result < max_size):
-                    logging.info(f"Resources size for {SITE_ID} is {format_bytes(size_result)}")
-                else:
-                    if force:
-                        logging.warning(f"Resources size in {SITE_ID} of {format_bytes(size_result)} exceeds limit {format_bytes(max_size)}, [{force=}] proceeeding ...")
-                    else:
-                        logout = login_client.service.logout(session_id)
-                        raise SizeExceededError(f"Resources size in {SITE_ID} of {format_bytes(size_result)} exceeds limit {format_bytes(max_size)}")
-
             # Go ahead with archive
             archive_ws = self.APP['archive']['endpoint']
             sakai_client = zeep.Client(wsdl=f"{archive_url}/{archive_ws}?wsdl", transport=transport)
@@ -0,0 +1,221 @@
+# Sanitising the archive XML files (see remove_unwanted_characters in lib/utils.py)
+#
+# All the substitutions for a file type are made in a single pass over the file, which is read and
+# written in chunks. Files which are already clean are not rewritten, and a file which is unchanged
+# since it was last sanitised in this process is skipped without being read again.
+
+import os
+import re
+import sys
+import hashlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.snapshot import replace_file
+
+CHUNK_SIZE = 1024 * 1024
+
+# A regex substitution applied to a stream of text chunks. Matches which could continue into the
+# next chunk are held back until it arrives.
+class StreamSub:
+
+    def __init__(self, regex, repl, max_length):
+        self.regex = regex
+        self.repl = repl
+        self.max_length = max_length
+        self.carry = ''
+        self.changed = False
+
+    # Returns the processed text which can't be affected by later chunks
+    def feed(self, text, final = False):
+
+        text = self.carry + text
+        self.carry = ''
+
+        # Matches starting before the cut end within this text
+        cut = len(text) if final else len(text) - (self.max_length - 1)
+
+        out = []
+        pos = 0
+        for m in self.regex.finditer(text):
+            if m.start() >= cut:
+                break
+
+            out.append(text[pos:m.start()])
+            out.append(self.repl(m))
+            pos = m.end()
+            self.changed = True
+
+        keep = max(pos, cut, 0)
+        out.append(text[pos:keep])
+        self.carry = text[keep:]
+
+        return ''.join(out)
+
+class Sanitizer:
+
+    # chars: map of single characters to their replacement
+    # tokens: map of strings to their replacement, matched longest first
+    # patterns: (regex, replacement, maximum match length), applied in order after the characters and tokens
+    def __init__(self, chars, tokens, patterns = ()):
+
+        replacements = dict(tokens)
+        replacements.update({c: r or '' for (c, r) in chars.items() if c != r})
+
+        # One regex for all the characters and tokens. The lookahead on their first characters lets
+        # the regex engine skip quickly over the text in between.
+        alternatives = [re.escape(t) for t in sorted(tokens, key=len, reverse=True)]
+        if len(replacements) > len(tokens):
+            alternatives.append('[{}]'.format(''.join(re.escape(c) for c in replacements if len(c) == 1)))
+
+        first = ''.join(re.escape(c) for c in sorted(set(r[0] for r in replacements)))
+        regex = re.compile('(?=[{}])(?:{})'.format(first, '|'.join(alternatives)))
+
+        self.subs = [(regex, lambda m: replacements[m.group(0)], max(len(r) for r in replacements))]
+
+        for (pattern, repl, max_length) in patterns:
+            self.subs.append((re.compile(pattern), lambda m, repl=repl: repl, max_length))
+
+        # path: ((size, mtime), sha1 of the content) of files which were clean when last seen
+        self.clean = {}
+
+    def streams(self):
+        return [StreamSub(regex, repl, max_length) for (regex, repl, max_length) in self.subs]
+
+    # Sanitise a chunk of text through the streams, or flush them at the end (final)
+    def process(self, streams, chunk, final = False):
+
+        text = chunk
+        for stream in streams:
+            text = stream.feed(text, final)
+
+        return text
+
+    def text(self, data):
+        return self.process(self.streams(), data, final=True)
+
+    def is_clean(self, path, stat):
+
+        if path not in self.clean:
+            return False
+
+        (signature, sha) = self.clean[path]
+        if signature == (stat.st_size, stat.st_mtime_ns):
+            return True
+
+        # Rewritten with the same size: check whether the content is the same
+        if signature[0] == stat.st_size and file_hash(path) == sha:
+            self.clean[path] = ((stat.st_size, stat.st_mtime_ns), sha)
+            return True
+
+        return False
+
+    # Sanitise a file in place. Returns True if the file was changed.
+    def file(self, path):
+
+        if not os.path.exists(path):
+            return False
+
+        if self.is_clean(path, os.stat(path)):
+            return False
+
+        streams = self.streams()
+        sha = hashlib.sha1()
+        tmp_path = f"{path}.sanitize"
+        fout = None
+
+        # Output written so far, which is the same as the input until the first change
+        written = 0
+
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as fin:
+
+                final = False
+                while not final:
+                    chunk = fin.read(CHUNK_SIZE)
+                    final = chunk == ''
+
+                    text = self.process(streams, chunk, final)
+
+                    if fout is None and any(stream.changed for stream in streams):
+                        fout = open(tmp_path, 'w', encoding='utf-8', newline='')
+                        copy_text(path, fout, written)
+
+                    if fout is not None:
+                        fout.write(text)
+
+                    sha.update(text.encode('utf-8'))
+                    written += len(text)
+
+            if fout is not None:
+                fout.close()
+                replace_file(tmp_path, path)
+
+        finally:
+            if fout is not None and not fout.closed:
+                fout.close()
+                os.remove(tmp_path)
+
+        stat = os.stat(path)
+        self.clean[path] = ((stat.st_size, stat.st_mtime_ns), sha.hexdigest())
+
+        return fout is not None
+
+def file_hash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+# Copy the first length characters of a file
+def copy_text(path, fout, length):
+    with open(path, 'r', encoding='utf-8', newline='') as fin:
+        while length > 0:
+            chunk = fin.read(min(length, CHUNK_SIZE))
+            if not chunk:
+                break
+
+            fout.write(chunk)
+            length -= len(chunk)
+
+# Archive XML files, e.g. lessonbuilder.xml and content.xml
+ARCHIVE = Sanitizer(
+    chars = {
+        # weird characters
+        '\x1e': None,
+
+        # https://www.learnbyexample.org/python-string-isspace-method/
+        '\u00A0': ' ', '\u2003': ' ', '\u2009': ' ', '\u200A': ' ', '\u202F': ' ', '\u205F': ' ', '\u3000': ' ',
+    },
+    tokens = {
+        # weird characters
+        '&amp;#xb;': '', '&#xb;': '', '&amp;#x2;': '', '&#x2;': '', '&#160;': '', '&#11;': '', '&amp;#x8;': '',
+        '&amp;#x1;': '', '&#x1;': '', '&#x1e;': '', '&amp;#x1f;': '', '&#x1f;': '', '&amp;#x4;': '', '&#x4;': '',
+        '&amp;#x7;': '', '&#x7;': '',
+
+        # newline and tab
+        '&#xa;': '', '&#x9;': ' ',
+
+        # character replacement
+        '&#14;': 'ffi', '&#12;': 'fi',
+
+        # Escaped unicode in json in Lessons item attributes: vertical tab and left and right single quotes
+        '\\u000B': '', '\\u2018': "'", '\\u2019': "'",
+    },
+    patterns = [
+        # replace freestanding & with &amp;
+        (r'\s&\s', '$amp;', 3),
+    ])
+
+# Tests & Quizzes QTI files and samigo_question_pools.xml
+QTI = Sanitizer(
+    chars = {
+        '\u000B': None,
+    },
+    tokens = {
+        '&#11;': '',
+    })
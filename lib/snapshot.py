@@ -0,0 +1,205 @@
+# Snapshots of the archive files changed by workflow steps
+#
+# The first time a step changes a file in a site archive, the current version is hard-linked into the
+# snapshot folder next to the archive ({archive_folder}{SITE_ID}-snapshot/<nnn>-<step>/), and the new
+# version is written to a new file which replaces it. No data is copied, and the changes made by a step
+# (and the steps after it) can be rolled back by moving the snapshots back into the archive.
+#
+# A file kept in a snapshot shares its data with the snapshot until it is replaced, so archive files
+# must be written with write_tree() or open_replace() (or replace_file()), never in place.
+
+import os
+import re
+import sys
+import shutil
+import logging
+
+from contextlib import contextmanager
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# Changes made outside a workflow step are kept under the name of the script
+DEFAULT_STEP = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'changes'
+
+# The running step: name, and {site folder: snapshot folder} for the archives it has changed
+_step = {'name': DEFAULT_STEP, 'folders': {}}
+
+def snapshot_folder(site_folder):
+    return re.sub(r'-archive$', '', os.path.normpath(site_folder)) + '-snapshot'
+
+# The site archive folder (<site_id>-archive) containing a file, or None
+def _site_folder(path):
+
+    folder = os.path.dirname(os.path.abspath(path))
+    while not folder.endswith('-archive'):
+        (folder, last) = (os.path.dirname(folder), folder)
+        if folder == last:
+            return None
+
+    return folder
+
+# Snapshot folder names for an archive, oldest first
+def steps(site_folder):
+
+    root = snapshot_folder(site_folder)
+    if not os.path.isdir(root):
+        return []
+
+    return sorted(entry.name for entry in os.scandir(root) if entry.is_dir() and re.match(r'\d+-', entry.name))
+
+# The running step's folder in the snapshot of an archive, created the first time it is needed
+def _step_folder(site_folder):
+
+    if site_folder in _step['folders']:
+        return _step['folders'][site_folder]
+
+    root = snapshot_folder(site_folder)
+    os.makedirs(root, exist_ok=True)
+
+    # Steps running in other processes may be adding folders too
+    seq = len(steps(site_folder))
+    while True:
+        seq += 1
+        folder = os.path.join(root, f"{seq:03d}-{_step['name']}")
+        try:
+            os.mkdir(folder)
+            break
+        except FileExistsError:
+            continue
+
+    _step['folders'][site_folder] = folder
+    return folder
+
+# Keep the current version of an archive file in the running step's snapshot, if it isn't there already.
+# The file must then be replaced, not written in place. Returns True if a snapshot was taken.
+def keep(path):
+
+    site_folder = _site_folder(path)
+    if site_folder is None or not os.path.isfile(path):
+        return False
+
+    name = os.path.relpath(os.path.abspath(path), site_folder)
+    snapshot = os.path.join(_step_folder(site_folder), name)
+
+    if os.path.exists(snapshot):
+        return False
+
+    os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+
+    try:
+        os.link(path, snapshot)
+    except OSError:
+        # No hard links on this filesystem
+        shutil.copy2(path, snapshot)
+
+    return True
+
+# Replace an archive file with a new version (e.g. a temporary file), keeping the current version
+def replace_file(src, path):
+    keep(path)
+    os.replace(src, path)
+
+# Open a new version of an archive file for writing. It replaces the file when the block completes,
+# and is discarded if the block raises an exception.
+@contextmanager
+def open_replace(path, mode = 'w', **kwargs):
+
+    tmp_path = f"{path}.new"
+
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+
+        replace_file(tmp_path, path)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Write an ElementTree (xml.etree or lxml) to an archive file, keeping the current version.
+# kwargs are passed to tree.write, e.g. encoding='utf-8', xml_declaration=True
+def write_tree(tree, path, **kwargs):
+
+    tmp_path = f"{path}.new"
+
+    try:
+        tree.write(tmp_path, **kwargs)
+        replace_file(tmp_path, path)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Move the snapshots in the given step folders back into the archive, latest first, so that each file
+# is as it was before the earliest of the steps changed it. Returns the names of the restored files.
+def _restore(site_folder, folders):
+
+    root = snapshot_folder(site_folder)
+    restored = set()
+
+    for folder in reversed(folders):
+        step_folder = os.path.join(root, folder)
+
+        for (base, dirs, files) in os.walk(step_folder):
+            for file in files:
+                snapshot = os.path.join(base, file)
+                name = os.path.relpath(snapshot, step_folder)
+                os.replace(snapshot, os.path.join(site_folder, name))
+                restored.add(name)
+
+        shutil.rmtree(step_folder)
+
+        if _step['folders'].get(site_folder) == step_folder:
+            del _step['folders'][site_folder]
+
+    return sorted(restored)
+
+# Roll back the changes made by a step and all the steps after it.
+# step: a snapshot folder name from steps(), or a step name for its latest run. None for all the steps,
+# which also removes the snapshot folder. Returns the names of the restored files.
+def rollback(site_folder, step = None):
+
+    site_folder = os.path.abspath(site_folder)
+    folders = steps(site_folder)
+
+    if step is None:
+        restored = _restore(site_folder, folders)
+        clear(site_folder)
+        return restored
+
+    matches = [folder for folder in folders if step in (folder, folder.split('-', 1)[1])]
+    if not matches:
+        raise Exception(f"No snapshot for step {step} in {snapshot_folder(site_folder)}")
+
+    return _restore(site_folder, folders[folders.index(matches[-1]):])
+
+# Delete the snapshots for an archive, e.g. before it is zipped
+def clear(site_folder):
+
+    site_folder = os.path.abspath(site_folder)
+    shutil.rmtree(snapshot_folder(site_folder), ignore_errors = True)
+    _step['folders'].pop(site_folder, None)
+
+# Run a workflow step: the files it changes are kept in its own snapshot folders.
+# rollback_failed: if the step raises an exception, restore the files it changed.
+@contextmanager
+def step(name, rollback_failed = False):
+
+    global _step
+    previous = _step
+    _step = {'name': name, 'folders': {}}
+
+    try:
+        yield
+
+    except Exception:
+        if rollback_failed:
+            for (site_folder, folder) in list(_step['folders'].items()):
+                restored = _restore(site_folder, [os.path.basename(folder)])
+                logging.warning(f"\tRolled back {len(restored)} file(s) changed by {name}: {', '.join(restored)}")
+        raise
+
+    finally:
+        _step = previous
@@ -0,0 +1,45 @@
+# Changes to inline style attributes, for the Lessons formatting steps
+#
+# cssutils is slow, and the same style strings come up many times in a site (from copied templates), so
+# results are cached by style string for all the steps in a run. A style made up only of properties which
+# are being removed is dropped without parsing it.
+
+import os
+import re
+import sys
+import functools
+
+import cssutils
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# A declaration which cssutils would read the same way after splitting the style on ';'
+SIMPLE_DECLARATION = re.compile(r'\s*(-?[a-zA-Z_][\w-]*)\s*:[^;"\'()\\/{}<>@]*')
+
+# Returns the style text without the properties (a tuple of names), or None if nothing is left
+@functools.lru_cache(maxsize=16384)
+def remove_properties(style, names):
+
+    lower_names = {name.lower() for name in names}
+    declarations = [SIMPLE_DECLARATION.fullmatch(part) for part in style.split(';') if part.strip()]
+
+    if all(match is not None and match.group(1).lower() in lower_names for match in declarations):
+        return None
+
+    parsed = cssutils.parseStyle(style)
+    for name in names:
+        parsed.removeProperty(name)
+
+    return parsed.cssText if parsed.length > 0 else None
+
+# Remove the properties from a tag's style attribute, and the attribute if nothing is left
+def remove_style_properties(tag, names):
+
+    style = remove_properties(tag['style'], tuple(names))
+
+    if style is not None:
+        tag['style'] = style
+    else:
+        del tag['style']
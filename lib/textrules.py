@@ -0,0 +1,115 @@
+# Text rewrite rules for the archive XML files
+#
+# Steps which make plain text replacements across the archive (e.g. site_change_id, site_replace_emoji)
+# add their rules to a TextRules set. The rules are applied to each file in turn, in the order they
+# were added, with one read and (only if something changed) one write per file.
+
+import os
+import re
+import sys
+import logging
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.snapshot import open_replace
+
+class TextRule:
+
+    def __init__(self, name, regex, repl, literal = None):
+        self.name = name
+        self.regex = regex
+        self.repl = repl
+        self.literal = literal
+        self.hits = 0
+
+    # Returns the text with the rule applied
+    def apply(self, text):
+
+        if self.literal is not None:
+            # Plain string replace
+            if self.literal not in text:
+                return text
+
+            self.hits += text.count(self.literal)
+            return text.replace(self.literal, self.repl)
+
+        (text, hits) = self.regex.subn(self.repl, text)
+        self.hits += hits
+
+        return text
+
+class TextRules:
+
+    def __init__(self):
+        self.rules = []
+
+    def __len__(self):
+        return len(self.rules)
+
+    # Replace a string
+    def literal(self, name, find, replace):
+        if find and find != replace:
+            self.rules.append(TextRule(name, None, replace, literal = find))
+
+    # Replace a regex, with a replacement string or function of the match
+    def regex(self, name, pattern, repl):
+        self.rules.append(TextRule(name, re.compile(pattern), repl))
+
+    # Replace the matches of a regex with resolve(matched text), e.g. to look up a URL redirect.
+    # resolve is called once for each distinct match, and matches it returns None for are left as they are.
+    def resolve(self, name, pattern, resolve):
+
+        resolved = {}
+        rule = TextRule(name, re.compile(pattern), None)
+
+        def repl(m):
+            found = m.group(0)
+            if found not in resolved:
+                resolved[found] = resolve(found)
+
+            if resolved[found] is None:
+                # Not counted
+                rule.hits -= 1
+                return found
+
+            return resolved[found]
+
+        rule.repl = repl
+        self.rules.append(rule)
+
+    # Add the rules from another set
+    def extend(self, other):
+        self.rules.extend(other.rules)
+
+    def apply_text(self, text):
+        for rule in self.rules:
+            text = rule.apply(text)
+
+        return text
+
+    # Apply the rules to a file. Returns True if the file changed.
+    def apply_file(self, path):
+
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+
+        new_text = self.apply_text(text)
+        if new_text == text:
+            return False
+
+        with open_replace(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_text)
+
+        return True
+
+    # Apply the rules to files in a folder, e.g. SiteArchive.xml_files(). Returns the names of the files which changed.
+    def apply(self, folder, names):
+
+        changed = [name for name in names if self.apply_file(os.path.join(folder, name))]
+
+        hits = ", ".join(f"{rule.name} {rule.hits}" for rule in self.rules)
+        logging.info(f"\tText rules: {len(changed)} of {len(names)} file(s) changed ({hits})")
+
+        return changed
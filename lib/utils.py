@@ -13,15 +13,20 @@ import requests
 import csv
 import lxml.etree as ET
 import unicodedata
+import functools
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import nonwhitespace_re
 from urllib.parse import urlparse
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
+import lib.sanitize as sanitize
+import lib.rewrite as rewrite
+
 class myFile(object):
     def __init__(self, filename):
         self.f = open(filename)
@@ -43,21 +48,155 @@ def has_doctype(soup):
     items = [item for item in soup.contents if isinstance(item, bs4.Doctype)]
     return items[0] if items else None
 
+# Columns for the content of a page, as in the templates
+COLUMNS = 'body > div[class="container-fluid"] > div[class="row"] > div[class="col-sm-10 offset-sm-1"]'
+
+# A page template for make_well_formed, parsed once
+class PageTemplate:
+
+    # Placeholders for splitting the template text
+    TITLE = '\x00title\x00'
+    CONTENT = '\x00content\x00'
+
+    def __init__(self, name):
+
+        with open(f'{parent}/templates/{name}.html', 'r') as f:
+            self.soup = BeautifulSoup(f.read(), 'html.parser')
+
+        # Tags added to the head of each page
+        self.head_tags = self.soup.head.find_all(['meta','link'])
+        self.head_html = [str(tag) for tag in self.head_tags]
+
+        # The template text before the title, between the title and the content, and after the content
+        tmpl = copy.copy(self.soup)
+        tmpl.head.append(self.TITLE)
+        tmpl.body.find("div", class_="col-sm-10 offset-sm-1").append(self.CONTENT)
+
+        (self.before, rest) = str(tmpl).split(self.TITLE)
+        (self.middle, self.after) = rest.split(self.CONTENT)
+
+    def title_tag(self, title):
+        tag = self.soup.new_tag("title")
+        tag.append(title)
+        return tag
+
+    # New copies of the head tags
+    def new_head_tags(self):
+        return [copy.copy(tag) for tag in self.head_tags]
+
+    # A page from the template with the title and the content (html text)
+    def page(self, title, content):
+
+        title_html = str(self.title_tag(title)) if title is not None else ''
+        text = f'{self.before}{title_html}{self.middle}{content}{self.after}'
+
+        return BeautifulSoup(text.encode('utf-8'), 'html.parser', from_encoding='utf-8')
+
+    # Whether html is already as make_well_formed would leave it for this template and title: the
+    # template's head tags and the title at the end of the head, followed by the only style element,
+    # and the content in the template's columns
+    def is_well_formed(self, html, title = None):
+
+        head = html.head
+        if head is None or html.body is None:
+            return False
+
+        head_html = self.head_html + ([str(self.title_tag(title))] if title is not None else [])
+        count = len(head_html)
+
+        styles = html.find_all('style')
+        if len(styles) != 1 or len(head.contents) <= count or head.contents[-1] is not styles[0]:
+            return False
+
+        # A style element with attributes or other content is replaced
+        if str(styles[0]) != f'<style>{styles[0].text}</style>':
+            return False
+
+        tags = head.find_all(['meta','title','link'])
+        if len(tags) != count or any(tag is not last for (tag, last) in zip(tags, head.contents[-count - 1:-1])):
+            return False
+
+        if [str(tag) for tag in tags] != head_html:
+            return False
+
+        return len(html.select(COLUMNS)) > 0
+
+@functools.lru_cache(maxsize = None)
+def page_template(name):
+    return PageTemplate(name)
+
+# Make the changes to a document parsed with html.parser that writing it out and parsing it again would:
+# adjacent strings are joined, empty strings dropped, whitespace-only strings outside <pre> and <textarea>
+# shortened to a newline or space, and multi-valued attributes like class split into lists
+def normalize_soup(soup):
+
+    builder = soup.builder
+    containers = builder.string_containers
+    string_types = (NavigableString, *containers.values())
+
+    def join(run, container, preserve):
+
+        text = ''.join(run)
+
+        if not text:
+            for string in run:
+                string.extract()
+            return
+
+        if not preserve and not text.strip(BeautifulSoup.ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+
+        string_type = container or NavigableString
+        if len(run) == 1 and run[0] == text and type(run[0]) is string_type:
+            return
+
+        run[0].replace_with(string_type(text))
+        for string in run[1:]:
+            string.extract()
+
+    stack = [(soup, None, False)]
+    while stack:
+        (tag, container, preserve) = stack.pop()
+
+        container = containers.get(tag.name, container)
+        preserve = preserve or tag.name in builder.preserve_whitespace_tags
+
+        for attr in builder.cdata_list_attributes.get('*', []) + builder.cdata_list_attributes.get(tag.name, []):
+            if isinstance(tag.get(attr), str):
+                tag[attr] = nonwhitespace_re.findall(tag[attr])
+
+        run = []
+        for child in list(tag.contents):
+            if type(child) in string_types:
+                run.append(child)
+                continue
+
+            join(run, container, preserve)
+            run = []
+
+            if isinstance(child, Tag):
+                stack.append((child, container, preserve))
+
+        join(run, container, preserve)
+
 ## Current Templates:
 #   - styled : [DEFAULT] includes styles, and scripts
 #   - small  : includes just style
+# html itself is returned (normalized as if it had been parsed again) if it's already well formed for the
+# template and title, otherwise the changes are made to a copy (but html's body may be emptied)
 def make_well_formed(html, title = None, template = "styled"):
 
+    tmpl = page_template(template)
+
+    if tmpl.is_well_formed(html, title):
+        normalize_soup(html)
+        return html
+
     new_html = copy.copy(html)
 
     has_head = new_html.head
     has_body = new_html.body
 
-    with open(f'{parent}/templates/{template}.html', 'r') as f:
-        tmpl_contents = f.read()
-
-    tmpl = BeautifulSoup(tmpl_contents, 'html.parser')
-
     # remove the style elements from the given HTML - we will add to the head later
     style_tag = new_html.new_tag("style")
     for s in new_html.find_all('style'):
@@ -66,15 +205,7 @@ def make_well_formed(html, title = None, template = "styled"):
 
     if (has_head is None) and (has_body is None):
         # no HTML structure so use the template
-
-        if (title is not None):
-            title_tag = tmpl.new_tag("title")
-            title_tag.append(title)
-            tmpl.head.append(title_tag) # insert title tag
-
-        col = tmpl.body.find("div", class_="col-sm-10 offset-sm-1")
-        col.append(new_html)
-        new_html = copy.copy(tmpl)
+        new_html = tmpl.page(title, str(new_html))
 
     if (has_head is not None):
         # remove previous meta, title and style links
@@ -82,16 +213,14 @@ def make_well_formed(html, title = None, template = "styled"):
             rm.decompose()
 
         # add the appropriate meta and style links
-        for tag in tmpl.head.find_all(['meta','link']):
+        for tag in tmpl.new_head_tags():
             new_html.head.append(tag)
 
         if (title is not None):
-            title_tag = tmpl.new_tag("title")
-            title_tag.append(title)
-            new_html.head.append(title_tag) # insert title tag
+            new_html.head.append(tmpl.title_tag(title)) # insert title tag
 
     if (has_body is not None):
-        xpath = new_html.select('body > div[class="container-fluid"] > div[class="row"] > div[class="col-sm-10 offset-sm-1"]')
+        xpath = new_html.select(COLUMNS)
 
         if (len(xpath) == 0):
             # ok so the columns are not there - lets add it then
@@ -115,61 +244,19 @@ def make_well_formed(html, title = None, template = "styled"):
 
     return new_html
 
+# Remove or replace characters in an archive XML file which break parsing or import (see lib/sanitize.py).
+# Returns True if the file was changed. Repeated calls on an unchanged file are skipped.
 def remove_unwanted_characters(file):
-
-    if not os.path.exists(file):
-        return
-
-    fin = open(file, "rt")
-    data = fin.read()
-    fin.close()
-
-    # weird characters
-    data = data.replace('\x1e', '').replace('&amp;#xb;' ,'').replace('&#xb;','').replace('&amp;#x2;' ,'').replace('&#x2;' ,'').replace('&#160;','').replace('&#11;','').replace('&amp;#x8;' ,'')
-    data = data.replace('&amp;#x1;', '').replace('&#x1;' ,'').replace('&#x1e;' ,'').replace('&amp;#x1f;', '').replace('&#x1f;' ,'').replace('&amp;#x4;', '').replace('&#x4;' ,'')
-    data = data.replace('&amp;#x7;', '').replace('&#x7;' ,'')
-
-    # newline and tab
-    data = data.replace('&#xa;', '').replace('&#x9;', ' ')
-
-    # character replacement
-    data = data.replace('&#14;','ffi').replace('&#12;','fi')
-
-    # https://www.learnbyexample.org/python-string-isspace-method/
-    data = data.replace(u"\u00A0", " ").replace(u"\u0020", " ").replace(u"\u2003", " ").replace(u"\u2009", " ").replace(u"\u200A", " ").replace(u"\u202F", " ").replace(u"\u205F", " ").replace(u"\u3000", " ")
-
-    # Escaped unicode in json in Lessons item attributes: vertical tab and left and right single quotes
-    data = data.replace("\\u000B", "").replace("\\u2018", "'").replace("\\u2019", "'")
-
-    # replace freestanding & with &amp;
-    data = re.sub(r'\s&\s', '$amp;', data)
-
-    # replace one-or-more spaces/non-breaking-spaces with a single space
-    # data = re.sub(r'\s+', ' ', data)
-
-    fin = open(file, "wt")
-    fin.write(data)
-    fin.close()
+    return sanitize.ARCHIVE.file(file)
 
 def remove_unwanted_characters_html(data):
 
     data = data.replace('&#x2;','').replace('&#xb;','')
     return data
 
+# As remove_unwanted_characters, for QTI files
 def remove_unwanted_characters_tq(file):
-
-    if not os.path.exists(file):
-        return
-
-    fin = open(file, "rt")
-    data = fin.read()
-    fin.close()
-
-    # weird characters
-    data = data.replace('&#11;','').replace(u"\u000B",'')
-
-    fin = open(file, "wt")
-    fin.write(data)
+    return sanitize.QTI.file(file)
 
 def write_test_case(html, id):
     print(f"{parent}/tmp-{id}.html")
@@ -227,9 +314,6 @@ def zipfolder(zip_file, path):
         for file in files:
             fn = os.path.join(base, file)
 
-            if file.endswith("old"):
-                continue
-
             # Compress XML and smaller assets under 250M, otherwise store
             if "xml" in file or os.path.getsize(fn) < (250*1024*1024):
                 zipobj.write(fn, fn.replace(path,''), compress_type = zipfile.ZIP_DEFLATED)
@@ -240,25 +324,12 @@ def zipfolder(zip_file, path):
 
     return True
 
+# Replace an id in a tool XML file. Returns True if the file was changed.
+# To replace many ids, use lib.rewrite.RefRewriter which rewrites each file once.
 def rewrite_tool_ref(tool_xml_path, find_id, replace_id):
 
-    if not os.path.exists(tool_xml_path):
-        logging.warning(f"Tool path {tool_xml_path} not found")
-        return False
-
     # We don't know the XML structure here so do a naive string replace
-    fin = open(tool_xml_path, "rt")
-    data = fin.read()
-    fin.close()
-
-    if find_id in data:
-        data = data.replace(find_id, replace_id)
-        fin = open(tool_xml_path, "wt")
-        fin.write(data)
-        fin.close()
-        return True
-
-    return False
+    return len(rewrite.rewrite_refs(tool_xml_path, {find_id: replace_id})) > 0
 
 def send_template_email(APP, template, to, subj, **kwargs):
     """Sends an email using a template."""
@@ -454,3 +525,5 @@ def process_check(process_list):
 
     for c in completed:
         process_list.remove(c)
+
+    return completed
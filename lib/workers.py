@@ -0,0 +1,105 @@
+# Start the run_workflow / run_upload / run_update jobs for the scan scripts (check_*.py).
+# With preload_jobs, jobs are forked from the scan process, which has already imported the
+# workflow code and its dependencies, instead of starting a new python3 process for each site.
+
+import os
+import sys
+import logging
+import importlib
+
+from subprocess import Popen, DEVNULL
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from lib.utils import read_yaml
+
+# Job type: (runner script, workflow file)
+RUNNERS = {
+    'workflow': ('run_workflow', 'workflow.yaml'),
+    'upload': ('run_upload', 'upload.yaml'),
+    'update': ('run_update', 'update.yaml'),
+}
+
+# Import a runner and the work/ modules used in its workflow
+def preload(APP, job_type):
+
+    (runner, workflow_file) = RUNNERS[job_type]
+    importlib.import_module(runner)
+
+    steps = read_yaml(os.path.join(APP['config_folder'], workflow_file))['STEPS'] or []
+
+    for action in sorted({step['action'] for step in steps}):
+        try:
+            importlib.import_module('work.{}'.format(action))
+        except ModuleNotFoundError:
+            # Actions handled by the runner itself, e.g. mail
+            pass
+
+    logging.info(f"Preloaded {runner} for {job_type} jobs")
+
+# Runs in the forked process
+def run_job(APP, job_type, link_id, site_id, resume = False):
+
+    # Discard console output, as for jobs started with Popen
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.dup2(devnull, sys.stderr.fileno())
+
+    (runner, workflow_file) = RUNNERS[job_type]
+    mod = importlib.import_module(runner)
+
+    if resume:
+        mod.start_workflow(os.path.join(APP['config_folder'], workflow_file), link_id, site_id, APP, resume=True)
+    else:
+        mod.start_workflow(os.path.join(APP['config_folder'], workflow_file), link_id, site_id, APP)
+
+# A job running in a forked process, with the pid / poll() / returncode interface of
+# subprocess.Popen used by process_check()
+class ForkedJob:
+
+    def __init__(self, APP, job_type, link_id, site_id, resume = False):
+
+        self.returncode = None
+
+        # Flush so that buffered output isn't written twice
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        self.pid = os.fork()
+
+        if self.pid == 0:
+            exit_code = 1
+            try:
+                run_job(APP, job_type, link_id, site_id, resume)
+                exit_code = 0
+            except BaseException as e:
+                logging.exception(f"Job {job_type} for {link_id} : {site_id} failed: {e}")
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+
+    def poll(self):
+
+        if self.returncode is None:
+            (pid, status) = os.waitpid(self.pid, os.WNOHANG)
+            if pid == self.pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+
+        return self.returncode
+
+# Start a job for a site, returns a Popen or ForkedJob to add to the scan script's process list
+# resume: continue a workflow from its checkpoint (run_workflow.py --resume)
+def start_job(APP, job_type, link_id, site_id, debug = False, resume = False):
+
+    if APP['preload_jobs']:
+        return ForkedJob(APP, job_type, link_id, site_id, resume)
+
+    cmd = "python3 {}/{}.py {} {}".format(APP['script_folder'], RUNNERS[job_type][0], link_id, site_id).split()
+    if debug:
+        cmd.append("-d")
+    if resume:
+        cmd.append("--resume")
+
+    return Popen(cmd, stdout=DEVNULL, stderr=DEVNULL)
@@ -0,0 +1,345 @@
+# Functions for running the steps of a workflow (config/workflow.yaml)
+
+import os
+import re
+import sys
+import glob
+import json
+import mmap
+import time
+import logging
+import functools
+import multiprocessing
+
+from fnmatch import fnmatch
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from config.logging_config import formatter, logger
+from lib.metrics import StepMetrics, mark_overlap
+
+FILE_REGEX = re.compile(r".*(file-.*):\s(.*)")
+
+# Output files logged by workflow steps as 'file-*: path', e.g. file-fixed-zip
+def output_files(lines):
+
+    files = dict()
+    for line in lines:
+        m = FILE_REGEX.match(line)
+        if m:
+            files[m.group(1)] = m.group(2)
+
+    return files
+
+# The outcome of a workflow step, with the warnings, errors and output files it logged
+class StepResult:
+
+    def __init__(self, action, succeeded, errors = 0, warnings = 0, duration = 0, lines = None, metrics = None):
+        self.action = action
+        self.succeeded = succeeded
+        self.errors = errors
+        self.warnings = warnings
+        self.duration = duration
+        self.lines = lines or []
+        self.files = output_files(self.lines)
+
+        # Resource use (see lib/metrics.py)
+        self.metrics = metrics or {}
+
+        # Process the step ran in
+        self.pid = os.getpid()
+
+    @property
+    def status(self):
+        return 'completed' if self.succeeded else 'failed'
+
+    def __bool__(self):
+        return self.succeeded
+
+    def __str__(self):
+        return f"{self.action} {self.status} in {self.duration:.1f}s ({self.errors} errors, {self.warnings} warnings)"
+
+# Log handler that collects the log lines of one step
+class StepLog(logging.Handler):
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.setFormatter(formatter)
+        self.errors = 0
+        self.warnings = 0
+        self.lines = []
+
+    def emit(self, record):
+        if record.levelno >= logging.ERROR:
+            self.errors += 1
+        elif record.levelno >= logging.WARNING:
+            self.warnings += 1
+
+        self.lines.extend(self.format(record).split('\n'))
+
+# Run a workflow step, e.g. run_step(action, run_workflow_step, APP, step=step, ...)
+# watch_folder: count the files the step changes in this folder (e.g. the site archive)
+# watch_patterns: only count the files matching these glob patterns in the folder (e.g. the step's writes)
+# Returns a StepResult, which is False if the step returned a false value or raised an exception.
+def run_step(action, func, *args, watch_folder = None, watch_patterns = None, **kwargs):
+
+    step_log = StepLog()
+    logger.addHandler(step_log)
+    start_time = time.time()
+
+    metrics = StepMetrics(watch_folder, watch_patterns)
+    metrics.start()
+
+    try:
+        succeeded = bool(func(*args, **kwargs))
+    except Exception as e:
+        logging.exception(e)
+        succeeded = False
+    finally:
+        logger.removeHandler(step_log)
+
+    return StepResult(action, succeeded, step_log.errors, step_log.warnings, time.time() - start_time, step_log.lines,
+                      metrics.stop())
+
+# The log of a workflow run, kept in memory for updating the migration record, and written to a log file.
+# Seeded with the log entries saved in the record by earlier workflows (JSON list).
+class JobLog(logging.Handler):
+
+    def __init__(self, filename, logs):
+        super().__init__(logging.INFO)
+        self.setFormatter(formatter)
+        self.lines = list(json.loads(logs))
+        self.pid = os.getpid()
+
+        with open(filename, "w") as f:
+            for log_entry in self.lines:
+                f.write(f'{log_entry}\n')
+
+        self.file_handler = logging.FileHandler(filename)
+        self.file_handler.setLevel(logging.INFO)
+        self.file_handler.setFormatter(formatter)
+
+    def emit(self, record):
+        self.lines.extend(self.format(record).split('\n'))
+
+    # Add the log lines of a step which ran in another process
+    def add_result(self, result):
+        if result.pid != self.pid:
+            self.lines.extend(result.lines)
+
+    # Log entries as JSON, for the workflow column of the migration record
+    def get_log(self):
+        return json.dumps([line for line in self.lines if len(line) > 3])
+
+    def files(self):
+        return output_files(self.lines)
+
+# Start the log for a workflow run, replacing any log started earlier in this process
+def setup_log_file(APP, filename, SITE_ID, logs):
+
+    # remove previous log files
+    for old_log_files in glob.glob('{}/{}_workflow_*.log'.format(APP['log_folder'], SITE_ID)):
+        os.remove(old_log_files)
+
+    for handler in [h for h in logger.handlers if isinstance(h, JobLog)]:
+        logger.removeHandler(handler.file_handler)
+        logger.removeHandler(handler)
+        handler.file_handler.close()
+
+    job_log = JobLog(filename, logs)
+    logger.addHandler(job_log.file_handler)
+    logger.addHandler(job_log)
+
+    return job_log
+
+# Archive files a step reads and writes, as declared in the workflow file, e.g.
+#   - action: syllabus_process
+#     reads: [ content.xml ]
+#     writes: [ syllabus.xml, attachment.xml ]
+# Paths are relative to the archive folder and may be glob patterns ('qti/*', 'samigo*.xml').
+# Returns None for steps without a declaration, which are treated as touching everything.
+def step_files(step):
+
+    if 'reads' not in step and 'writes' not in step:
+        return None
+
+    reads = set(step.get('reads') or [])
+    writes = set(step.get('writes') or [])
+
+    return (reads | writes, writes)
+
+# Whether a step has anything to do, from the checks declared in the workflow file, e.g.
+#   - action: lessonbuilder_personalize
+#     when:
+#       lessonbuilder.xml: [ firstname, lastname, fullname ]
+# The step runs if any of the files (relative to the archive folder, glob patterns allowed) contains
+# any of the strings, or for an empty list, if any of the files exists. Strings starting with 're:' are
+# regular expressions, and {name} is replaced with the APP setting, e.g. '{sakai_url}/x/' (use {{ and }}
+# for literal braces).
+# The files are searched as bytes with mmap, without parsing them. Steps without 'when' always run.
+def step_applies(step, folder, APP):
+
+    for (pattern, needles) in (step.get('when') or {}).items():
+        needles = [needle.format_map(APP) for needle in needles or []]
+
+        for path in sorted(glob.glob(os.path.join(glob.escape(folder), pattern))):
+            if not needles or file_contains(path, needles):
+                return True
+
+    return 'when' not in step
+
+@functools.lru_cache(maxsize = None)
+def needle_search(needle):
+
+    if needle.startswith('re:'):
+        regex = re.compile(needle[3:].encode('utf-8'))
+        return lambda data: regex.search(data) is not None
+
+    literal = needle.encode('utf-8')
+    return lambda data: data.find(literal) != -1
+
+def file_contains(path, needles):
+
+    if os.path.getsize(path) == 0:
+        return False
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return any(needle_search(needle)(data) for needle in needles)
+
+def files_overlap(files_a, files_b):
+    for a in files_a:
+        for b in files_b:
+            if a == b or fnmatch(a, b) or fnmatch(b, a):
+                return True
+
+    return False
+
+# Two steps must run in workflow order if either writes a file the other reads or writes
+def steps_conflict(step_a, step_b):
+
+    files_a = step_files(step_a)
+    files_b = step_files(step_b)
+
+    if files_a is None or files_b is None:
+        return True
+
+    (used_a, writes_a) = files_a
+    (used_b, writes_b) = files_b
+
+    return files_overlap(writes_a, used_b) or files_overlap(writes_b, used_a)
+
+# For each step, the set of indexes of earlier steps which have to complete before it can start
+def step_dependencies(steps):
+
+    dependencies = []
+    for i, step in enumerate(steps):
+        dependencies.append({j for j in range(i) if steps_conflict(steps[j], step)})
+
+    return dependencies
+
+# Steps which can run in a worker process: declared files, and not using the in-memory archive session
+def runs_in_pool(step):
+    return step_files(step) is not None and 'use_archive' not in step
+
+# Run the steps concurrently where their declared files allow it, otherwise in workflow order.
+# step_task(step, local) returns a callable which runs the step and returns a StepResult (see run_step),
+# or any value which is true if the step succeeded.
+# Steps for which local is False are run in a process pool, so their callable must be picklable.
+# completed: indexes of steps already completed by a previous run, which are skipped
+# on_result(result) is called with the result of each step. The metrics of steps which ran at the same
+# time as other steps are marked (see lib/metrics.py mark_overlap).
+# on_complete(done) is called with the indexes of completed steps whenever no step is running.
+# Returns None if all the steps completed, otherwise the first step that failed.
+def run_step_graph(steps, step_task, workers, completed = None, on_result = None, on_complete = None):
+
+    dependencies = step_dependencies(steps)
+    done = set(completed or [])
+    pending = [i for i in range(len(steps)) if i not in done]
+    running = {}
+    overlapped = set()
+    failed = None
+
+    # Note which steps run at the same time as step i, which is starting
+    def step_started(i):
+        others = [j for (future, j) in running.items() if not future.done()]
+        if others:
+            overlapped.update(others)
+            overlapped.add(i)
+
+    def step_result(i, result, local):
+        if i in overlapped and isinstance(result, StepResult):
+            mark_overlap(result.metrics, local)
+
+        if on_result is not None:
+            on_result(result)
+
+    def step_done(i):
+        logging.info("Completed workflow step: {}".format(steps[i]['action']))
+        done.add(i)
+
+        if on_complete is not None and not running:
+            on_complete(set(done))
+
+    def collect(futures):
+        nonlocal failed
+
+        for future in futures:
+            i = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.exception(e)
+                result = StepResult(steps[i]['action'], False)
+
+            step_result(i, result, False)
+
+            if result:
+                step_done(i)
+            elif failed is None:
+                failed = steps[i]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+
+        while (pending or running) and failed is None:
+
+            collect([future for future in running if future.done()])
+            if failed is not None:
+                break
+
+            ready = [i for i in pending if dependencies[i] <= done]
+
+            # Start steps in the pool first so that they overlap with any step run in this process
+            for i in ready:
+                if runs_in_pool(steps[i]):
+                    pending.remove(i)
+                    step_started(i)
+                    running[pool.submit(step_task(steps[i], False))] = i
+
+            local = [i for i in ready if i in pending]
+            if local:
+                i = local[0]
+                pending.remove(i)
+                step_started(i)
+
+                result = step_task(steps[i], True)()
+                step_result(i, result, True)
+
+                if result:
+                    step_done(i)
+                else:
+                    failed = steps[i]
+
+            elif running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+        # Let steps which are already running finish before the pool is shut down
+        if running:
+            wait(running)
+            collect(list(running))
+
+    return failed
@@ -3,8 +3,6 @@
 ## This script runs the update workflow for a site
 
 import os
-import re
-import glob
 import json
 import argparse
 import pymysql
@@ -20,9 +18,10 @@ import lib.local_auth
 import lib.db
 import lib.sakai
 
-from config.logging_config import formatter, logger
-from lib.utils import get_log, send_template_email, send_email
+from lib.utils import send_template_email, send_email
 from lib.jira_rest import create_jira, close_jira
+from lib.workflow import run_step, setup_log_file
+from lib.metrics import save_step_metrics
 
 
 def update_record(db_config, link_id, site_id, state, log):
@@ -41,31 +40,6 @@ def update_record(db_config, link_id, site_id, state, log):
         logging.error(f"Could not update migration record {link_id} : {site_id}")
         return None
 
-def check_log_file_for_errors(filename):
-    _file = open(filename, "r")
-    lines = _file.readlines()
-    _file.close()
-
-    # number of ERROR log entries
-    return len(list(filter(lambda s: re.match(r'.*(\[ERROR\]).*',s), lines)))
-
-def setup_log_file(APP, filename, SITE_ID, logs):
-
-    # remove previous log files
-    for old_log_files in glob.glob('{}/{}_workflow_*.log'.format(APP['log_folder'], SITE_ID)):
-        os.remove(old_log_files)
-
-    with open(filename, "w") as f:
-        for log_entry in json.loads(logs):
-            f.write(f'{log_entry}\n')
-        f.close()
-
-    # create a log file so that we can track the progress of the workflow
-    fh = logging.FileHandler(filename)
-    fh.setLevel(logging.INFO)
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-
 def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
 
     provider = json.loads(kwargs['provider'])
@@ -176,10 +150,10 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         failure_detail = record['failure_detail']
 
         log_file = '{}/{}_update_{}.log'.format(APP['log_folder'], site_id, now_st)
-        setup_log_file(APP, log_file, site_id, record['workflow'])
+        job_log = setup_log_file(APP, log_file, site_id, record['workflow'])
 
         workflow_steps = lib.utils.read_yaml(workflow_file)
-        update_record(mdb.db_config, link_id, site_id, state, get_log(log_file))
+        update_record(mdb.db_config, link_id, site_id, state, job_log.get_log())
 
         if workflow_steps['STEPS'] is not None:
 
@@ -193,7 +167,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
                 # Read record again to get any updates from prior workflow steps
                 record = mdb.get_record(link_id=link_id, site_id=site_id)
 
-                if not run_workflow_step(APP, step, site_id, log_file, mdb.db_config,
+                result = run_step(step['action'], run_workflow_step, APP, step, site_id, log_file, mdb.db_config,
                                          to=record['notification'],
                                          started_by=record['started_by_email'],
                                          now_st=now_st,
@@ -207,7 +181,10 @@ def start_workflow(workflow_file, link_id, site_id, APP):
                                          create_course_offering=record['create_course_offering'],
                                          provider=record['provider'],
                                          target_title=record['target_title'],
-                                         report_url=record['report_url']):
+                                         report_url=record['report_url'])
+                save_step_metrics(APP, 'update', link_id, site_id, result)
+
+                if not result:
                     # something went wrong while processing this step
                     raise Exception("On step: {}".format(step['action']))
 
@@ -218,7 +195,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
             logging.warning("There are no workflows steps in this workflow.")
 
         logging.info("\t{}".format(str(timedelta(seconds=(time.time() - start_time)))))
-        update_record(mdb.db_config, link_id, site_id, state, get_log(log_file))
+        update_record(mdb.db_config, link_id, site_id, state, job_log.get_log())
 
     except Exception as e:
 
@@ -238,7 +215,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         logging.exception(e)
 
         state = 'error'
-        log = get_log(log_file)
+        log = job_log.get_log()
         update_record(mdb.db_config, link_id, site_id, state, log)
         create_jira(APP=APP, url=site_url, site_id=site_id, site_title=site_title, jira_state=state,
                     jira_log=log, failure_type=failure_type, failure_detail=failure_detail, user=record['started_by_email'])
@@ -246,7 +223,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
 
     finally:
         if APP['email_logs']:
-            BODY = json.loads(get_log(log_file))
+            BODY = json.loads(job_log.get_log())
             logging.info("Emailing job log for site {}".format(site_id))
             send_email(APP['helpdesk-email'], APP['admin_emails'], f"update_run : {site_title} {state}", '\n<br/>'.join(BODY))
 
@@ -3,8 +3,6 @@
 ## Executes the upload.yaml workflow for uploading to sftp server
 
 import os
-import re
-import glob
 import json
 import argparse
 import pymysql
@@ -19,10 +17,9 @@ import lib.local_auth
 import lib.utils
 import lib.db
 
-from config.logging_config import formatter, logger
 from lib.jira_rest import MyJira
-
-FILE_REGEX = re.compile(r".*(file-.*):\s(.*)")
+from lib.workflow import run_step, setup_log_file
+from lib.metrics import save_step_metrics
 
 def update_record(db_config, link_id, site_id, state, log):
     try:
@@ -59,31 +56,6 @@ def update_record_files(db_config, link_id, site_id, files):
         logging.error(f"Could not update migration record {link_id} : {site_id}")
         return None
 
-def check_log_file_for_errors(filename):
-    _file = open(filename, "r")
-    lines = _file.readlines()
-    _file.close()
-
-    # check if log contains a line with ERROR in it ...
-    return len(list(filter(lambda s: re.match(r'.*(\[ERROR\]).*',s), lines))) > 0
-
-def setup_log_file(APP, filename, SITE_ID, logs):
-
-    # remove previous log files
-    for old_log_files in glob.glob('{}/{}_workflow_*.log'.format(APP['log_folder'], SITE_ID)):
-        os.remove(old_log_files)
-
-    with open(filename, "w") as f:
-        for log_entry in json.loads(logs):
-            f.write(f'{log_entry}\n')
-        f.close()
-
-    # create a log file so that we can track the progress of the workflow
-    fh = logging.FileHandler(filename)
-    fh.setLevel(logging.INFO)
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-
 def transition_jira(APP, site_id):
     with MyJira() as j:
         fields = {
@@ -114,20 +86,7 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
 
     elif step['action'] == "get_files":
         # print("getting files from log file and adding them to DB")
-
-        _file = open(log_file, "r")
-        lines = _file.readlines()
-        _file.close()
-
-        # check if log contains files ...
-        rough_list = list(filter(lambda s: FILE_REGEX.match(s), lines))
-
-        output_files = dict()
-        for file_entry in rough_list:
-            m = re.findall(r'(file-.*):\s(.*)', file_entry)
-            output_files[ m[0][0] ] = m[0][1]
-
-        update_record_files(db_config, kwargs['link_id'], site_id, output_files)
+        update_record_files(db_config, kwargs['link_id'], site_id, kwargs['files'])
 
         return True
     else:
@@ -150,9 +109,7 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
                 new_kwargs['zip_file'] = kwargs['zip_file']
 
             func(**new_kwargs)  # this runs the steps - and writes to log file
-
-            # after execution of workflow step check log to see if it contains an error
-            return not check_log_file_for_errors(log_file)
+            return True
 
         except Exception as e:
             logging.exception(e)
@@ -168,7 +125,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
     now_st = now.strftime("%Y-%m-%d_%H%M%S")
 
     log_file = '{}/{}_workflow_{}.log'.format(APP['log_folder'], site_id, now_st)
-    setup_log_file(APP, log_file, site_id, '[]')
+    job_log = setup_log_file(APP, log_file, site_id, '[]')
 
     record = None
 
@@ -188,7 +145,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
             APP['site']['prefix'] = APP['site']['test_prefix']
 
         log_file = '{}/{}_workflow_{}.log'.format(APP['log_folder'], site_id, now_st)
-        setup_log_file(APP, log_file, site_id, record['workflow'])
+        job_log = setup_log_file(APP, log_file, site_id, record['workflow'])
 
         new_id = '{}_{}'.format(site_id, now.strftime("%Y%m%d_%H%M"))
 
@@ -203,10 +160,14 @@ def start_workflow(workflow_file, link_id, site_id, APP):
                     new_state = step['state']
                     logging.info(f"New state: {new_state}")
 
-                if run_workflow_step(APP, step=step, site_id=site_id, log_file=log_file, db_config=mdb.db_config,
+                result = run_step(step['action'], run_workflow_step, APP, step=step, site_id=site_id, log_file=log_file, db_config=mdb.db_config,
                                          to=record['notification'], started_by=record['started_by_email'],
                                          now_st=now_st, new_id=new_id, import_id=record['imported_site_id'],
-                                         link_id=link_id, title=site_title, zip_file=files['file-fixed-zip']):
+                                         link_id=link_id, title=site_title, zip_file=files['file-fixed-zip'],
+                                         files=job_log.files())
+                save_step_metrics(APP, 'upload', link_id, site_id, result)
+
+                if result:
                     logging.info("Completed workflow step: {}".format(step['action']))
                 else:
                     # something went wrong while processing this step
@@ -227,7 +188,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         logging.error("Upload workflow did not complete")
 
         # Reset to queued state which will cause a retry
-        update_record(mdb.db_config, link_id, site_id, "queued", lib.utils.get_log(log_file))
+        update_record(mdb.db_config, link_id, site_id, "queued", job_log.get_log())
 
     finally:
 
@@ -3,15 +3,18 @@
 ## This script runs the migration workflow for a site
 
 import os
-import re
-import glob
+import copy
 import json
+import shutil
+import tempfile
 import argparse
 import pymysql
 import time
+import statistics
 import importlib
 import logging
 
+from functools import partial
 from pymysql.cursors import DictCursor
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
@@ -21,12 +24,16 @@ import lib.local_auth
 import lib.utils
 import lib.db
 import lib.sakai
+import lib.snapshot
 
-from config.logging_config import formatter, logger
-from lib.utils import send_email, send_template_email, get_log, get_size, create_folders
-from lib.jira_rest import MyJira, create_jira, close_jira
+from lib.archive import SiteArchive
+from lib.checkpoint import WorkflowCheckpoint
+from lib.metrics import save_step_metrics
+from lib.offline import OfflineMigrationDb, offline_services
+from lib.workflow import step_files, step_applies, run_step, run_step_graph, setup_log_file
 
-FILE_REGEX = re.compile(r".*(file-.*):\s(.*)")
+from lib.utils import send_email, send_template_email, get_size, create_folders
+from lib.jira_rest import MyJira, create_jira, close_jira
 
 def update_record(db_config, link_id, site_id, state, log):
 
@@ -104,31 +111,6 @@ def update_record_files(db_config, link_id, site_id, files, zip_file_size):
         logging.error(f"Could not update migration record {link_id} : {site_id}")
         return None
 
-def check_log_file_for_errors(filename):
-    _file = open(filename, "r")
-    lines = _file.readlines()
-    _file.close()
-
-    # check if log contains a line with ERROR in it ...
-    return len(list(filter(lambda s: re.match(r'.*(\[ERROR\]).*',s), lines))) > 0
-
-def setup_log_file(APP, filename, SITE_ID, logs):
-
-    # remove previous log files
-    for old_log_files in glob.glob('{}/{}_workflow_*.log'.format(APP['log_folder'], SITE_ID)):
-        os.remove(old_log_files)
-
-    with open(filename, "w") as f:
-        for log_entry in json.loads(logs):
-            f.write(f'{log_entry}\n')
-        f.close()
-
-    # create a log file so that we can track the progress of the workflow
-    fh = logging.FileHandler(filename)
-    fh.setLevel(logging.INFO)
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-
 # retrieve title of site from Archive site.xml
 def get_title(site_xml):
     with open(site_xml, 'r', encoding='utf8') as f:
@@ -181,18 +163,7 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
     ## get_files
     if step['action'] == "get_files":
         # print("getting files from log file and adding them to DB")
-
-        _file = open(log_file, "r")
-        lines = _file.readlines()
-        _file.close()
-
-        # check if log contains files ...
-        rough_list = list(filter(lambda s: FILE_REGEX.match(s), lines))
-
-        output_files = dict()
-        for file_entry in rough_list:
-            m = re.findall(r'(file-.*):\s(.*)', file_entry)
-            output_files[ m[0][0] ] = m[0][1]
+        output_files = kwargs['files']
 
         if 'file-fixed-zip' in output_files:
             filename = output_files['file-fixed-zip']
@@ -204,6 +175,14 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
 
         return True
 
+    ## flush: write files changed in the shared archive session
+    if step['action'] == "flush":
+        if kwargs.get('archive') is not None:
+            with lib.snapshot.step(step['action']):
+                logging.info(f"Flushed {kwargs['archive'].flush()} archive file(s)")
+
+        return True
+
     ## all other operations defined in work/ modules
 
     try:
@@ -211,6 +190,19 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
         func = getattr(mod, 'run')
         new_kwargs = {'SITE_ID' : site_id, 'APP': APP}
 
+        if kwargs.get('archive') is not None:
+            if 'use_archive' in step:
+                new_kwargs['archive'] = kwargs['archive']
+            else:
+                # This step works on the files on disk, so write out pending changes and re-read afterwards
+                kwargs['archive'].reset()
+
+        # Skip steps with nothing to do, unless the session has changes to the files which aren't written yet
+        if 'when' in step and not ('archive' in new_kwargs and new_kwargs['archive'].is_pending(list(step['when']))):
+            if not step_applies(step, "{}{}-archive".format(APP['archive_folder'], site_id), APP):
+                logging.info(f"Skipping workflow step: {step['action']} (no match in {', '.join(step['when'])})")
+                return True
+
         if 'use_date' in step:
             new_kwargs['now_st'] = kwargs['now_st']
 
@@ -220,20 +212,37 @@ def run_workflow_step(APP, step, site_id, log_file, db_config, **kwargs):
         if 'use_link_id' in step:
             new_kwargs['link_id'] = kwargs['link_id']
 
-        func(**new_kwargs)  # this runs the steps - and writes to log file
+        # The archive files changed by the step are kept in its own snapshot
+        with lib.snapshot.step(step['action'], rollback_failed=APP['workflow']['rollback_failed']):
+            func(**new_kwargs)  # this runs the steps - and writes to log file
 
-        # after execution of workflow step check log to see if it contains an error
-        return not check_log_file_for_errors(log_file)
+        return True
 
     except Exception as e:
         logging.exception(e)
         logging.error("Workflow operation {} = {} ".format(step['action'], e))
         return False
 
+# Skip workflow steps if condition does not match
+def step_enabled(step, test_conversion):
+
+    condition = step['condition'] if 'condition' in step else None
+
+    if condition and condition == "test_conversion" and not test_conversion:
+        logging.info(f"Skipping workflow step: {step['action']} (only for test conversions)")
+        return False
+
+    if condition and condition == "full_conversion" and test_conversion:
+        logging.info(f"Skipping workflow step: {step['action']} (only for full conversions)")
+        return False
+
+    return True
+
 # States
 ## enum('init','starting','exporting','running','importing','updating','completed','error')
 
-def start_workflow(workflow_file, link_id, site_id, APP):
+# results: list to add the StepResult of each step to
+def start_workflow(workflow_file, link_id, site_id, APP, resume = False, results = None):
 
     mdb = lib.db.MigrationDb(APP)
 
@@ -251,7 +260,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
 
     state = 'error'
     log_file = '{}/{}_workflow_{}.log'.format(APP['log_folder'], site_id, now_st)
-    setup_log_file(APP, log_file, site_id, '[]')
+    job_log = setup_log_file(APP, log_file, site_id, '[]')
 
     record = None
 
@@ -264,9 +273,6 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         if (record is None):
             raise Exception(f'Could not find record to start workflow for {link_id} : {site_id}')
 
-        if record['state'] != "exporting":
-            raise Exception(f"Unexpected state {record['state']} for site {record['site_id']}")
-
         test_conversion = False
 
         if (record['test_conversion'] == 1):
@@ -279,9 +285,39 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         failure_detail = record['failure_detail']
 
         log_file = '{}/{}_workflow_{}.log'.format(APP['log_folder'], site_id, now_st)
-        setup_log_file(APP, log_file, site_id, record['workflow'])
+        job_log = setup_log_file(APP, log_file, site_id, record['workflow'])
+
+        workflow_steps = lib.utils.read_yaml(workflow_file)
+        steps = [step for step in (workflow_steps['STEPS'] or []) if step_enabled(step, test_conversion)]
+
+        # Continue from the steps completed by a previous run if the archive is unchanged:
+        # always with --resume, otherwise if the checkpoint is recent enough
+        checkpoint = WorkflowCheckpoint(APP, site_id, steps)
+        resume_hours = APP['workflow']['resume_hours']
+        resuming = (resume or resume_hours > 0) and checkpoint.load(None if resume else resume_hours)
+
+        # A run which failed (error) or was queued again (starting) can be resumed from its checkpoint
+        if record['state'] != "exporting" and not (resuming and record['state'] in ('error', 'starting')):
+            raise Exception(f"Unexpected state {record['state']} for site {record['site_id']}")
+
+        if record['state'] != "exporting":
+            mdb.set_running(link_id, site_id)
+
+        if resuming:
+            now_st = checkpoint.get('now_st')
+            new_id = checkpoint.get('new_id')
+            logging.info(f"Resuming workflow for {site_id} after {len(checkpoint.completed)} / {len(steps)} completed steps")
+
+            # Output files logged by completed steps, for get_files
+            for (file_key, file_name) in checkpoint.get('files', {}).items():
+                logging.info("\t{}: {}".format(file_key, file_name))
+        else:
+            checkpoint.clear()
+            new_id = '{}_{}'.format(site_id, now.strftime("%Y%m%d_%H%M"))
+
+            # Snapshots from a previous run are for a different archive
+            lib.snapshot.clear("{}{}-archive".format(APP['archive_folder'], site_id))
 
-        new_id = '{}_{}'.format(site_id, now.strftime("%Y%m%d_%H%M"))
         update_record_ref_site_id(mdb.db_config, link_id, site_id, new_id)
 
         sakai_ws.set_site_property(site_id, 'brightspace_conversion_date', now.strftime("%Y-%m-%d %H:%M:%S"))
@@ -294,44 +330,65 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         logging.info(f"Starting workflow for {site_id} '{site_title}'")
 
         # run the archiving of the site
-        update_record(mdb.db_config, link_id, site_id, 'exporting', get_log(log_file))
+        update_record(mdb.db_config, link_id, site_id, 'exporting', job_log.get_log())
         state = 'exporting'
 
-        if sakai_ws.archive_site_retry(site_id):
+        if resuming or sakai_ws.archive_site_retry(site_id):
 
             # Create some output files which workflow steps may need
             output_folder = "{}/{}-content".format(APP['output'], site_id)
             create_folders(output_folder)
 
-            workflow_steps = lib.utils.read_yaml(workflow_file)
+            # Parsed archive files shared by the workflow steps
+            archive = SiteArchive(APP, site_id)
 
-            state = 'running'
-            update_record(mdb.db_config, link_id, site_id, state, get_log(log_file))
+            state = checkpoint.get('state', 'running') if resuming else 'running'
+            update_record(mdb.db_config, link_id, site_id, state, job_log.get_log())
 
             if workflow_steps['STEPS'] is not None:
-                for step in workflow_steps['STEPS']:
 
-                    condition = step['condition'] if 'condition' in step else None
+                # Completed steps not yet in the checkpoint, because their changes are only in the archive session
+                unsaved = None
 
-                    # Skip workflow steps if condition does not match
-                    if condition and condition == "test_conversion" and not test_conversion:
-                        logging.info(f"Skipping workflow step: {step['action']} (only for test conversions)")
-                        continue
+                # Record the completed steps, once their changes are written to the archive files
+                def save_checkpoint(completed):
+                    nonlocal unsaved
+
+                    if archive.pending():
+                        unsaved = completed
+                    else:
+                        checkpoint.save(completed, now_st=now_st, new_id=new_id, state=state,
+                                        files=job_log.files())
+                        unsaved = None
 
-                    if condition and condition == "full_conversion" and test_conversion:
-                        logging.info(f"Skipping workflow step: {step['action']} (only for full conversions)")
-                        continue
+                def step_task(step, local = True):
+                    nonlocal state, record
 
                     logging.info("Executing workflow step: {}".format(step['action']))
 
+                    if local and 'use_archive' not in step and unsaved is not None:
+                        # The archive session is written out before this step anyway
+                        with lib.snapshot.step('flush'):
+                            archive.reset()
+                        save_checkpoint(unsaved)
+
                     if 'state' in step:
                         state = step['state']
 
+                    if not local:
+                        # The step runs in a worker process, which works on the files on disk
+                        with lib.snapshot.step('flush'):
+                            archive.release(step_files(step)[0] | set(step.get('when') or []))
+
                     # Read db record for updates from workflow steps
                     record = mdb.get_record(link_id=link_id, site_id=site_id)
 
-                    if run_workflow_step(
+                    return partial(run_step,
+                            step['action'],
+                            run_workflow_step,
                             APP,
+                            watch_folder=archive.folder if APP['metrics']['enabled'] else None,
+                            watch_patterns=step_files(step)[1] if step_files(step) is not None else None,
                             step=step,
                             site_id=site_id,
                             log_file=log_file,
@@ -343,13 +400,47 @@ def start_workflow(workflow_file, link_id, site_id, APP):
                             import_id=record['imported_site_id'],
                             report_url=record['report_url'],
                             link_id=link_id,
-                            title=site_title):
+                            title=site_title,
+                            files=job_log.files(),
+                            archive=archive if local else None)
+
+                def step_result(result):
+                    job_log.add_result(result)
+                    save_step_metrics(APP, 'workflow', link_id, site_id, result)
+
+                    if results is not None:
+                        results.append(result)
+                    logging.debug(f"Workflow step {result}")
+
+                step_workers = APP['workflow']['step_workers']
+
+                if step_workers > 1:
+                    failed_step = run_step_graph(steps, step_task, step_workers, checkpoint.completed, step_result, save_checkpoint)
+                else:
+                    failed_step = None
+                    completed = set(checkpoint.completed)
+                    for (i, step) in enumerate(steps):
+                        if i in completed:
+                            continue
+
+                        result = step_task(step)()
+                        step_result(result)
+
+                        if not result:
+                            failed_step = step
+                            break
 
                         logging.info("Completed workflow step: {}".format(step['action']))
-                    else:
-                        # something went wrong while processing this step
-                        raise Exception("On step: {}".format(step['action']))
+                        completed.add(i)
+                        save_checkpoint(completed)
+
+                if failed_step is not None:
+                    # something went wrong while processing this step
+                    raise Exception("On step: {}".format(failed_step['action']))
 
+                with lib.snapshot.step('flush'):
+                    archive.flush()
+                checkpoint.clear()
                 transition_jira(APP, site_id=site_id)
             else:
                 logging.warning("There are no workflows steps in this workflow.")
@@ -357,7 +448,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
             raise Exception(f'Archive failed for {link_id} : {site_id}')
 
         logging.info("\t{}".format(str(timedelta(seconds=(time.time() - start_time)))))
-        update_record(mdb.db_config, link_id, site_id, state, get_log(log_file))
+        update_record(mdb.db_config, link_id, site_id, state, job_log.get_log())
 
         if test_conversion:
             close_jira(APP, site_id=site_id, comment='Test conversion workflow complete')
@@ -382,7 +473,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
 
         logging.exception(e)
         state = 'error'
-        log = get_log(log_file)
+        log = job_log.get_log()
 
         failure_type = 'exception:workflow'
         failure_detail = str(e)
@@ -393,7 +484,7 @@ def start_workflow(workflow_file, link_id, site_id, APP):
 
     finally:
         if APP['email_logs']:
-            BODY = json.loads(get_log(log_file))
+            BODY = json.loads(job_log.get_log())
             logging.info("Emailing job log for site {}".format(site_id))
             send_email(APP['helpdesk-email'], APP['admin_emails'], f"workflow_run : {site_title} {state}", '\n<br/>'.join(BODY))
 
@@ -402,18 +493,129 @@ def start_workflow(workflow_file, link_id, site_id, APP):
         # Clean up log file
         os.remove(log_file)
 
+# Per-step timings of offline runs: the steps of each run in order, with min / median / max wall time
+# and median CPU time. Steps which run more than once in the workflow are numbered, e.g. xml_valid#2
+def timing_table(runs):
+
+    timings = {}
+    for results in runs:
+        seen = {}
+        for result in results:
+            seen[result.action] = seen.get(result.action, 0) + 1
+            step = result.action if seen[result.action] == 1 else f"{result.action}#{seen[result.action]}"
+            timings.setdefault(step, []).append(result)
+
+    width = max([len(step) for step in timings] + [10])
+    lines = [f"{'step':<{width}}  {'status':<9} {'runs':>4} {'min':>8} {'median':>8} {'max':>8} {'cpu':>8}"]
+
+    for (step, results) in timings.items():
+        wall = [result.duration for result in results]
+        cpu = [result.metrics.get('cpu', 0) for result in results]
+        status = 'completed' if all(results) else 'failed'
+        lines.append(f"{step:<{width}}  {status:<9} {len(results):>4} {min(wall):>8.3f} {statistics.median(wall):>8.3f} "
+                     f"{max(wall):>8.3f} {statistics.median(cpu):>8.3f}")
+
+    totals = [sum(result.duration for result in results) for results in runs]
+    lines.append(f"{'total':<{width}}  {'':<9} {len(runs):>4} {min(totals):>8.3f} {statistics.median(totals):>8.3f} "
+                 f"{max(totals):>8.3f}")
+
+    return '\n'.join(lines)
+
+# APP for a workflow run in a scratch folder
+def offline_app(APP, scratch):
+
+    run_APP = copy.deepcopy(APP)
+    run_APP['archive_folder'] = os.path.join(scratch, '')
+    run_APP['output'] = os.path.join(scratch, 'output', '')
+    run_APP['log_folder'] = os.path.join(scratch, 'log')
+    run_APP['report']['output'] = os.path.join(scratch, 'report')
+    run_APP['metrics']['file'] = os.path.join(scratch, 'metrics.jsonl')
+    run_APP['workflow']['resume_hours'] = 0
+    run_APP['email_logs'] = False
+
+    # Each run does the whole conversion
+    run_APP['lessons']['html_cache'] = None
+
+    create_folders(run_APP['output'])
+    create_folders(run_APP['log_folder'])
+    create_folders(run_APP['report']['output'])
+
+    return run_APP
+
+# Run the workflow against a copy of a site archive folder (<site_id>-archive), with local stand-ins
+# for the migration database, Sakai, Jira and email (see lib/offline.py).
+# Each run works in a new scratch folder. Returns the step results of each run.
+def run_offline(workflow_file, archive_folder, APP, repeat = 1, keep = False):
+
+    archive_folder = os.path.normpath(archive_folder)
+    archive_name = os.path.basename(archive_folder)
+
+    if not archive_name.endswith('-archive') or not os.path.isdir(archive_folder):
+        raise Exception(f"{archive_folder} is not a site archive folder (<site_id>-archive)")
+
+    site_id = archive_name[:-len('-archive')]
+    link_id = 'offline'
+
+    # Import the step modules before the services are replaced, so that they are restored afterwards
+    for step in lib.utils.read_yaml(workflow_file)['STEPS'] or []:
+        try:
+            importlib.import_module('work.{}'.format(step['action']))
+        except ModuleNotFoundError:
+            pass
+
+    runs = []
+    for run in range(repeat):
+
+        scratch = tempfile.mkdtemp(prefix=f"{site_id}-offline-")
+
+        run_APP = offline_app(APP, scratch)
+        shutil.copytree(archive_folder, os.path.join(scratch, archive_name))
+
+        results = []
+        OfflineMigrationDb.add_record(link_id, site_id)
+
+        with offline_services():
+            start_workflow(workflow_file, link_id, site_id, run_APP, results=results)
+
+        runs.append(results)
+
+        if keep:
+            print(f"Run {run + 1}: {scratch}")
+        else:
+            shutil.rmtree(scratch)
+
+    return runs
+
 def main():
     APP = config.config.APP
     parser = argparse.ArgumentParser(description="This script runs the workflow for a site",
                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument("LINK_ID", help="The Link ID to run the workflow for")
-    parser.add_argument("SITE_ID", help="The Site ID to run the workflow for")
+    parser.add_argument("LINK_ID", nargs='?', help="The Link ID to run the workflow for")
+    parser.add_argument("SITE_ID", nargs='?', help="The Site ID to run the workflow for")
     parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('-r', '--resume', action='store_true', help="Continue from the last checkpoint if the site archive is unchanged")
+    parser.add_argument('-o', '--offline', action='store_true', help="Run the workflow against a local archive folder, without the database, Sakai, Jira or email")
+    parser.add_argument('-a', '--archive', help="Site archive folder for --offline (<site_id>-archive)")
+    parser.add_argument('-n', '--repeat', type=int, default=1, help="Number of --offline runs")
+    parser.add_argument('-k', '--keep', action='store_true', help="Keep the scratch folders of --offline runs")
+    parser.add_argument('-w', '--workflow', default="workflow.yaml", help="Workflow file in the config folder")
     args = vars(parser.parse_args())
     APP['debug'] = APP['debug'] or args['debug']
 
-    workflow = os.path.join(APP['config_folder'], "workflow.yaml")
-    start_workflow(workflow, args['LINK_ID'], args['SITE_ID'], APP)
+    workflow = os.path.join(APP['config_folder'], args['workflow'])
+
+    if args['offline']:
+        if not args['archive']:
+            parser.error("--offline requires --archive")
+
+        runs = run_offline(workflow, args['archive'], APP, max(1, args['repeat']), args['keep'])
+        print(timing_table(runs))
+        return
+
+    if not args['LINK_ID'] or not args['SITE_ID']:
+        parser.error("LINK_ID and SITE_ID are required")
+
+    start_workflow(workflow, args['LINK_ID'], args['SITE_ID'], APP, args['resume'])
 
 if __name__ == '__main__':
     main()
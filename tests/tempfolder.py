@@ -0,0 +1,30 @@
+# Base class for tests which work on files in a temporary folder, which is removed after each test
+
+import os
+import shutil
+import tempfile
+import unittest
+
+class TempFolderTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+
+        # Folder for the names given to write() and read(), e.g. a site archive folder in self.tmp
+        self.folder = self.tmp
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    # Write a file (a name in self.folder, or a full path) as UTF-8 without newline translation.
+    # Returns the path.
+    def write(self, name, data):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(data)
+
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.folder, name), 'r', encoding='utf-8', newline='') as f:
+            return f.read()
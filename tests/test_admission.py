@@ -0,0 +1,42 @@
+import unittest
+
+import config.config
+
+from lib.admission import Admission, job_cost, GB
+
+class AdmissionTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.APP = dict(config.config.APP)
+        self.APP['admission'] = {
+            'enabled': True,
+            'budget': {'cpu': 4, 'bandwidth': 100},
+            'cost': {
+                'workflow': {'cpu': {'base': 1, 'per_gb': 1}, 'bandwidth': {'base': 5, 'per_gb': 0}},
+                'upload': {'cpu': {'base': 0, 'per_gb': 0}, 'bandwidth': {'base': 10, 'per_gb': 10}},
+            }
+        }
+
+    def site(self, site_id, size, state = 'starting'):
+        return {'site_id': site_id, 'zip_size': size, 'state': state}
+
+    def test_job_cost(self):
+        self.assertEqual(job_cost(self.APP, 'workflow', 2 * GB), {'cpu': 3, 'bandwidth': 5})
+
+    def test_admit(self):
+        admission = Admission(self.APP, [self.site('running', 1 * GB, 'running')])
+        self.assertEqual(admission.used['cpu'], 2)
+
+        # Too big for the remaining cpu budget, but a smaller site fits
+        self.assertFalse(admission.admit('workflow', self.site('big', 5 * GB)))
+        self.assertTrue(admission.admit('workflow', self.site('small', 1 * GB)))
+        self.assertFalse(admission.admit('workflow', self.site('small2', 1 * GB)))
+
+    def test_admit_oversized(self):
+        # Admitted when nothing else is running
+        admission = Admission(self.APP, [])
+        self.assertTrue(admission.admit('workflow', self.site('huge', 50 * GB)))
+        self.assertFalse(admission.admit('upload', self.site('upload', 1 * GB)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import snapshot
+from lib.archive import SiteArchive, site_archive
+
+class SiteArchiveTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(self.ROOT_DIR + '/test_files/site_merge-archive', self.tmp + '/site_merge-archive')
+        self.APP = {'archive_folder': self.tmp + '/'}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_lazy_parse(self):
+        session = SiteArchive(self.APP, 'site_merge')
+        self.assertFalse(session.is_loaded('lessonbuilder.xml'))
+
+        root = session.root('lessonbuilder.xml')
+        self.assertTrue(session.is_loaded('lessonbuilder.xml'))
+        self.assertIs(root, session.root('lessonbuilder.xml'))
+
+        with self.assertRaises(Exception):
+            session.root('missing.xml')
+
+    def test_flush(self):
+        xml_src = self.tmp + '/site_merge-archive/lessonbuilder.xml'
+        xml_old = self.tmp + '/site_merge-snapshot/001-flush/lessonbuilder.xml'
+
+        session = SiteArchive(self.APP, 'site_merge')
+        root = session.root('lessonbuilder.xml')
+        root.set('flushed', 'yes')
+
+        # Nothing written until marked as changed and flushed
+        with snapshot.step('flush'):
+            self.assertEqual(session.flush(), 0)
+        self.assertFalse(os.path.exists(xml_old))
+
+        # The previous version is kept in the snapshot
+        session.changed('lessonbuilder.xml')
+        with snapshot.step('flush'):
+            self.assertEqual(session.flush(), 1)
+        self.assertTrue(os.path.exists(xml_old))
+
+        with open(xml_src, 'r', encoding='utf8') as f:
+            self.assertIn('flushed="yes"', f.read())
+
+    def test_reset(self):
+        session = SiteArchive(self.APP, 'site_merge')
+        session.root('lessonbuilder.xml').set('flushed', 'yes')
+        session.changed('lessonbuilder.xml')
+
+        self.assertEqual(session.reset(), 1)
+        self.assertFalse(session.is_loaded('lessonbuilder.xml'))
+        self.assertEqual(session.root('lessonbuilder.xml').get('flushed'), 'yes')
+
+    def test_private_session(self):
+        with site_archive(self.APP, 'site_merge') as session:
+            session.root('content.xml').set('private', 'yes')
+            session.changed('content.xml')
+
+        self.assertEqual(SiteArchive(self.APP, 'site_merge').root('content.xml').get('private'), 'yes')
+
+        # A shared session is not flushed by the step
+        shared = SiteArchive(self.APP, 'site_merge')
+        with site_archive(self.APP, 'site_merge', shared) as session:
+            self.assertIs(session, shared)
+            session.root('content.xml').set('private', 'no')
+            session.changed('content.xml')
+
+        self.assertEqual(len(shared.dirty), 1)
+
+if __name__ == '__main__':
+    unittest.main(failfast=True)
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import lib.checkpoint
+from lib.checkpoint import WorkflowCheckpoint
+
+class WorkflowCheckpointTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(self.ROOT_DIR + '/test_files/site_merge-archive', self.tmp + '/site_merge-archive')
+        self.APP = {'archive_folder': self.tmp + '/', 'log_folder': self.tmp}
+        self.steps = [{'action': 'mail'}, {'action': 'xml_valid'}, {'action': 'create_zip'}]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_resume(self):
+        checkpoint = WorkflowCheckpoint(self.APP, 'site_merge', self.steps)
+        self.assertFalse(checkpoint.load())
+
+        checkpoint.save({0, 1}, new_id='site_merge_20240101_1200', state='running', files={})
+
+        resumed = WorkflowCheckpoint(self.APP, 'site_merge', self.steps)
+        self.assertTrue(resumed.load(24))
+        self.assertTrue(resumed.is_completed(1))
+        self.assertFalse(resumed.is_completed(2))
+        self.assertEqual(resumed.get('new_id'), 'site_merge_20240101_1200')
+
+        # Too old
+        self.assertFalse(WorkflowCheckpoint(self.APP, 'site_merge', self.steps).load(-1))
+
+        # Different workflow steps
+        self.assertFalse(WorkflowCheckpoint(self.APP, 'site_merge', self.steps[1:]).load())
+
+        checkpoint.clear()
+        self.assertFalse(WorkflowCheckpoint(self.APP, 'site_merge', self.steps).load())
+
+    def test_archive_changed(self):
+        WorkflowCheckpoint(self.APP, 'site_merge', self.steps).save({0})
+
+        with open(self.tmp + '/site_merge-archive/lessonbuilder.xml', 'a') as f:
+            f.write('\n')
+
+        self.assertFalse(WorkflowCheckpoint(self.APP, 'site_merge', self.steps).load())
+
+    # Only files which have changed are read again
+    def test_save_hashes_changed_files(self):
+        checkpoint = WorkflowCheckpoint(self.APP, 'site_merge', self.steps)
+        checkpoint.save({0})
+
+        with open(self.tmp + '/site_merge-archive/lessonbuilder.xml', 'a') as f:
+            f.write('\n')
+
+        with patch('lib.checkpoint.file_hash', wraps=lib.checkpoint.file_hash) as file_hash:
+            checkpoint.save({0, 1})
+            self.assertEqual([call.args[0].name for call in file_hash.call_args_list], ['lessonbuilder.xml'])
+
+            self.assertTrue(WorkflowCheckpoint(self.APP, 'site_merge', self.steps).load())
+            self.assertEqual(file_hash.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+import lxml.etree as ET
+
+from utils.generate_archive import generate_archive
+
+class GenerateArchiveTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.APP = {'archive_folder': self.tmp + '/', 'sakai_url': 'https://sakai.example.com'}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_counts(self):
+        folder = generate_archive(self.APP, 'site_synthetic', pages=2, items=3, subpages=2, depth=1, collections=4,
+                                  resources=30, assessments=2, questions=3, images=2, forums=1, topics=2,
+                                  assignments=2, syllabus=2, qna=3, attachments=1, body_size=(10, 20))
+
+        self.assertEqual(folder, self.tmp + '/site_synthetic-archive/')
+
+        content = ET.parse(folder + 'content.xml')
+        resources = content.findall('.//resource')
+        self.assertEqual(len(resources), 30)
+        self.assertEqual(len(content.findall('.//collection')), 5)
+
+        for resource in resources:
+            size = os.path.getsize(folder + resource.get('body-location'))
+            self.assertEqual(size, int(resource.get('content-length')))
+            self.assertTrue(10 <= size <= 20)
+
+        # 2 top-level pages with 2 subpages each
+        lessons = ET.parse(folder + 'lessonbuilder.xml')
+        self.assertEqual(len(lessons.findall('.//page')), 6)
+        self.assertEqual(len(lessons.findall('.//page[@parent]')), 4)
+        self.assertEqual(len(lessons.findall(".//item[@type='2']")), 4)
+
+        # Inline images in questions, and attachments for forums, topics, assignments, syllabus and Q&A
+        self.assertEqual(sorted(os.listdir(folder + 'qti')), ['assessment500000.xml', 'assessment500001.xml'])
+        attachments = ET.parse(folder + 'attachment.xml').findall('.//resource')
+        self.assertEqual(len(attachments), 2 * 3 * 2 + 1 + 2 + 2 + 2 + 3)
+
+    def test_seed(self):
+        first = generate_archive(self.APP, 'site_a', seed=5, resources=10)
+        second = generate_archive(self.APP, 'site_b', seed=5, resources=10)
+
+        with open(first + 'lessonbuilder.xml') as a, open(second + 'lessonbuilder.xml') as b:
+            self.assertEqual(a.read().replace('site_a', 'site_b'), b.read())
+
+if __name__ == '__main__':
+    unittest.main()
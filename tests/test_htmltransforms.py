@@ -0,0 +1,219 @@
+import os
+import shutil
+import itertools
+import tempfile
+import unittest
+
+from html import escape
+from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import config.config
+from lib.archive import SiteArchive
+from lib.htmltransforms import HtmlTransforms
+from lib.htmlcache import HtmlCache
+from lib.textrules import TextRules
+from lib.utils import make_well_formed, normalize_soup, PageTemplate
+
+import work.lessonbuilder_strip_formatting
+import work.lessonbuilder_add_css
+import work.lessonbuilder_fix_headings
+import work.lessonbuilder_fix_ol
+import work.lessonbuilder_fix_fontawesome
+import work.lessonbuilder_remove_fa
+import work.lessonbuilder_fix_insight_img
+import work.lessonbuilder_replace_fa_with_svg
+import work.lessonbuilder_replace_content_strings
+import work.lessonbuilder_update_links_attr
+import work.lessonbuilder_highlight_external_links
+import work.lessonbuilder_highlight_tools
+import work.lessonbuilder_add_banner
+
+STEPS = [work.lessonbuilder_strip_formatting, work.lessonbuilder_add_css, work.lessonbuilder_fix_headings,
+         work.lessonbuilder_fix_ol, work.lessonbuilder_fix_fontawesome, work.lessonbuilder_remove_fa,
+         work.lessonbuilder_fix_insight_img, work.lessonbuilder_replace_fa_with_svg, work.lessonbuilder_replace_content_strings,
+         work.lessonbuilder_update_links_attr, work.lessonbuilder_highlight_external_links,
+         work.lessonbuilder_highlight_tools, work.lessonbuilder_add_banner]
+
+ITEMS = [
+    '<p style="background-color: #d9edf7; color: red">Ask Vula Help about the Gradebook</p>',
+    '<h1 class="lessontitle"><span class="fa fa-book"></span> Week 1</h1><h3><span class="fa fa-book"></span> Reading Title</h3>',
+    '<div class="col-sm-10 offset-sm-1"><ol><li style="margin-left: 40.0px">One</li></ol></div><a href="https://vula.uct.ac.za/x">link</a>',
+    '<html><head><title>Old</title></head><body><div class="alert"><div><span class="far fa-lightbulb"></span></div></div><div class="left-insight"><img src="a.png"/></div></body></html>',
+    'Plain text',
+]
+
+def lessons_xml(items):
+    xml_items = "".join(f'<item id="{n}" pageId="1" type="5" html="{escape(html)}"/>' for (n, html) in enumerate(items))
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<archive><lessonbuilder><page pageid="1" title="Home">{xml_items}</page></lessonbuilder></archive>'
+
+class HtmlTransformsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.APP = dict(config.config.APP, archive_folder = self.tmp + '/', debug = False)
+        self.APP['lessons'] = dict(self.APP['lessons'], html_cache = None)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def archive(self, site_id, items):
+        os.makedirs(f'{self.tmp}/{site_id}-archive')
+        with open(f'{self.tmp}/{site_id}-archive/lessonbuilder.xml', 'w') as f:
+            f.write(lessons_xml(items))
+
+    def read(self, site_id):
+        with open(f'{self.tmp}/{site_id}-archive/lessonbuilder.xml', 'r') as f:
+            return f.read()
+
+    # The steps run in a shared session give the same result as the steps run one at a time
+    def test_fused_steps(self):
+        self.archive('site_steps', ITEMS)
+        self.archive('site_fused', ITEMS)
+
+        for step in STEPS:
+            step.run('site_steps', self.APP)
+
+        session = SiteArchive(self.APP, 'site_fused')
+        with patch('lib.htmltransforms.HtmlTransforms.apply', autospec=True, side_effect=HtmlTransforms.apply) as apply:
+            for step in STEPS:
+                step.run('site_fused', self.APP, archive=session)
+
+            self.assertTrue(session.is_pending(['lessonbuilder.xml']))
+            session.flush()
+
+        self.assertEqual(apply.call_count, 1)
+        self.assertEqual(self.read('site_fused'), self.read('site_steps'))
+        self.assertIn('data-type=&quot;tool&quot;', self.read('site_fused'))
+
+    # The same result with the items done in worker processes
+    def test_pool(self):
+        self.archive('site_steps', ITEMS)
+        self.archive('site_pool', ITEMS)
+
+        for step in STEPS:
+            step.run('site_steps', self.APP)
+
+        self.APP['lessons'] = dict(self.APP['lessons'], html_workers = 2)
+        session = SiteArchive(self.APP, 'site_pool')
+
+        with patch('lib.lessons.POOL_MIN_ITEMS', 1), patch('os.cpu_count', return_value=2), \
+             patch('lib.lessons.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            for step in STEPS:
+                step.run('site_pool', self.APP, archive=session)
+
+            session.flush()
+
+        self.assertEqual(pool.call_count, 1)
+
+        self.assertEqual(self.read('site_pool'), self.read('site_steps'))
+
+    # A repeat conversion uses the cached results, until the settings change
+    def test_cache(self):
+        self.archive('site_steps', ITEMS)
+        for step in STEPS:
+            step.run('site_steps', self.APP)
+
+        self.APP['lessons'] = dict(self.APP['lessons'], html_cache = f'{self.tmp}/cache/lessons_html.db')
+
+        def convert(site_id):
+            self.archive(site_id, ITEMS)
+            session = SiteArchive(self.APP, site_id)
+
+            with patch('lib.htmltransforms.HtmlTransforms.transform_html', autospec=True, side_effect=HtmlTransforms.transform_html) as transform:
+                for step in STEPS:
+                    step.run(site_id, self.APP, archive=session)
+                session.flush()
+
+            self.assertEqual(self.read(site_id), self.read('site_steps'))
+            return transform.call_count
+
+        self.assertEqual(convert('site_first'), len(ITEMS))
+        self.assertEqual(convert('site_repeat'), 0)
+
+        self.APP['lessons'] = dict(self.APP['lessons'], highlight_domains = ['example.com'])
+        self.archive('site_changed', ITEMS)
+        session = SiteArchive(self.APP, 'site_changed')
+        with patch('lib.htmltransforms.HtmlTransforms.transform_html', autospec=True, side_effect=HtmlTransforms.transform_html) as transform:
+            for step in STEPS:
+                step.run('site_changed', self.APP, archive=session)
+            session.flush()
+        self.assertEqual(transform.call_count, len(ITEMS))
+
+    # The least recently used results are removed first
+    def test_cache_evict(self):
+        cache = HtmlCache(f'{self.tmp}/lessons_html.db')
+        cache.max_size = 2500
+
+        with patch('time.time', side_effect=itertools.count(1)):
+            cache.put([('a', ('a' * 1000, [True]))])
+            cache.put([('b', ('b' * 1000, [False]))])
+            self.assertEqual(cache.get(['a', 'x']), {'a': ('a' * 1000, [True])})
+            cache.put([('c', ('c' * 1000, [True]))])
+
+        self.assertEqual(sorted(cache.get(['a', 'b', 'c'])), ['a', 'c'])
+        cache.close()
+
+        self.assertIsNone(HtmlCache.open(None))
+
+    # A well-formed page is returned as it is, the same as changing a copy of it
+    def test_well_formed(self):
+        for text in ITEMS:
+            html = make_well_formed(make_well_formed(BeautifulSoup(text, 'html.parser'), 'Home'), 'Home')
+
+            with patch.object(PageTemplate, 'is_well_formed', return_value=False):
+                expected = str(make_well_formed(html, 'Home'))
+
+            self.assertIs(make_well_formed(html, 'Home'), html)
+            self.assertEqual(str(html), expected)
+
+            self.assertIsNot(make_well_formed(html, 'Other'), html)
+
+    def test_normalize_soup(self):
+        html = BeautifulSoup('<div><p> </p><pre>  </pre></div>', 'html.parser')
+        html.div['class'] = 'one  two'
+        html.p.append('\n  ')
+        html.p.append('')
+        html.pre.append('x')
+
+        normalize_soup(html)
+        self.assertEqual(html.div['class'], ['one', 'two'])
+        self.assertEqual(html.p.contents, ['\n'])
+        self.assertEqual(html.pre.contents, ['  x'])
+        self.assertEqual(str(html), str(BeautifulSoup(str(html), 'html.parser')))
+
+    def test_apply_html(self):
+        transforms = HtmlTransforms()
+        transforms.dom('bold', lambda html, title: html.p.wrap(html.new_tag('b')))
+        transforms.text('upper', lambda text: text.upper())
+        transforms.dom('nothing', lambda html, title: False, well_formed=True)
+        transforms.dom('title', lambda html, title: html.b.append(title))
+
+        # Parsed again after the text transform
+        self.assertEqual(transforms.apply_html('<p>x</p>', 'Home'), '<b><p>X</p>Home</b>')
+        self.assertEqual([transform.hits for transform in transforms.transforms], [1, 1, 0, 1])
+
+    # Other steps see the changes made by the transforms before them
+    def test_order(self):
+        self.archive('site_order', ['<p>a</p>'])
+        session = SiteArchive(self.APP, 'site_order')
+
+        transforms = HtmlTransforms()
+        transforms.text('b', lambda text: text.replace('a', 'b'))
+        session.transform_lessons(transforms)
+
+        rules = TextRules()
+        rules.literal('c', '&lt;p&gt;b', '&lt;p&gt;c')
+        session.rewrite_text(rules)
+
+        session.transform_lessons(transforms)
+        self.assertEqual(session.root('lessonbuilder.xml').find('.//item').get('html'), '<p>c</p>')
+
+        session.transform_lessons(transforms)
+        session.release(['lessonbuilder.xml'])
+        self.assertFalse(session.pending())
+        self.assertIn('html="&lt;p&gt;c&lt;/p&gt;"', self.read('site_order'))
+
+if __name__ == '__main__':
+    unittest.main()
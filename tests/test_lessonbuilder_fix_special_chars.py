@@ -1,9 +1,9 @@
 import os
-import shutil
 import unittest
 import argparse
 
 import config.config
+from lib import snapshot
 from work.lessonbuilder_rewrite_urls import main, fix_unwanted_url_chars
 from unittest.mock import patch
 from bs4 import BeautifulSoup
@@ -23,9 +23,8 @@ class LessonbuilderUpdateUrlRewriteTestCase(unittest.TestCase):
     def test_url_rewrite_chars_fix(self, *_):
         main()
         xml_src = self.ROOT_DIR + '/test_files/site_123456-archive/lessonbuilder.xml'
-        xml_old = self.ROOT_DIR + '/test_files/site_123456-archive/lessonbuilder.old'
         self.check_urls_chars(xml_src=xml_src)
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(self.ROOT_DIR + '/test_files/site_123456-archive')
 
     def check_urls_chars(self, xml_src: str):
         tree = ET.parse(xml_src)
@@ -1,9 +1,9 @@
 import argparse
 import os
-import shutil
 import unittest
 
 import config.config
+from lib import snapshot
 from unittest.mock import patch
 from work.lessonbuilder_merge_items import main
 from bs4 import BeautifulSoup
@@ -20,7 +20,6 @@ class AddResourcesHtmlTestCase(unittest.TestCase):
     def test_add_resource_html(self, _):
         main()
         xml_src = self.ROOT_DIR + '/test_files/site_resource_html-archive/lessonbuilder.xml'
-        xml_old = self.ROOT_DIR + '/test_files/site_resource_html-archive/lessonbuilder.xml.orig'
         file_path = os.path.join(xml_src)
         with open(file_path, "r", encoding="utf8") as fp:
             soup = BeautifulSoup(fp, 'xml')
@@ -30,4 +29,4 @@ class AddResourcesHtmlTestCase(unittest.TestCase):
             # self.assertIsNotNone(div)
             #paragraphs = div.find_all('a')
             # self.assertEqual(8, len(paragraphs))
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(self.ROOT_DIR + '/test_files/site_resource_html-archive')
@@ -1,9 +1,9 @@
 import os
-import shutil
 import unittest
 import argparse
 
 import config.config
+from lib import snapshot
 from work.lessonbuilder_merge_page import main
 from unittest.mock import patch
 from bs4 import BeautifulSoup
@@ -18,9 +18,8 @@ class MergePageTestCase(unittest.TestCase):
     def test_main_multiple_questions(self, *_):
         main()
         xml_src = self.ROOT_DIR + '/test_files/site_merge-archive/lessonbuilder.xml'
-        xml_old = self.ROOT_DIR + '/test_files/site_merge-archive/lessonbuilder.old'
         self.check_converted(xml_src=xml_src)
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(self.ROOT_DIR + '/test_files/site_merge-archive')
 
 
     def check_converted(self, xml_src):
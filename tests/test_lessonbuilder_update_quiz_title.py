@@ -1,9 +1,9 @@
 import os
-import shutil
 import unittest
 import argparse
 
 import config.config
+from lib import snapshot
 from work.lessonbuilder_update_quiz_title import main
 from unittest.mock import patch
 import xml.etree.ElementTree as ET
@@ -20,18 +20,16 @@ class GenerateConversionReportTestCase(unittest.TestCase):
     def test_main_multiple_questions(self, *_):
         main()
         xml_src = self.ROOT_DIR + '/test_files/site_12345-archive/lessonbuilder.xml'
-        xml_old = self.ROOT_DIR + '/test_files/site_12345-archive/lessonbuilder.old'
         self.check_converted(xml_src=xml_src)
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(self.ROOT_DIR + '/test_files/site_12345-archive')
 
     @patch('argparse.ArgumentParser.parse_args',
            return_value=argparse.Namespace(SITE_ID='site_1234', debug=False))
     def test_main_single_question(self, *_):
         main()
         xml_src = self.ROOT_DIR + '/test_files/site_1234-archive/lessonbuilder.xml'
-        xml_old = self.ROOT_DIR + '/test_files/site_1234-archive/lessonbuilder.old'
         self.check_converted(xml_src=xml_src)
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(self.ROOT_DIR + '/test_files/site_1234-archive')
 
     def check_converted(self, xml_src: str):
         tree = ET.parse(xml_src)
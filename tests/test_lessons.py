@@ -0,0 +1,177 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import lxml.etree as ET
+
+from lib.lessons import LessonsDocument, ItemType, map_text_items
+from lib.conversion import lessons_tools
+
+import work.lessonbuilder_set_parent
+import work.lessonbuilder_reduce_levels
+
+LESSONS = '''<?xml version="1.0" encoding="UTF-8"?>
+<archive site="site_lessons">
+  <lessonbuilder>
+    <page pageid="1" title="Home">
+      <item id="10" pageId="1" type="5" html="&lt;p&gt;Use the &lt;span data-type=&quot;tool&quot;&gt;Gradebook&lt;/span&gt;&lt;/p&gt;"/>
+      <item id="11" pageId="1" type="2" sakaiid="2" name="Week 1"/>
+    </page>
+    <page pageid="2" parent="0" title="Week 1">
+      <item id="20" pageId="2" type="5" html="&lt;p&gt;Week 1&lt;/p&gt;"/>
+      <item id="21" pageId="2" type="2" sakaiid="3" name="Reading"/>
+    </page>
+    <page pageid="3" title="Reading">
+      <item id="20" pageId="3" type="5" html="&lt;p&gt;Duplicate id&lt;/p&gt;"/>
+    </page>
+  </lessonbuilder>
+</archive>
+'''
+
+class LessonsDocumentTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.folder = self.tmp + '/site_lessons-archive/'
+        os.makedirs(self.folder)
+
+        self.xml_src = self.folder + 'lessonbuilder.xml'
+        with open(self.xml_src, 'w') as f:
+            f.write(LESSONS)
+
+        self.APP = {'archive_folder': self.tmp + '/', 'debug': False, 'lessons': {'max_depth': 2}}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_lookups(self):
+        lessons = LessonsDocument.parse(self.xml_src)
+
+        self.assertEqual(lessons.page('2').get('title'), 'Week 1')
+        self.assertIsNone(lessons.page('4'))
+        self.assertEqual([item.get('id') for item in lessons.items_of_type(ItemType.TEXT)], ['10', '20', '20'])
+
+        # First of the duplicates, but titles come from the item's own page
+        self.assertEqual(lessons.item('20').get('pageId'), '2')
+        self.assertEqual([lessons.page_title(item) for item in lessons.items_of_type(ItemType.TEXT)], ['Home', 'Week 1', 'Reading'])
+
+        self.assertEqual(lessons_tools(lessons), ['Home'])
+        self.assertIsNone(lessons_tools(None))
+
+    def test_changes(self):
+        lessons = LessonsDocument.parse(self.xml_src)
+
+        lessons.set(lessons.page('3'), 'parent', '2')
+        self.assertEqual([page.get('title') for page in lessons.subpages_of('2')], ['Reading'])
+
+        lessons.set(lessons.item('11'), 'type', ItemType.TEXT)
+        self.assertEqual(lessons.items_of_type(ItemType.PAGE), [lessons.item('21')])
+
+        # Other lookups keep their order
+        lessons.set(lessons.item('10'), 'id', '12')
+        lessons.set(lessons.page('1'), 'title', 'Start')
+        self.assertEqual([item.get('id') for item in lessons.items_of_type(ItemType.TEXT)], ['12', '20', '20', '11'])
+        self.assertEqual(lessons.item('12').get('id'), '12')
+        self.assertIsNone(lessons.item('10'))
+
+        # Removing a page removes its items
+        lessons.remove(lessons.page('2'))
+        self.assertIsNone(lessons.page('2'))
+        self.assertEqual(lessons.item('20').get('pageId'), '3')
+        self.assertEqual(lessons.subpages_of('0'), [])
+
+        page = ET.fromstring('<page pageid="4" parent="1" title="Added"><item id="40" pageId="4" type="5" html=""/></page>')
+        lessons.add(lessons.root.find('lessonbuilder'), page, 0)
+        self.assertIs(lessons.page_of(lessons.item('40')), page)
+        self.assertEqual(lessons.subpages_of('1'), [page])
+        self.assertEqual(lessons.root.find('lessonbuilder')[0], page)
+
+    def test_map_text_items(self):
+        lessons = LessonsDocument.parse(self.xml_src)
+        pid = os.getpid()
+
+        # In worker processes, with a function which can't be pickled
+        with patch('os.cpu_count', return_value=2):
+            items = map_text_items(lessons, lambda html, title: f"{title}: {os.getpid() != pid}", workers=2, min_items=1)
+        self.assertEqual([item.get('html') for item in items], ['Home: True', 'Week 1: True', 'Reading: True'])
+
+        # Too few items for the pool
+        found = []
+        map_text_items(lessons, lambda html, title: html.upper(), lambda item, result: found.append(result), workers=2)
+        self.assertEqual(found, ['HOME: TRUE', 'WEEK 1: TRUE', 'READING: TRUE'])
+
+    def test_set_parent(self):
+        work.lessonbuilder_set_parent.run('site_lessons', self.APP)
+
+        lessons = LessonsDocument.parse(self.xml_src)
+        self.assertEqual(lessons.page('2').get('parent'), '1')
+        self.assertEqual(lessons.page('3').get('parent'), '2')
+        self.assertIsNone(lessons.page('1').get('parent'))
+
+    def test_reduce_levels(self):
+        work.lessonbuilder_set_parent.run('site_lessons', self.APP)
+
+        # A character which is sanitized
+        with open(self.xml_src, 'r', encoding='utf-8') as f:
+            before = f.read().replace('title="Home"', 'title="Home\u00a0page"')
+        with open(self.xml_src, 'w', encoding='utf-8') as f:
+            f.write(before)
+
+        # Nothing changed in a dry run
+        work.lessonbuilder_reduce_levels.run('site_lessons', self.APP, dry_run=True)
+        with open(self.xml_src, 'r') as f:
+            self.assertEqual(f.read(), before)
+
+        work.lessonbuilder_reduce_levels.run('site_lessons', self.APP)
+
+        lessons = LessonsDocument.parse(self.xml_src)
+        self.assertIsNone(lessons.page('3'))
+
+        # Moved to the end of the level 2 page, with new ids and sequences
+        moved = lessons.page('2').findall('item')[-1]
+        self.assertEqual((moved.get('id'), moved.get('pageId'), moved.get('sequence')), ('22', '2', '2'))
+        self.assertEqual(moved.get('name'), 'Week 1 - Reading')
+
+    def test_reduce_levels_cycle(self):
+        lessons = LessonsDocument.parse(self.xml_src)
+        lessons.set(lessons.page('1'), 'parent', '3')
+        lessons.set(lessons.page('2'), 'parent', '1')
+        lessons.set(lessons.page('3'), 'parent', '2')
+
+        # Each page is visited once
+        moves = work.lessonbuilder_reduce_levels.reduce_levels(lessons, lessons.page('1'), 1)
+        self.assertEqual([(child.get('pageid'), page.get('pageid'), count) for (child, page, count) in moves],
+                         [('3', '2', 1), ('2', '1', 3)])
+
+    # Time to flatten a site with many pages below one level 2 page grows linearly
+    def test_reduce_levels_scaling(self):
+
+        def lessons_pages(count):
+            pages = ['<page pageid="1" title="Home"><item id="1" pageId="1" type="2" sakaiid="2"/></page>',
+                     '<page pageid="2" parent="1" title="Week 1"/>']
+            for pageid in range(3, count + 3):
+                pages.append(f'<page pageid="{pageid}" parent="2" title="Page {pageid}">'
+                             f'<item id="{pageid * 10}" pageId="{pageid}" type="5" html=""/>'
+                             f'<item id="{pageid * 10 + 1}" pageId="{pageid}" type="5" html=""/></page>')
+
+            return LessonsDocument(ET.ElementTree(ET.fromstring(f"<archive><lessonbuilder>{''.join(pages)}</lessonbuilder></archive>")))
+
+        times = []
+        for count in (500, 4000):
+            lessons = lessons_pages(count)
+            start = time.perf_counter()
+            moves = work.lessonbuilder_reduce_levels.reduce_levels(lessons, lessons.page('1'), 1)
+            times.append(time.perf_counter() - start)
+
+            self.assertEqual(len(moves), count + 1)
+            self.assertEqual(len(lessons.items_of_type(ItemType.TEXT)), count * 2)
+
+        # 8 times the pages, well under the 64 times the time if it were quadratic
+        self.assertLess(times[1], 24 * max(times[0], 0.005))
+
+if __name__ == '__main__':
+    unittest.main()
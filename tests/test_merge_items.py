@@ -10,7 +10,7 @@ class MergeTestCases(unittest.TestCase):
     def setUp(self) -> None:
         self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    @patch('os.rename')
+    @patch('work.lessonbuilder_merge_items.replace_file')
     @patch('argparse.ArgumentParser.parse_args', return_value=argparse.Namespace(SITE_ID='site_id', debug=True))
     def test_read_xml(self, *_):
         work.lessonbuilder_merge_items.main()
@@ -0,0 +1,64 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from lib.metrics import StepMetrics, save_step_metrics
+from lib.workflow import run_step
+
+class StepMetricsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.APP = {'metrics': {'enabled': True, 'file': self.tmp + '/metrics/steps.jsonl'}}
+
+        with open(self.tmp + '/unchanged.xml', 'w') as f:
+            f.write('<a/>')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_files_changed(self):
+        metrics = StepMetrics(self.tmp)
+        metrics.start()
+
+        with open(self.tmp + '/lessonbuilder.xml', 'w') as f:
+            f.write('<lessonbuilder/>')
+
+        result = metrics.stop()
+        self.assertEqual(result['files_changed'], 1)
+        self.assertEqual(result['bytes_changed'], 16)
+        self.assertGreaterEqual(result['wall'], 0)
+        self.assertGreater(result['process_max_rss'], 0)
+
+    # Only the files matching the patterns are counted
+    def test_files_changed_patterns(self):
+        metrics = StepMetrics(self.tmp, {'qti/*'})
+        metrics.start()
+
+        os.mkdir(self.tmp + '/qti')
+        with open(self.tmp + '/qti/assessment1.xml', 'w') as f:
+            f.write('<questestinterop/>')
+        with open(self.tmp + '/unchanged.xml', 'w') as f:
+            f.write('<changed/>')
+
+        result = metrics.stop()
+        self.assertEqual(result['files_changed'], 1)
+        self.assertEqual(result['bytes_changed'], 18)
+
+    def test_save_step_metrics(self):
+        result = run_step('noop', lambda: True, watch_folder=self.tmp)
+        save_step_metrics(self.APP, 'workflow', 'link', 'site', result)
+        save_step_metrics(self.APP, 'workflow', 'link', 'site', result)
+
+        with open(self.APP['metrics']['file']) as f:
+            entries = [json.loads(line) for line in f]
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['action'], 'noop')
+        self.assertEqual(entries[0]['status'], 'completed')
+        self.assertEqual(entries[0]['files_changed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
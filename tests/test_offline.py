@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import config.config
+import lib.db
+import lib.sakai
+import lib.offline
+import lib.utils
+import run_workflow
+
+from lib.checkpoint import WorkflowCheckpoint
+from lib.offline import OfflineMigrationDb, OfflineSakai, offline_services
+
+class OfflineTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(self.ROOT_DIR + '/test_files/site_merge-archive', self.tmp + '/site_merge-archive')
+        os.mkdir(self.tmp + '/site_merge-archive/qti')
+
+        with open(self.tmp + '/site_merge-archive/site.xml', 'w') as f:
+            f.write('<archive><site id="site_merge" title="Merge"><provider providerId="ABC1001F,2024"/></site></archive>')
+
+        self.workflow = self.tmp + '/workflow.yaml'
+        with open(self.workflow, 'w') as f:
+            f.write("STEPS:\n"
+                    "  - action: mail\n"
+                    "    template: 'start'\n"
+                    "    subject: 'Started'\n"
+                    "  - action: xml_valid\n"
+                    "  - action: site_set_provider\n"
+                    "    use_link_id: 1\n"
+                    "  - action: xml_valid\n"
+                    "  - action: get_files\n")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_offline_services(self):
+        with offline_services():
+            self.assertIs(lib.db.MigrationDb, OfflineMigrationDb)
+            self.assertIs(lib.sakai.Sakai, OfflineSakai)
+
+        self.assertIsNot(lib.db.MigrationDb, OfflineMigrationDb)
+        self.assertIsNot(run_workflow.send_template_email, lib.offline.offline_email)
+
+    def test_site_title(self):
+        sakai = OfflineSakai({'sakai_url': 'https://sakai', 'archive_folder': self.tmp + '/'})
+        self.assertEqual(sakai.get_site_title('site_merge'), 'Merge')
+        self.assertTrue(sakai.archive_site_retry('site_merge'))
+        self.assertFalse(sakai.archive_site_retry('other'))
+
+    def test_run_offline(self):
+        runs = run_workflow.run_offline(self.workflow, self.tmp + '/site_merge-archive', config.config.APP, repeat=2)
+
+        self.assertEqual(len(runs), 2)
+        self.assertEqual([result.action for result in runs[0]],
+                         ['mail', 'xml_valid', 'site_set_provider', 'xml_valid', 'get_files'])
+        self.assertTrue(all(all(results) for results in runs))
+
+        # The archive itself is not changed
+        self.assertEqual(sorted(os.listdir(self.tmp + '/site_merge-archive')), ['content.xml', 'lessonbuilder.xml', 'qti', 'site.xml'])
+
+        table = run_workflow.timing_table(runs).split('\n')
+        self.assertTrue(table[2].startswith('xml_valid '))
+        self.assertTrue(table[4].startswith('xml_valid#2 '))
+        self.assertTrue(table[-1].startswith('total '))
+
+    # A failed workflow (record in state error) continues from its checkpoint with --resume, without
+    # archiving the site again
+    def test_resume_error(self):
+        APP = run_workflow.offline_app(config.config.APP, self.tmp)
+        steps = lib.utils.read_yaml(self.workflow)['STEPS']
+        WorkflowCheckpoint(APP, 'site_merge', steps).save({0, 1}, now_st='2024-01-01_120000', new_id='site_merge_1',
+                                                          state='running', files={})
+
+        OfflineMigrationDb.add_record('offline', 'site_merge', 'error')
+        results = []
+
+        with offline_services(), patch.object(OfflineSakai, 'archive_site_retry') as archive_site_retry:
+            run_workflow.start_workflow(self.workflow, 'offline', 'site_merge', APP, resume=True, results=results)
+
+        archive_site_retry.assert_not_called()
+        self.assertEqual([result.action for result in results], ['site_set_provider', 'xml_valid', 'get_files'])
+        self.assertTrue(all(results))
+        self.assertFalse(WorkflowCheckpoint(APP, 'site_merge', steps).load())
+
+        # Not without a checkpoint
+        OfflineMigrationDb.add_record('offline', 'site_merge', 'error')
+        results = []
+
+        with offline_services():
+            run_workflow.start_workflow(self.workflow, 'offline', 'site_merge', APP, resume=True, results=results)
+
+        self.assertEqual(results, [])
+
+    def test_not_an_archive(self):
+        with self.assertRaises(Exception):
+            run_workflow.run_offline(self.workflow, self.tmp, config.config.APP)
+
+if __name__ == '__main__':
+    unittest.main()
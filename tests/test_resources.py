@@ -1,11 +1,17 @@
 import os
+import shutil
+import tempfile
 import unittest
 import argparse
 
 import config.config
 from unittest.mock import patch
 
-from lib.resources import resource_exists, get_content_displayname, get_content_owner
+import lib.resources
+from lib import snapshot
+from lib.resources import resource_exists, get_content_displayname, get_content_owner, get_resource_ids
+from lib.resources import ContentIndex, content_batch, find_orphans
+from work.content_remove_orphans import run as remove_orphans
 
 class ResourcesSpecialCharsTestCase(unittest.TestCase):
 
@@ -45,5 +51,162 @@ class ResourcesSpecialCharsTestCase(unittest.TestCase):
         self.assertTrue(resource_exists(site_folder, resource_id))
 
 
+ATTACHMENTS = """<?xml version="1.0" encoding="UTF-8"?>
+<archive><org.sakaiproject.content.api.ContentHostingService>
+<resource id="/attachment/a1/Tests_Quizzes/q1/fig1.png" rel-id="a1/Tests_Quizzes/q1/fig1.png" body-location="a1"/>
+<resource id="/attachment/a2/Tests_Quizzes/q1/sound.wav" rel-id="a2/Tests_Quizzes/q1/sound.wav" body-location="a2"/>
+</org.sakaiproject.content.api.ContentHostingService></archive>
+"""
+
+class ContentIndexTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.tmp = tempfile.mkdtemp()
+        self.site_folder = self.tmp + '/site_resource_special-archive'
+        shutil.copytree(self.ROOT_DIR + '/test_files/site_resource_special-archive', self.site_folder)
+
+        with open(self.site_folder + '/attachment.xml', 'w') as f:
+            f.write(ATTACHMENTS)
+
+        with open(self.site_folder + '/qna.html', 'w') as f:
+            f.write('<html></html>')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_lookups(self):
+        content = ContentIndex.load(self.site_folder + '/content.xml')
+
+        resource_id = "/group/4bc86af2-7ed2-4659-bc86-9cdbda4fb494/apos'trophe2/test'file.txt.txt"
+        el = content.find(resource_id)
+        self.assertIs(content.find_rel_id(el.get('rel-id')), el)
+        self.assertIs(content.find_body_location(el.get('body-location')), el)
+        self.assertEqual(content.find_filename("test'file.txt.txt"), [el])
+        self.assertEqual(content.displayname(resource_id), "test'file.txt.txt")
+        self.assertEqual(content.creator(resource_id), "marquard")
+        self.assertIsNone(content.property(resource_id, "zaphod"))
+
+        # Cached until the file changes
+        self.assertIs(ContentIndex.load(self.site_folder + '/content.xml'), content)
+        os.utime(self.site_folder + '/content.xml', ns=(1, 1))
+        self.assertIsNot(ContentIndex.load(self.site_folder + '/content.xml'), content)
+
+    def test_batch(self):
+        SITE_ID = '4bc86af2-7ed2-4659-bc86-9cdbda4fb494'
+        content_src = self.site_folder + '/content.xml'
+        attach_src = self.site_folder + '/attachment.xml'
+        resources = len(get_resource_ids(content_src))
+
+        with content_batch(self.site_folder) as batch:
+            batch.add_resource(SITE_ID, self.site_folder + '/qna.html', 'qna.html', 'text/html', 'qna')
+            batch.move_attachments(SITE_ID, 'quiz_images', {'/attachment/a1/Tests_Quizzes/q1/fig1.png': f'/group/{SITE_ID}/quiz_images/abc/fig1.png'})
+            batch.rename_attachments(SITE_ID, 'quiz_images', {'/attachment/a2/Tests_Quizzes/q1/sound.wav': '/quiz_images/def/sound.wav'})
+
+            # Not written until the batch ends
+            self.assertEqual(len(lib.resources.ET.parse(content_src).findall('.//resource')), resources)
+
+        # Read back from the files
+        lib.resources._cache.clear()
+        content = ContentIndex.load(content_src)
+        attachments = ContentIndex.load(attach_src)
+
+        self.assertEqual(len(content.resource_ids()), resources + 2)
+        self.assertTrue(content.exists(f'/group/{SITE_ID}/qna/'))
+        self.assertTrue(content.exists(f'/group/{SITE_ID}/quiz_images/'))
+        self.assertEqual(content.find(f'/group/{SITE_ID}/quiz_images/abc/fig1.png').get('rel-id'), 'quiz_images/abc/fig1.png')
+        self.assertEqual(content.displayname(f'/group/{SITE_ID}/qna/qna.html'), 'qna.html')
+        self.assertEqual(attachments.resource_ids(), ['/quiz_images/def/sound.wav'])
+
+    def test_batch_failure(self):
+        attach_src = self.site_folder + '/attachment.xml'
+
+        with self.assertRaises(Exception):
+            with content_batch(self.site_folder) as batch:
+                batch.rename_attachments('site', 'quiz_images', {'/attachment/a2/Tests_Quizzes/q1/sound.wav': '/quiz_images/def/sound.wav'})
+                batch.move_attachments('site', 'quiz_images', {'/attachment/zaphod': '/group/site/quiz_images/zaphod'})
+
+        # Nothing written, and the changed index is not kept
+        with open(attach_src) as f:
+            self.assertEqual(f.read(), ATTACHMENTS)
+
+        self.assertEqual(len(ContentIndex.load(attach_src).resource_ids()), 2)
+
+def orphans_content(site):
+    resources = [('a.pdf', 'application/pdf'), ('a.pdf.bak', 'application/pdf'), ('My File.docx', 'application/msword'),
+                 ('folder/in-folder.txt', 'text/plain'), ('html/page.html', 'text/html'), ('html/image.png', 'image/png'),
+                 ('unused.png', 'image/png')]
+
+    xml = '<?xml version="1.0" encoding="UTF-8"?>\n<archive><org.sakaiproject.content.api.ContentHostingService>\n'
+    for folder in ('', 'folder/', 'html/'):
+        xml += f'<collection id="/group/{site}/{folder}" rel-id="{folder}"/>\n'
+
+    for (n, (name, content_type)) in enumerate(resources):
+        xml += f'<resource id="/group/{site}/{name}" rel-id="{name}" content-type="{content_type}" content-length="{n + 1}" body-location="body{n}"/>\n'
+
+    return xml + '</org.sakaiproject.content.api.ContentHostingService></archive>\n'
+
+class OrphansTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.site = 'site_orphans'
+        self.site_folder = f'{self.tmp}/{self.site}-archive/'
+        os.makedirs(self.site_folder + 'qti')
+
+        with open(self.site_folder + 'content.xml', 'w') as f:
+            f.write(orphans_content(self.site))
+
+        for n in range(7):
+            with open(self.site_folder + f'body{n}', 'w') as f:
+                f.write('x' * (n + 1))
+
+        # a.pdf plain, "My File.docx" URL-quoted, the folder as a whole, and the HTML page
+        with open(self.site_folder + 'lessonbuilder.xml', 'w') as f:
+            f.write(f'<lessons><item sakaiid="/group/{self.site}/a.pdf"/><item sakaiid="/group/{self.site}/folder/"/>'
+                    f'<item html="&lt;a href=&quot;/access/content/group/{self.site}/My%20File.docx&quot;&gt;"/></lessons>')
+
+        with open(self.site_folder + 'qti/assessment1.xml', 'w') as f:
+            f.write(f'<mattext>https://sakai.example.com/access/content/group/{self.site}/html/page.html</mattext>')
+
+        self.APP = {'archive_folder': self.tmp + '/', 'content': {'remove_orphans': False}}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def test_find_orphans(self):
+        (used, orphaned, whole) = find_orphans(self.site_folder)
+
+        prefix = f'/group/{self.site}/'
+        self.assertEqual(sorted(used), [prefix + 'My File.docx', prefix + 'a.pdf', prefix + 'html/page.html'])
+        self.assertEqual(sorted(orphaned), [prefix + 'a.pdf.bak', prefix + 'folder/in-folder.txt', prefix + 'html/image.png', prefix + 'unused.png'])
+        self.assertEqual(orphaned[prefix + 'unused.png'], '7')
+        self.assertIn(prefix + 'folder/', whole)
+        self.assertNotIn(prefix, whole)
+
+    def test_remove_orphans(self):
+        prefix = f'/group/{self.site}/'
+
+        # Report only
+        remove_orphans(self.site, self.APP)
+        self.assertEqual(len(ContentIndex.load(self.site_folder + 'content.xml').resource_ids()), 7)
+
+        self.APP['content']['remove_orphans'] = True
+        with snapshot.step('content_remove_orphans'):
+            remove_orphans(self.site, self.APP)
+
+        # Not the file in the referenced folder, or next to the referenced HTML page
+        lib.resources._cache.clear()
+        content = ContentIndex.load(self.site_folder + 'content.xml')
+        self.assertFalse(content.exists(prefix + 'a.pdf.bak'))
+        self.assertFalse(content.exists(prefix + 'unused.png'))
+        self.assertTrue(content.exists(prefix + 'folder/in-folder.txt'))
+        self.assertTrue(content.exists(prefix + 'html/image.png'))
+        self.assertEqual(len(content.resource_ids()), 5)
+
+        self.assertFalse(os.path.exists(self.site_folder + 'body6'))
+        self.assertTrue(os.path.exists(self.site_folder + 'body5'))
+        self.assertTrue(os.path.exists(self.tmp + f'/{self.site}-snapshot/001-content_remove_orphans/content.xml'))
+
 if __name__ == '__main__':
     unittest.main(failfast=True)
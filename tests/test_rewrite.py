@@ -0,0 +1,72 @@
+import os
+import unittest
+
+from lib.rewrite import RefRewriter, ref_regex, rewrite_refs
+from lib.utils import rewrite_tool_ref
+
+from tempfolder import TempFolderTestCase
+
+QTI = ('<mattext><![CDATA[<img src="https://sakai.example.com/access/content/attachment/a1/Tests_Quizzes/q1/fig.png">'
+       '<img src="https://sakai.example.com/access/content/attachment/a1/Tests_Quizzes/q1/fig.png2">'
+       '<a href="/attachment/a1/Tests_Quizzes/q2/notes">notes</a>]]></mattext>\r\n')
+
+class RewriteTestCase(TempFolderTestCase):
+
+    def test_regex(self):
+        ids = ('/a/b', '/a/b.png', '/a/c', '/x(1)+?.txt', "/it's")
+        regex = ref_regex(tuple(sorted(ids)))
+
+        # The longest id matches
+        self.assertEqual(regex.findall('/a/b.png /a/b /a/c /a/d /x(1)+?.txt /it\'s'),
+                         ['/a/b.png', '/a/b', '/a/c', '/x(1)+?.txt', "/it's"])
+
+    def test_rewrite_refs(self):
+        path = self.write('assessment1.xml', QTI)
+        mapping = {
+            '/attachment/a1/Tests_Quizzes/q1/fig.png': '/group/site/quiz_images/abc/fig.png',
+            '/attachment/a1/Tests_Quizzes/q1/fig.png2': '/group/site/quiz_images/def/fig.png2',
+            '/attachment/a1/Tests_Quizzes/q2/notes': '/attachment/a1/Tests_Quizzes/q2/notes.txt',
+            '/attachment/zaphod': '/attachment/beeblebrox',
+        }
+
+        found = rewrite_refs(path, mapping)
+        self.assertEqual(found, list(mapping)[:3])
+
+        # Each id replaced once, including an id which is a prefix of another
+        expected = QTI.replace('/attachment/a1/Tests_Quizzes/q1/fig.png2', '/group/site/quiz_images/def/fig.png2')
+        expected = expected.replace('/attachment/a1/Tests_Quizzes/q1/fig.png"', '/group/site/quiz_images/abc/fig.png"')
+        expected = expected.replace('/attachment/a1/Tests_Quizzes/q2/notes', '/attachment/a1/Tests_Quizzes/q2/notes.txt')
+        self.assertEqual(self.read(path), expected)
+
+        # Nothing to replace: not rewritten
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(rewrite_refs(path, {'/attachment/zaphod': '/attachment/beeblebrox'}), [])
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+
+        self.assertEqual(rewrite_refs(os.path.join(self.tmp, 'missing.xml'), mapping), [])
+
+    def test_rewriter(self):
+        qti = [self.write(f'assessment{n}.xml', QTI) for n in range(3)]
+        pools = self.write('samigo_question_pools.xml', '<pool/>')
+
+        refs = RefRewriter()
+        refs.add(qti + [pools], '/attachment/a1/Tests_Quizzes/q2/notes', '/attachment/a1/Tests_Quizzes/q2/notes.txt')
+        refs.add(qti[:1], '/attachment/a1/Tests_Quizzes/q1/fig.png', '/group/site/fig.png')
+
+        changed = refs.rewrite()
+        self.assertEqual(sorted(changed), sorted(qti))
+        self.assertEqual(changed[qti[0]], ['/attachment/a1/Tests_Quizzes/q2/notes', '/attachment/a1/Tests_Quizzes/q1/fig.png'])
+        self.assertEqual(self.read(pools), '<pool/>')
+
+        # Done
+        self.assertEqual(refs.rewrite(), {})
+
+    def test_rewrite_tool_ref(self):
+        path = self.write('announcement.xml', QTI)
+
+        self.assertTrue(rewrite_tool_ref(path, '/attachment/a1/Tests_Quizzes/q2/notes', '/notes'))
+        self.assertFalse(rewrite_tool_ref(path, '/attachment/a1/Tests_Quizzes/q2/notes', '/notes'))
+        self.assertIn('href="/notes"', self.read(path))
+
+if __name__ == '__main__':
+    unittest.main()
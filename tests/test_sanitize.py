@@ -0,0 +1,94 @@
+import os
+import re
+import glob
+import unittest
+
+import lib.sanitize
+from lib.sanitize import Sanitizer, ARCHIVE, QTI
+from lib.utils import remove_unwanted_characters
+
+from tempfolder import TempFolderTestCase
+
+# The replacements made by remove_unwanted_characters before lib/sanitize.py
+def chained_replace(data):
+    data = data.replace('\x1e', '').replace('&amp;#xb;' ,'').replace('&#xb;','').replace('&amp;#x2;' ,'').replace('&#x2;' ,'').replace('&#160;','').replace('&#11;','').replace('&amp;#x8;' ,'')
+    data = data.replace('&amp;#x1;', '').replace('&#x1;' ,'').replace('&#x1e;' ,'').replace('&amp;#x1f;', '').replace('&#x1f;' ,'').replace('&amp;#x4;', '').replace('&#x4;' ,'')
+    data = data.replace('&amp;#x7;', '').replace('&#x7;' ,'')
+    data = data.replace('&#xa;', '').replace('&#x9;', ' ')
+    data = data.replace('&#14;','ffi').replace('&#12;','fi')
+    data = data.replace(u"\u00A0", " ").replace(u"\u0020", " ").replace(u"\u2003", " ").replace(u"\u2009", " ").replace(u"\u200A", " ").replace(u"\u202F", " ").replace(u"\u205F", " ").replace(u"\u3000", " ")
+    data = data.replace("\\u000B", "").replace("\\u2018", "'").replace("\\u2019", "'")
+    data = re.sub(r'\s&\s', '$amp;', data)
+    return data
+
+SAMPLE = ('<item html="&lt;p&gt;A &amp;#xb;B&#x9;C&#xa;&#14;cient &#12;nal\x1e&lt;/p&gt;" '
+          'name="Tom &amp; Jerry" title="fish & chips\u3000&#x1f;done">'
+          '<attributes>{"text":"\\u2018quoted\\u2019\\u000B"}</attributes></item>\r\n')
+
+class SanitizeTestCase(TempFolderTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.chunk_size = lib.sanitize.CHUNK_SIZE
+
+    def tearDown(self) -> None:
+        lib.sanitize.CHUNK_SIZE = self.chunk_size
+        super().tearDown()
+
+    def test_text(self):
+        self.assertEqual(ARCHIVE.text(SAMPLE), chained_replace(SAMPLE))
+        self.assertEqual(QTI.text('a&#11;b\u000Bc'), 'abc')
+
+    def test_chunks(self):
+        # Tokens and matches across chunk boundaries
+        data = SAMPLE * 20
+        expected = chained_replace(data)
+
+        for chunk_size in (1, 2, 3, 5, 7, 64):
+            lib.sanitize.CHUNK_SIZE = chunk_size
+            path = self.write(f'chunks_{chunk_size}.xml', data)
+
+            self.assertTrue(ARCHIVE.file(path))
+            self.assertEqual(self.read(path), expected)
+
+    def test_archive_files(self):
+        lib.sanitize.CHUNK_SIZE = 1000
+
+        for xml_file in glob.glob(self.ROOT_DIR + '/test_files/*-archive/*.xml'):
+            with open(xml_file, 'r', encoding='utf-8', newline='') as f:
+                data = f.read()
+
+            path = self.write('archive.xml', data)
+            remove_unwanted_characters(path)
+            self.assertEqual(self.read(path), chained_replace(data), xml_file)
+
+    def test_clean_file(self):
+        path = self.write('clean.xml', chained_replace(SAMPLE))
+        os.utime(path, ns=(1, 1))
+
+        self.assertFalse(remove_unwanted_characters(path))
+
+        # Not rewritten
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertEqual(os.listdir(self.tmp), ['clean.xml'])
+
+    def test_repeated(self):
+        sanitizer = Sanitizer({}, {'&#11;': ''})
+        path = self.write('repeated.xml', 'a&#11;b')
+
+        self.assertTrue(sanitizer.file(path))
+        self.assertFalse(sanitizer.file(path))
+        self.assertEqual(self.read(path), 'ab')
+
+        # Rewritten with the same content: still clean
+        self.write('repeated.xml', 'ab')
+        self.assertFalse(sanitizer.file(path))
+
+        # Changed again
+        self.write('repeated.xml', 'ab&#11;')
+        self.assertTrue(sanitizer.file(path))
+        self.assertEqual(self.read(path), 'ab')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import unittest
+
+import lxml.etree as ET
+
+from lib import snapshot
+
+import work.attachment_missing_ext
+
+from tempfolder import TempFolderTestCase
+
+class SnapshotTestCase(TempFolderTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.site_folder = self.folder = self.tmp + '/site_snap-archive'
+        os.makedirs(self.site_folder + '/qti')
+
+        self.write('lessonbuilder.xml', '<archive version="0"/>')
+        self.write('qti/assessment1.xml', '<questestinterop version="0"/>')
+
+    def path(self, name):
+        return os.path.join(self.site_folder, name)
+
+    def update(self, name, version):
+        with snapshot.open_replace(self.path(name)) as f:
+            f.write(f'<archive version="{version}"/>')
+
+    def test_keep(self):
+        with snapshot.step('step_one'):
+            tree = ET.ElementTree(ET.fromstring('<archive version="1"/>'))
+            snapshot.write_tree(tree, self.path('lessonbuilder.xml'))
+            self.update('lessonbuilder.xml', 2)
+
+        # Hard link to the first version, which the new file replaced
+        kept = self.tmp + '/site_snap-snapshot/001-step_one/lessonbuilder.xml'
+        self.assertEqual(os.stat(kept).st_nlink, 1)
+        with open(kept, 'r') as f:
+            self.assertEqual(f.read(), '<archive version="0"/>')
+
+        self.assertEqual(self.read('lessonbuilder.xml'), '<archive version="2"/>')
+        self.assertEqual(snapshot.steps(self.site_folder), ['001-step_one'])
+        self.assertEqual(sorted(os.listdir(self.site_folder)), ['lessonbuilder.xml', 'qti'])
+
+        # Not kept for files outside an archive
+        outside = self.tmp + '/other.xml'
+        with snapshot.step('step_two'):
+            with snapshot.open_replace(outside) as f:
+                f.write('<other/>')
+            self.assertFalse(snapshot.keep(outside))
+
+        self.assertEqual(snapshot.steps(self.site_folder), ['001-step_one'])
+
+    def test_rollback(self):
+        with snapshot.step('step_one'):
+            self.update('lessonbuilder.xml', 1)
+
+        with snapshot.step('step_two'):
+            self.update('lessonbuilder.xml', 2)
+            self.update('qti/assessment1.xml', 2)
+
+        with snapshot.step('step_three'):
+            self.update('qti/assessment1.xml', 3)
+
+        self.assertEqual(snapshot.steps(self.site_folder), ['001-step_one', '002-step_two', '003-step_three'])
+
+        # step_two and the steps after it
+        self.assertEqual(snapshot.rollback(self.site_folder, 'step_two'), ['lessonbuilder.xml', 'qti/assessment1.xml'])
+        self.assertEqual(self.read('lessonbuilder.xml'), '<archive version="1"/>')
+        self.assertEqual(self.read('qti/assessment1.xml'), '<questestinterop version="0"/>')
+        self.assertEqual(snapshot.steps(self.site_folder), ['001-step_one'])
+
+        with self.assertRaises(Exception):
+            snapshot.rollback(self.site_folder, 'step_three')
+
+        # All the steps
+        self.assertEqual(snapshot.rollback(self.site_folder), ['lessonbuilder.xml'])
+        self.assertEqual(self.read('lessonbuilder.xml'), '<archive version="0"/>')
+        self.assertFalse(os.path.exists(snapshot.snapshot_folder(self.site_folder)))
+
+    def test_rollback_failed(self):
+        with snapshot.step('step_one'):
+            self.update('lessonbuilder.xml', 1)
+
+        with self.assertRaises(ValueError):
+            with snapshot.step('step_two', rollback_failed=True):
+                self.update('lessonbuilder.xml', 2)
+                self.update('qti/assessment1.xml', 2)
+                raise ValueError('failed')
+
+        # Only the failed step's changes are restored
+        self.assertEqual(self.read('lessonbuilder.xml'), '<archive version="1"/>')
+        self.assertEqual(self.read('qti/assessment1.xml'), '<questestinterop version="0"/>')
+        self.assertEqual(snapshot.steps(self.site_folder), ['001-step_one'])
+
+        # A new file is discarded if writing it fails
+        with self.assertRaises(ValueError):
+            with snapshot.open_replace(self.path('lessonbuilder.xml')) as f:
+                f.write('<archive')
+                raise ValueError('failed')
+
+        self.assertEqual(self.read('lessonbuilder.xml'), '<archive version="1"/>')
+        self.assertFalse(os.path.exists(self.path('lessonbuilder.xml.new')))
+
+    # attachment.xml and the tool XML referring to the attachments are restored together
+    def test_rollback_attachment_missing_ext(self):
+        self.write('attachment.xml', '<archive><resource id="/attachment/abc/Announcements/image" content-type="image/png"/></archive>')
+        self.write('announcement.xml', '<archive><announcement attachment="/attachment/abc/Announcements/image"/></archive>')
+        (attachments, announcements) = (self.read('attachment.xml'), self.read('announcement.xml'))
+
+        APP = {'archive_folder': self.tmp + '/', 'attachment': {'paths': {'Announcements': 'announcement.xml'}, 'content-types': {}}}
+
+        with snapshot.step('attachment_missing_ext'):
+            work.attachment_missing_ext.run('site_snap', APP)
+
+        self.assertIn('image.png', self.read('attachment.xml'))
+        self.assertIn('image.png', self.read('announcement.xml'))
+
+        self.assertEqual(snapshot.rollback(self.site_folder, 'attachment_missing_ext'), ['announcement.xml', 'attachment.xml'])
+        self.assertEqual((self.read('attachment.xml'), self.read('announcement.xml')), (attachments, announcements))
+
+    def test_clear(self):
+        with snapshot.step('step_one'):
+            self.update('lessonbuilder.xml', 1)
+
+        snapshot.clear(self.site_folder + '/')
+        self.assertFalse(os.path.exists(snapshot.snapshot_folder(self.site_folder)))
+        self.assertEqual(snapshot.rollback(self.site_folder), [])
+
+if __name__ == '__main__':
+    unittest.main()
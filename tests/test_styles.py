@@ -0,0 +1,43 @@
+import unittest
+import cssutils
+
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+from lib.styles import remove_properties, remove_style_properties
+
+NAMES = ('background-color', 'color', 'font-size', 'font-family')
+
+class StylesTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        remove_properties.cache_clear()
+
+    def test_remove_properties(self):
+        self.assertEqual(remove_properties('color: red; text-align:center', NAMES), 'text-align: center')
+        self.assertEqual(remove_properties('margin-left: 40.0px; COLOR: red', ('margin-left',)), 'color: red')
+        self.assertEqual(remove_properties('background: url("a;b.png"); color: red', NAMES), 'background: url("a;b.png")')
+        self.assertIsNone(remove_properties('', NAMES))
+
+    # Styles with nothing left aren't parsed, and each style is only parsed once
+    def test_cssutils(self):
+        with patch('cssutils.parseStyle', wraps=cssutils.parseStyle) as parse:
+            self.assertIsNone(remove_properties('COLOR: red; font-size:12px;', NAMES))
+            self.assertIsNone(remove_properties('color: red !important;\nbackground-color: #d9edf7', NAMES))
+            self.assertEqual(parse.call_count, 0)
+
+            for n in range(3):
+                self.assertEqual(remove_properties('color: red; /* x */ margin: 0', NAMES), '/* x */\nmargin: 0')
+            self.assertEqual(parse.call_count, 1)
+
+    def test_remove_style_properties(self):
+        html = BeautifulSoup('<p style="color: red; text-align: center">a</p><p style="color: red">b</p>', 'html.parser')
+
+        for p in html.find_all('p'):
+            remove_style_properties(p, NAMES)
+
+        self.assertEqual(str(html), '<p style="text-align: center">a</p><p>b</p>')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,10 @@
 import os
-import shutil
 import unittest
 import argparse
 import base64
 
 import config.config
+from lib import snapshot
 from work.syllabus_process import main
 from unittest.mock import patch
 import xml.etree.ElementTree as ET
@@ -21,9 +21,12 @@ class SyllabusRejiggerTestCase(unittest.TestCase):
     @patch('argparse.ArgumentParser.parse_args',
            return_value=argparse.Namespace(SITE_ID='syllabus', debug=False))
     def test_main_multiple_questions(self, *_):
-        main()
-        xml_src = self.ROOT_DIR + '/test_files/syllabus-archive/syllabus.xml'
-        xml_old = self.ROOT_DIR + '/test_files/syllabus-archive/syllabus.old'
+        with snapshot.step('syllabus_process'):
+            main()
+
+        site_folder = self.ROOT_DIR + '/test_files/syllabus-archive'
+        xml_src = site_folder + '/syllabus.xml'
+        xml_old = snapshot.snapshot_folder(site_folder) + '/001-syllabus_process/syllabus.xml'
 
         new_tree = ET.parse(xml_src)
         new_root = new_tree.getroot()
@@ -45,7 +48,7 @@ class SyllabusRejiggerTestCase(unittest.TestCase):
         self.assertEqual(1, len(body_soup.find_all('h1')))
         self.assertEqual(3, len(body_soup.find_all('h2')))
 
-        shutil.move(xml_old, xml_src)
+        snapshot.rollback(site_folder)
 
 if __name__ == '__main__':
     unittest.main(failfast=True)
@@ -0,0 +1,106 @@
+import os
+import unittest
+
+from unittest.mock import patch
+
+from lib.archive import SiteArchive
+from lib.textrules import TextRules
+
+import work.site_change_id
+import work.site_replace_emoji
+import work.site_resolve_shorturls
+
+from tempfolder import TempFolderTestCase
+
+SITE = '''<?xml version="1.0" encoding="UTF-8"?>
+<archive site="site_text"><site id="site_text" description="&lt;img src=&quot;https://sakai.example.com/library/editor/ckeditor/plugins/smiley/images/smile.png&quot;&gt;"/></archive>
+'''
+
+LESSONS = '''<?xml version="1.0" encoding="UTF-8"?>
+<archive site="site_text"><item html="&lt;a href=&quot;https://sakai.example.com/x/AbCdEf&quot;&gt;https://sakai.example.com/x/AbCdEf https://sakai.example.com/x/ZzZzZz&lt;/a&gt;"/></archive>
+'''
+
+class TextRulesTestCase(TempFolderTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.folder = self.tmp + '/site_text-archive/'
+        os.makedirs(self.folder + 'qti')
+
+        self.write('site.xml', SITE)
+        self.write('lessonbuilder.xml', LESSONS)
+        self.write('user.xml', '<archive/>')
+        self.write('qti/assessment1.xml', '<questestinterop><qtimetadata>site_text</qtimetadata></questestinterop>\r\n')
+
+        self.APP = {'archive_folder': self.tmp + '/', 'sakai_url': 'https://sakai.example.com', 'debug': False}
+
+    def test_rules(self):
+        resolved = []
+
+        def resolve(url):
+            resolved.append(url)
+            return 'https://example.com/' + url[-1] if url.endswith('f') else None
+
+        rules = TextRules()
+        rules.literal('literal', 'a', 'b')
+        rules.regex('regex', r'b+', lambda m: str(len(m.group(0))))
+        rules.resolve('resolve', r'/x/[a-z]+', resolve)
+
+        # Rules apply in order
+        self.assertEqual(rules.apply_text('aab /x/f /x/g /x/f'), '3 https://example.com/f /x/g https://example.com/f')
+        self.assertEqual([rule.hits for rule in rules.rules], [2, 1, 2])
+
+        # Resolved once each
+        self.assertEqual(resolved, ['/x/f', '/x/g'])
+
+    # Short URLs are resolved when the rules are applied
+    @patch('work.site_resolve_shorturls.resolve_redirect', side_effect=lambda url: 'https://example.com/page' if url.endswith('AbCdEf') else None)
+    def test_single_pass(self, resolve_redirect):
+        session = SiteArchive(self.APP, 'site_text')
+        os.utime(self.folder + 'user.xml', ns=(1, 1))
+
+        work.site_resolve_shorturls.run('site_text', self.APP, archive=session)
+        work.site_replace_emoji.run('site_text', self.APP, archive=session)
+        work.site_change_id.run('site_text', self.APP, 'site_text_new', archive=session)
+
+        # Nothing written until the session is flushed
+        self.assertTrue(session.pending())
+        self.assertEqual(self.read('lessonbuilder.xml'), LESSONS)
+
+        # One pass over the files for the three steps
+        with patch('lib.textrules.TextRules.apply_file', autospec=True, side_effect=TextRules.apply_file) as apply_file:
+            self.assertEqual(session.flush(), 3)
+
+        self.assertEqual(apply_file.call_count, 4)
+        self.assertFalse(session.pending())
+
+        self.assertIn('site="site_text_new"', self.read('site.xml'))
+        self.assertIn('/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/smiley/smile.png', self.read('site.xml'))
+        self.assertIn('https://sakai.example.com/x/ZzZzZz', self.read('lessonbuilder.xml'))
+        self.assertEqual(resolve_redirect.call_count, 2)
+        self.assertEqual(self.read('qti/assessment1.xml'), '<questestinterop><qtimetadata>site_text_new</qtimetadata></questestinterop>\r\n')
+
+        # Unchanged file not rewritten
+        self.assertEqual(os.stat(self.folder + 'user.xml').st_mtime_ns, 1)
+
+        # Changed trees are read again
+        self.assertFalse(session.is_loaded('site.xml'))
+        self.assertEqual(session.root('site.xml').get('site'), 'site_text_new')
+
+    def test_tree_after_rules(self):
+        session = SiteArchive(self.APP, 'site_text')
+        root = session.root('lessonbuilder.xml')
+        root.set('changed', 'yes')
+        session.changed('lessonbuilder.xml')
+
+        rules = TextRules()
+        rules.literal('site_id', 'site_text', 'site_text_new')
+        session.rewrite_text(rules)
+
+        # Tree changes are written first, and the rules are applied before a file is loaded again
+        root = session.root('lessonbuilder.xml')
+        self.assertEqual(root.get('site'), 'site_text_new')
+        self.assertEqual(root.get('changed'), 'yes')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import time
+import unittest
+
+from unittest.mock import patch
+
+from lib.workers import ForkedJob, start_job
+
+def job_ok(APP, job_type, link_id, site_id, resume = False):
+    return
+
+def job_fails(APP, job_type, link_id, site_id, resume = False):
+    raise Exception("workflow failed")
+
+class ForkedJobTestCase(unittest.TestCase):
+
+    def wait(self, job):
+        for i in range(100):
+            if job.poll() is not None:
+                break
+            time.sleep(0.05)
+
+        return job.returncode
+
+    def test_success(self):
+        with patch('lib.workers.run_job', job_ok):
+            job = ForkedJob({}, 'workflow', 'link', 'site')
+
+        self.assertGreater(job.pid, 0)
+        self.assertEqual(self.wait(job), 0)
+
+    def test_failure(self):
+        with patch('lib.workers.run_job', job_fails):
+            job = ForkedJob({}, 'workflow', 'link', 'site')
+
+        self.assertEqual(self.wait(job), 1)
+
+    def test_start_job_resume(self):
+        APP = {'preload_jobs': False, 'script_folder': '/scripts'}
+
+        with patch('lib.workers.Popen') as popen:
+            start_job(APP, 'workflow', 'link', 'site', resume=True)
+
+        self.assertEqual(popen.call_args[0][0], ['python3', '/scripts/run_workflow.py', 'link', 'site', '--resume'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+from functools import partial
+
+import lib.utils
+import config.config
+import work.test_and_quiz_replace_wiris
+import work.test_and_quiz_QP_replace_wiris
+
+from lib.workflow import steps_conflict, step_dependencies, step_applies, runs_in_pool, run_step_graph, run_step, JobLog
+
+# Appends the step action to a file, so that the order of steps can be checked
+def record_step(output, action, result = True):
+    with open(output, 'a') as f:
+        f.write(action + '\n')
+
+    return result
+
+# A step which takes some time
+def slow_step(seconds):
+    time.sleep(seconds)
+    return True
+
+# A step which logs a warning, an error and an output file
+def noisy_step(fail = False):
+    logging.warning("Missing attachment")
+    logging.error("Could not parse item")
+    logging.info("\tfile-fixed-zip: /tmp/site.zip")
+
+    if fail:
+        raise Exception("step failed")
+
+    return True
+
+class WorkflowTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        (fd, self.output) = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.output)
+
+    def test_steps_conflict(self):
+        mail = {'action': 'mail'}
+        lessons = {'action': 'lessonbuilder_fix_ol', 'writes': ['lessonbuilder.xml']}
+        merge = {'action': 'lessonbuilder_merge_page', 'reads': ['content.xml'], 'writes': ['lessonbuilder.xml']}
+        tq = {'action': 'test_and_quiz_replace_wiris', 'writes': ['qti/*']}
+        tq_file = {'action': 'test_and_quiz_fix', 'reads': ['qti/assessment1.xml']}
+
+        # Undeclared steps conflict with everything
+        self.assertTrue(steps_conflict(mail, lessons))
+        self.assertTrue(steps_conflict(lessons, merge))
+        self.assertFalse(steps_conflict(lessons, tq))
+        self.assertTrue(steps_conflict(tq, tq_file))
+        self.assertFalse(steps_conflict({'action': 'export_qti', 'reads': [], 'writes': []}, merge))
+
+    def test_step_applies(self):
+        folder = tempfile.mkdtemp()
+        os.makedirs(folder + '/qti')
+
+        with open(folder + '/content.xml', 'w') as f:
+            f.write('<resource content-type="text/url" content-length="0"/>')
+        with open(folder + '/qti/assessment1.xml', 'w') as f:
+            f.write('<mattext>https://sakai.example.com/x/AbCdEf</mattext>')
+        open(folder + '/qti/empty.xml', 'w').close()
+
+        APP = {'sakai_url': 'https://sakai.example.com'}
+
+        def applies(when):
+            return step_applies({'action': 'step', 'when': when}, folder, APP)
+
+        try:
+            self.assertTrue(step_applies({'action': 'step'}, folder, APP))
+
+            # Literals, regular expressions and APP settings
+            self.assertTrue(applies({'content.xml': ['text/url']}))
+            self.assertTrue(applies({'content.xml': ['re:content-length="0{{1,2}}"']}))
+            self.assertFalse(applies({'content.xml': ['re:content-length="1"', 'text/html']}))
+            self.assertTrue(applies({'qti/*': ['{sakai_url}/x/']}))
+            self.assertFalse(applies({'*.xml': ['{sakai_url}/x/']}))
+
+            # Exists
+            self.assertTrue(applies({'content.xml': []}))
+            self.assertFalse(applies({'lessonbuilder.xml': [], 'qti/*.zip': None}))
+        finally:
+            shutil.rmtree(folder)
+
+    # The Tests and Quizzes wiris steps sanitize the files whether or not they contain any wiris
+    def test_tq_replace_wiris_applies(self):
+        folder = tempfile.mkdtemp()
+        archive = folder + '/site-archive'
+        os.makedirs(archive + '/qti')
+
+        with open(archive + '/qti/assessment1.xml', 'w', encoding='utf-8') as f:
+            f.write('<questestinterop><mattext texttype="text/plain">a\u00a0b</mattext></questestinterop>')
+        with open(archive + '/samigo_question_pools.xml', 'w', encoding='utf-8') as f:
+            f.write('<QuestionPools><mattext>c\u00a0d</mattext></QuestionPools>')
+
+        APP = dict(config.config.APP, archive_folder=folder + '/')
+        steps = {step['action']: step for step in lib.utils.read_yaml(f"{APP['config_folder']}/workflow.yaml")['STEPS']}
+
+        try:
+            for (action, module) in (('test_and_quiz_replace_wiris', work.test_and_quiz_replace_wiris),
+                                     ('test_and_quiz_QP_replace_wiris', work.test_and_quiz_QP_replace_wiris)):
+                self.assertTrue(step_applies(steps[action], archive, APP))
+                module.run('site', APP)
+
+            for (path, text) in (('/qti/assessment1.xml', 'a b'), ('/samigo_question_pools.xml', 'c d')):
+                with open(archive + path, encoding='utf-8') as f:
+                    self.assertIn(text, f.read())
+        finally:
+            shutil.rmtree(folder)
+
+    def test_step_dependencies(self):
+        steps = [
+            {'action': 'mail'},
+            {'action': 'lessonbuilder_fix_ol', 'writes': ['lessonbuilder.xml'], 'use_archive': 1},
+            {'action': 'test_and_quiz_replace_wiris', 'writes': ['qti/*']},
+            {'action': 'lessonbuilder_add_banner', 'writes': ['lessonbuilder.xml'], 'use_archive': 1},
+            {'action': 'create_zip'},
+        ]
+
+        self.assertEqual(step_dependencies(steps), [set(), {0}, {0}, {0, 1}, {0, 1, 2, 3}])
+        self.assertFalse(runs_in_pool(steps[1]))
+        self.assertTrue(runs_in_pool(steps[2]))
+
+    def test_run_step_graph(self):
+        steps = [
+            {'action': 'first'},
+            {'action': 'pool', 'writes': ['qti/*']},
+            {'action': 'local', 'writes': ['lessonbuilder.xml'], 'use_archive': 1},
+            {'action': 'last'},
+        ]
+
+        def step_task(step, local):
+            return partial(record_step, self.output, step['action'])
+
+        self.assertIsNone(run_step_graph(steps, step_task, 2))
+
+        with open(self.output) as f:
+            actions = f.read().split()
+
+        self.assertEqual(actions[0], 'first')
+        self.assertEqual(sorted(actions[1:3]), ['local', 'pool'])
+        self.assertEqual(actions[3], 'last')
+
+    # Steps which run at the same time are marked, and cpu time isn't kept for the step run in this process
+    def test_run_step_graph_overlap(self):
+        steps = [
+            {'action': 'first'},
+            {'action': 'pool', 'writes': ['qti/*']},
+            {'action': 'local', 'writes': ['lessonbuilder.xml'], 'use_archive': 1},
+        ]
+
+        def step_task(step, local):
+            return partial(run_step, step['action'], slow_step, 0.5 if step['action'] == 'pool' else 0.1)
+
+        results = {}
+        self.assertIsNone(run_step_graph(steps, step_task, 2, on_result=lambda result: results.update({result.action: result.metrics})))
+
+        self.assertNotIn('overlap', results['first'])
+        self.assertIn('cpu', results['first'])
+        self.assertTrue(results['pool']['overlap'])
+        self.assertIn('cpu', results['pool'])
+        self.assertTrue(results['local']['overlap'])
+        self.assertNotIn('cpu', results['local'])
+
+    def test_run_step_graph_failure(self):
+        steps = [
+            {'action': 'first'},
+            {'action': 'pool', 'writes': ['qti/*']},
+            {'action': 'last'},
+        ]
+
+        def step_task(step, local):
+            return partial(record_step, self.output, step['action'], step['action'] != 'pool')
+
+        self.assertEqual(run_step_graph(steps, step_task, 2), steps[1])
+
+        with open(self.output) as f:
+            self.assertEqual(f.read().split(), ['first', 'pool'])
+
+    def test_run_step(self):
+        result = run_step('noisy', noisy_step)
+        self.assertTrue(result)
+        self.assertEqual(result.status, 'completed')
+        self.assertEqual((result.errors, result.warnings), (1, 1))
+        self.assertEqual(result.files, {'file-fixed-zip': '/tmp/site.zip'})
+
+        result = run_step('noisy', noisy_step, fail=True)
+        self.assertFalse(result)
+        self.assertEqual(result.status, 'failed')
+        self.assertEqual(result.errors, 2)
+
+    def test_job_log(self):
+        job_log = JobLog(self.output, '["earlier entry"]')
+        logging.getLogger().addHandler(job_log)
+
+        try:
+            run_step('noisy', noisy_step)
+        finally:
+            logging.getLogger().removeHandler(job_log)
+            job_log.file_handler.close()
+
+        log = json.loads(job_log.get_log())
+        self.assertEqual(log[0], 'earlier entry')
+        self.assertEqual(len(log), 4)
+        self.assertEqual(job_log.files(), {'file-fixed-zip': '/tmp/site.zip'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import json
+import unittest
+
+from unittest.mock import patch
+
+import work.xml_valid
+from work.xml_valid import check_file, run
+
+from tempfolder import TempFolderTestCase
+
+class XmlValidTestCase(TempFolderTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.folder = self.tmp + '/site_xml-archive/'
+        os.makedirs(self.folder + 'qti')
+        os.makedirs(self.tmp + '/log')
+
+        self.write('site.xml', '<archive site="site_xml"/>')
+        self.write('lessonbuilder.xml', '<archive><item html="&lt;p&gt;"/></archive>')
+        for n in range(3):
+            self.write(f'qti/assessment{n}.xml', f'<questestinterop><item ident="{n}"/></questestinterop>')
+
+        self.APP = {'archive_folder': self.tmp + '/', 'log_folder': self.tmp + '/log',
+                    'xml_valid': {'workers': 2, 'full_parse': False}}
+
+    def test_check_file(self):
+        self.write('bad.xml', '<archive><item></archive>')
+
+        for full_parse in (False, True):
+            (sha, error) = check_file(self.folder + 'bad.xml', full_parse=full_parse)
+            self.assertIn('mismatched tag: line 1', error)
+
+            # Not parsed again if it has a known good hash
+            self.assertEqual(check_file(self.folder + 'bad.xml', sha, full_parse), (sha, None))
+
+            self.assertIsNone(check_file(self.folder + 'site.xml', full_parse=full_parse)[1])
+
+            # Entities which aren't defined, with an external DTD
+            self.write('entity.xml', '<!DOCTYPE x SYSTEM "x.dtd"><x>&nbsp;</x>')
+            self.assertIn('undefined entity', check_file(self.folder + 'entity.xml', full_parse=full_parse)[1])
+
+    def test_incremental(self):
+        run('site_xml', self.APP)
+
+        with open(self.tmp + '/log/site_xml_xml_valid.json') as f:
+            record = json.load(f)
+
+        self.assertEqual(sorted(record), ['lessonbuilder.xml', 'qti/assessment0.xml', 'qti/assessment1.xml', 'qti/assessment2.xml', 'site.xml'])
+        self.assertTrue(all(entry['valid'] for entry in record.values()))
+
+        # Only the changed file is checked again
+        self.write('qti/assessment1.xml', '<questestinterop><item ident="changed"/></questestinterop>')
+        with patch('work.xml_valid.check_file', side_effect=check_file) as checked:
+            run('site_xml', self.APP)
+
+        self.assertEqual(checked.call_count, 1)
+        self.assertEqual(checked.call_args[0][0], self.folder + 'qti/assessment1.xml')
+
+    def test_invalid(self):
+        self.write('qti/assessment2.xml', '<questestinterop><item>')
+
+        with self.assertRaisesRegex(Exception, 'Parse error for assessment2.xml'):
+            run('site_xml', self.APP)
+
+        # Checked again on the next run
+        with patch('work.xml_valid.check_file', side_effect=check_file) as checked:
+            with self.assertRaises(Exception):
+                run('site_xml', self.APP)
+
+        self.assertEqual(checked.call_count, 1)
+
+    @patch('os.cpu_count', return_value=4)
+    def test_pool(self, *_):
+        with patch('work.xml_valid.POOL_MIN_BYTES', 0), patch('work.xml_valid.ProcessPoolExecutor', wraps=work.xml_valid.ProcessPoolExecutor) as pool:
+            run('site_xml', self.APP)
+
+            self.write('lessonbuilder.xml', '<archive>')
+            self.write('site.xml', '<archive site="changed"/>')
+
+            with self.assertRaisesRegex(Exception, 'Parse error for lessonbuilder.xml'):
+                run('site_xml', self.APP)
+
+        self.assertEqual(pool.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,6 @@
 import sys
 import os
 import argparse
-import urllib.parse
 import logging
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -15,61 +14,27 @@ sys.path.append(parent)
 
 import config.config
 import config.logging_config
-from lib.resources import get_resource_sizes
+from lib.resources import find_orphans
 
-def orphaned(APP, SITE_ID, content_src):
-    content_sizes = get_resource_sizes(content_src)
-    content_ids = sorted(content_sizes.keys(), key=lambda s: s.casefold())
-    used_ids = {}
+def orphaned(APP, SITE_ID, summary = False):
 
-    # Look at each XML file
-    xml_folder = "{}{}-archive/".format(APP['archive_folder'], SITE_ID)
-    qti_folder = "{}{}-archive/qti/".format(APP['archive_folder'], SITE_ID)
+    site_folder = "{}{}-archive/".format(APP['archive_folder'], SITE_ID)
+    (used, orphans, _) = find_orphans(site_folder)
 
-    archive_files = [entry for entry in os.scandir(xml_folder)
-            if (entry.name.endswith('.xml') and entry.name not in ('content.xml', 'archive.xml')) ]
-    qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-    xml_files = archive_files + qti_files
+    if not summary:
+        # Referenced files
+        for id in sorted(used, key=lambda s: s.casefold()):
+            print(f"USED: {used[id]} {id}")
 
-    for xml_file in xml_files:
-        # print(f"Checking file refs in {xml_file.name}")
+        print("")
 
-        with open(xml_file.path, 'r') as file:
-            content = file.read()
+        # Orphaned files
+        for id in sorted(orphans, key=lambda s: s.casefold()):
+            print(f"ORPHANED: {orphans[id]} {id}")
 
-            for id in content_ids:
+    return (used, orphans)
 
-                if id not in used_ids:
-
-                    url_id = urllib.parse.quote(id)
-
-                    if id in content:
-                        used_ids[id] = 'found-plain'
-                        # print(f"{id} found in {xml_file.name}")
-                    elif url_id in content:
-                        used_ids[id] = 'found-escaped'
-                        # print(f"{id} found escaped in {xml_file.name}")
-
-    # Now check the ids that weren't found
-
-    # Referenced files
-    for id in content_ids:
-        #print(f"used? {id}")
-        if id in used_ids:
-            print(f"USED: {content_sizes[id]} {id}")
-
-    print("")
-
-    # Orphaned files
-    for id in content_ids:
-        #print(f"used? {id}")
-        if id not in used_ids:
-            print(f"ORPHANED: {content_sizes[id]} {id}")
-
-    return
-
-
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, summary = False):
     logging.info(f'Content: identify orphaned resources : {SITE_ID}\n')
 
     src_folder  = r'{}{}-archive/'.format(APP['archive_folder'], SITE_ID)
@@ -79,13 +44,16 @@ def run(SITE_ID, APP):
         print(f"ERROR {content_src} not found")
         return False
 
-    orphaned(APP, SITE_ID, content_src)
+    return orphaned(APP, SITE_ID, summary)
 
 def main():
     APP = config.config.APP
-    parser = argparse.ArgumentParser(description="Check for restricted exensions in attachments",
+    parser = argparse.ArgumentParser(description="Report orphaned resources in one or more site archives",
                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument("SITE_ID", help="The SITE_ID on which to work")
+    parser.add_argument("SITE_ID", nargs='*', help="The SITE_ID(s) on which to work")
+    parser.add_argument('-a', '--all', action='store_true', help="All the site archives in the archive folder")
+    parser.add_argument('-f', '--folder', help="Archive folder to use instead of the configured one")
+    parser.add_argument('-s', '--summary', action='store_true', help="Only print the totals for each site")
     parser.add_argument('-d', '--debug', action='store_true')
     args = vars(parser.parse_args())
 
@@ -93,7 +61,27 @@ def main():
     if APP['debug']:
         config.logging_config.logger.setLevel(logging.DEBUG)
 
-    run(args['SITE_ID'], APP)
+    if args['folder']:
+        APP['archive_folder'] = os.path.join(args['folder'], '')
+
+    site_ids = args['SITE_ID']
+    if args['all']:
+        site_ids += sorted(entry.name[:-len('-archive')] for entry in os.scandir(APP['archive_folder'])
+                           if entry.is_dir() and entry.name.endswith('-archive'))
+
+    if not site_ids:
+        parser.error("Specify one or more SITE_IDs or --all")
+
+    # Totals for each site, instead of the lists of files, when there is more than one site
+    summary = args['summary'] or len(site_ids) > 1
+    if summary:
+        print("SITE_ID\tUSED\tORPHANED\tORPHANED_BYTES")
+
+    for site_id in site_ids:
+        result = run(site_id, APP, summary)
+        if result and summary:
+            (used, orphans) = result
+            print(f"{site_id}\t{len(used)}\t{len(orphans)}\t{sum(int(size or 0) for size in orphans.values())}")
 
 if __name__ == '__main__':
     main()
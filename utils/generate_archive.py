@@ -0,0 +1,545 @@
+#!/usr/bin/python3
+
+## Generate a synthetic Sakai site archive with configurable counts, for scale testing and benchmarks
+## e.g. generate_archive.py -o /tmp/archives/ --pages 50 --resources 5000
+##      run_workflow.py --offline --archive /tmp/archives/<site_id>-archive
+
+import sys
+import os
+import uuid
+import base64
+import random
+import argparse
+import lxml.etree as ET
+
+from urllib.parse import quote
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import config.config
+
+NSMAP = {
+    'CHEF': 'https://www.sakailms.org/xmlns/archive/CHEF',
+    'DAV': 'https://www.sakailms.org/xmlns/archive/DAV',
+    'sakai': 'https://www.sakailms.org/xmlns/archive/',
+}
+
+SAKAI_NS = '{https://www.sakailms.org/xmlns/archive/}'
+
+# Resource types: (extension, content type, share of the resources)
+FILE_TYPES = [
+    ('pdf', 'application/pdf', 30),
+    ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 15),
+    ('pptx', 'application/vnd.openxmlformats-officedocument.presentationml.presentation', 10),
+    ('png', 'image/png', 15),
+    ('jpg', 'image/jpeg', 10),
+    ('html', 'text/html', 8),
+]
+
+# Audio and video, only with --media: the dummy body files are not valid media, so the media steps
+# (check_media_metadata, transcode_media) fail on them
+MEDIA_TYPES = [
+    ('mp4', 'video/mp4', 7),
+    ('mp3', 'audio/mpeg', 5),
+]
+
+WORDS = ('lecture', 'tutorial', 'reading', 'week', 'assignment', 'notes', 'summary', 'exam', 'practical',
+         'introduction', 'module', 'chapter', 'review', 'project', 'lab', 'solutions', 'overview', 'guide')
+
+TOOLS = ('sakai.resources', 'sakai.lessonbuildertool', 'sakai.samigo', 'sakai.forums', 'sakai.syllabus',
+         'sakai.qna', 'sakai.siteinfo')
+
+# Default counts, see main() for the meaning of each
+DEFAULTS = {
+    'pages': 5,
+    'items': 10,
+    'subpages': 2,
+    'depth': 2,
+    'collections': 20,
+    'resources': 200,
+    'assessments': 10,
+    'questions': 20,
+    'images': 1,
+    'forums': 5,
+    'topics': 5,
+    'assignments': 10,
+    'syllabus': 10,
+    'qna': 20,
+    'attachments': 1,
+    'body_size': (1024, 1024),
+    'media': False,
+}
+
+def b64(value):
+    return base64.b64encode(str(value).encode('utf-8')).decode('ascii')
+
+def archive_root(site_id):
+    return ET.Element('archive', nsmap=NSMAP, date="20240101120000000", server="synthetic", source=site_id,
+                      system="Sakai 2.8")
+
+def add_properties(el, properties):
+    props = ET.SubElement(el, 'properties')
+    for (name, value) in properties.items():
+        ET.SubElement(props, 'property', enc="BASE64", name=name, value=b64(value))
+
+def write_xml(root, path):
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+
+# A synthetic archive for one site: the content.xml resources and attachment.xml attachments are collected
+# as the tool files are generated, so that the tool files can link to them.
+class SyntheticArchive:
+
+    def __init__(self, APP, site_id, counts, seed = 1):
+        self.site_id = site_id
+        self.sakai_url = APP['sakai_url']
+        self.folder = r'{}{}-archive/'.format(APP['archive_folder'], site_id)
+        self.counts = dict(DEFAULTS, **counts)
+        self.rng = random.Random(seed)
+        self.file_types = FILE_TYPES + (MEDIA_TYPES if self.counts['media'] else [])
+
+        # (id, content type, size, body location)
+        self.resources = []
+        self.attachments = []
+
+    def name(self, words = 3):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def url(self, resource_id):
+        return f"{self.sakai_url}/access/content{quote(resource_id)}"
+
+    # Write a dummy body file for a resource or attachment
+    def body(self, size):
+        body_location = self.uuid()
+        with open(os.path.join(self.folder, body_location), 'wb') as f:
+            f.write(self.rng.randbytes(size))
+
+        return body_location
+
+    def body_size(self):
+        (min_size, max_size) = self.counts['body_size']
+        return self.rng.randint(min_size, max_size)
+
+    def file_type(self):
+        return self.rng.choices(self.file_types, weights=[t[2] for t in self.file_types])[0]
+
+    def add_attachment(self, tool_path, extension = None):
+        if extension is None:
+            (extension, content_type, _) = self.file_type()
+        else:
+            content_type = next((t[1] for t in self.file_types if t[0] == extension), 'application/octet-stream')
+
+        attachment_id = f"/attachment/{self.site_id}/{tool_path}/{self.uuid()}/{self.name(2)}.{extension}"
+        size = self.body_size()
+        self.attachments.append((attachment_id, content_type, size, self.body(size)))
+
+        return attachment_id
+
+    def resource_element(self, parent, resource_id, rel_id, content_type, size, body_location):
+        resource = ET.SubElement(parent, 'resource', {
+            'body-location': body_location,
+            'content-length': str(size),
+            'content-type': content_type,
+            'filePath': f"/vol1/2024/001/01/{body_location}",
+            'id': resource_id,
+            'rel-id': rel_id,
+            'resource-type': 'org.sakaiproject.content.types.fileUpload',
+            SAKAI_NS + 'access_mode': 'inherited',
+            SAKAI_NS + 'hidden': 'false'})
+
+        add_properties(resource, {
+            'CHEF:creator': 'admin',
+            'CHEF:is-collection': 'false',
+            'DAV:displayname': resource_id.split('/')[-1],
+            'DAV:getcontentlength': size,
+            'DAV:getcontenttype': content_type,
+            'DAV:getlastmodified': '20240101120000000',
+        })
+
+    def collection_element(self, parent, collection_id, rel_id, title):
+        collection = ET.SubElement(parent, 'collection', {
+            'id': collection_id,
+            'rel-id': rel_id,
+            'resource-type': 'org.sakaiproject.content.types.folder',
+            SAKAI_NS + 'access_mode': 'inherited',
+            SAKAI_NS + 'hidden': 'false'})
+
+        add_properties(collection, {
+            'CHEF:creator': 'admin',
+            'CHEF:is-collection': 'true',
+            'DAV:displayname': title,
+        })
+
+    # Resources in collections nested up to 3 deep
+    def generate_content(self):
+
+        site_root = f"/group/{self.site_id}/"
+        collections = [site_root]
+        parents = [site_root]
+
+        for i in range(self.counts['collections']):
+            collection_id = f"{self.rng.choice(parents)}{self.name(2)} {i + 1}/"
+            collections.append(collection_id)
+
+            if collection_id.count('/') < site_root.count('/') + 3:
+                parents.append(collection_id)
+
+        for i in range(self.counts['resources']):
+            (extension, content_type, _) = self.file_type()
+            collection_id = self.rng.choice(collections)
+            resource_id = f"{collection_id}{self.name()} {i + 1}.{extension}"
+            size = self.body_size()
+            self.resources.append((resource_id, content_type, size, self.body(size)))
+
+        root = archive_root(self.site_id)
+        chs = ET.SubElement(root, 'org.sakaiproject.content.api.ContentHostingService')
+
+        for collection_id in collections:
+            rel_id = collection_id[len(site_root):]
+            title = rel_id.rstrip('/').split('/')[-1] or self.site_id
+            self.collection_element(chs, collection_id, rel_id, title)
+
+        for (resource_id, content_type, size, body_location) in self.resources:
+            self.resource_element(chs, resource_id, resource_id[len(site_root):], content_type, size, body_location)
+
+        write_xml(root, os.path.join(self.folder, 'content.xml'))
+
+    def generate_attachments(self):
+
+        root = archive_root(self.site_id)
+        chs = ET.SubElement(root, 'org.sakaiproject.content.api.ContentHostingService')
+
+        for (attachment_id, content_type, size, body_location) in self.attachments:
+            self.resource_element(chs, attachment_id, '', content_type, size, body_location)
+
+        write_xml(root, os.path.join(self.folder, 'attachment.xml'))
+
+    # HTML for a text item, with links and images to resources in the site
+    def html(self, paragraphs = 4):
+
+        parts = [f"<h2>{self.name()}</h2>"]
+        for _ in range(paragraphs):
+            text = ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(20, 60)))
+            parts.append(f'<p><span style="font-family: Arial; font-size: 12pt;">{text}</span></p>')
+
+            if self.resources and self.rng.random() < 0.5:
+                (resource_id, content_type, _, _) = self.rng.choice(self.resources)
+                if content_type.startswith('image/'):
+                    parts.append(f'<p><img alt="" src="{self.url(resource_id)}" /></p>')
+                else:
+                    parts.append(f'<p><a href="{self.url(resource_id)}">{resource_id.split("/")[-1]}</a></p>')
+
+        return ''.join(parts)
+
+    def lessons_item(self, page, item_id, sequence, item_type, **attrs):
+        item = ET.SubElement(page, 'item', {
+            'alt': '', 'anonymous': 'false', 'description': '', 'groupOwned': 'false', 'height': '',
+            'html': '', 'id': str(item_id), 'name': '', 'nextpage': 'false', 'pageId': page.get('pageid'),
+            'prerequisite': 'false', 'required': 'false', 'sakaiid': '', 'samewindow': 'false',
+            'sequence': str(sequence), 'showComments': 'false', 'type': str(item_type), 'width': ''})
+
+        for (name, value) in attrs.items():
+            item.set(name, value)
+
+        attributes = ET.SubElement(item, 'attributes')
+        attributes.text = '{}'
+
+        return item
+
+    # Lessons pages with text (type 5) and multimedia (type 7) items, and subpages (type 2 items)
+    def generate_lessons(self):
+
+        root = archive_root(self.site_id)
+        producer = ET.SubElement(root, 'org.sakaiproject.lessonbuildertool.service.LessonBuilderEntityProducer',
+                                 version="2.4")
+        lessonbuilder = ET.SubElement(producer, 'lessonbuilder')
+
+        ids = {'page': 100000, 'item': 1000000}
+        media = [r for r in self.resources if not r[1].startswith('text/')]
+
+        def next_id(kind):
+            ids[kind] += 1
+            return ids[kind]
+
+        def add_page(title, tool_id, top_parent, parent_id, depth):
+            page_id = next_id('page')
+            page = ET.SubElement(lessonbuilder, 'page', hidden="false", pageid=str(page_id), siteid=self.site_id,
+                                 title=title, toolid=tool_id)
+
+            if parent_id is not None:
+                page.set('topparent', str(top_parent))
+                page.set('parent', str(parent_id))
+
+            sequence = 0
+            for _ in range(self.counts['items']):
+                sequence += 1
+                if media and self.rng.random() < 0.3:
+                    (resource_id, content_type, _, _) = self.rng.choice(media)
+                    self.lessons_item(page, next_id('item'), sequence, 7, html=content_type,
+                                      name=resource_id.split('/')[-1], sakaiid=resource_id)
+                else:
+                    self.lessons_item(page, next_id('item'), sequence, 5, html=self.html())
+
+            if depth < self.counts['depth']:
+                for i in range(self.counts['subpages']):
+                    sequence += 1
+                    sub_title = f"{title} - {self.name(2)} {i + 1}"
+                    item = self.lessons_item(page, next_id('item'), sequence, 2, name=sub_title)
+                    sub_id = add_page(sub_title, tool_id, top_parent or page_id, page_id, depth + 1)
+                    item.set('sakaiid', str(sub_id))
+
+            return page_id
+
+        for i in range(self.counts['pages']):
+            tool_id = self.uuid()
+            title = f"Lessons {i + 1}"
+            add_page(title, tool_id, None, None, 0)
+            ET.SubElement(lessonbuilder, 'lessonbuilder', name=title, pagePosition=str(i + 1), toolid=tool_id)
+
+        write_xml(root, os.path.join(self.folder, 'lessonbuilder.xml'))
+
+    def qti_field(self, parent, label, entry = ''):
+        field = ET.SubElement(parent, 'qtimetadatafield')
+        ET.SubElement(field, 'fieldlabel').text = label
+        ET.SubElement(field, 'fieldentry').text = entry
+
+    def mattext(self, parent, html):
+        material = ET.SubElement(parent, 'material')
+        text = ET.SubElement(material, 'mattext', charset="ascii-us", texttype="text/plain")
+        text.text = ET.CDATA(html)
+
+    # samigo.xml and an assessment in qti/ for each, with inline images in attachments
+    def generate_samigo(self):
+
+        os.makedirs(os.path.join(self.folder, 'qti'), exist_ok=True)
+
+        samigo = archive_root(self.site_id)
+        assessments = ET.SubElement(samigo, 'org.sakaiproject.assessment.samigo')
+
+        for i in range(self.counts['assessments']):
+            assessment_id = str(500000 + i)
+            title = f"Quiz {i + 1}: {self.name()}"
+            ET.SubElement(assessments, 'assessment', id=assessment_id, title=title)
+
+            root = ET.Element('questestinterop')
+            assessment = ET.SubElement(root, 'assessment', ident=assessment_id, title=title)
+
+            metadata = ET.SubElement(assessment, 'qtimetadata')
+            self.qti_field(metadata, 'ATTACHMENT')
+            self.qti_field(metadata, 'DISPLAY_NAME', title)
+
+            ET.SubElement(assessment, 'duration')
+
+            flow_mat = ET.SubElement(ET.SubElement(assessment, 'presentation_material'), 'flow_mat')
+            self.mattext(flow_mat, self.html(1))
+
+            section = ET.SubElement(assessment, 'section', ident=f"{assessment_id}1", title="Default")
+            self.qti_field(ET.SubElement(section, 'qtimetadata'), 'SECTION_INFORMATION')
+
+            for q in range(self.counts['questions']):
+                item = ET.SubElement(section, 'item', ident=f"ITEM-{assessment_id}-{q + 1}",
+                                     title="Multiple Choice Question")
+                item_metadata = ET.SubElement(ET.SubElement(item, 'itemmetadata'), 'qtimetadata')
+                self.qti_field(item_metadata, 'qmd_itemtype', 'Multiple Choice')
+                images = ''.join(
+                    f'<img alt="" src="{self.url(self.add_attachment("Tests _ Quizzes", "png"))}" />'
+                    for _ in range(self.counts['images']))
+
+                flow = ET.SubElement(ET.SubElement(item, 'presentation'), 'flow')
+                self.mattext(flow, f"<p>{self.name(12)}?</p>{images}")
+
+                outcomes = ET.SubElement(ET.SubElement(item, 'resprocessing'), 'outcomes')
+                ET.SubElement(outcomes, 'decvar', defaultval="0", maxvalue="1.0", minvalue="0.0", varname="SCORE",
+                              vartype="Integer")
+
+            write_xml(root, os.path.join(self.folder, 'qti', f"assessment{assessment_id}.xml"))
+
+        write_xml(samigo, os.path.join(self.folder, 'samigo.xml'))
+
+    def attach(self, el, tool_path):
+        for _ in range(self.counts['attachments']):
+            ET.SubElement(el, 'attachment', {'relative-url': f"/content{self.add_attachment(tool_path)}"})
+
+    def generate_forums(self):
+
+        root = archive_root(self.site_id)
+        producer = ET.SubElement(root, 'org.sakaiproject.api.app.messageforums.MessageForumsEntityProducer')
+        forums = ET.SubElement(producer, 'DiscussionForums')
+
+        for i in range(self.counts['forums']):
+            forum = ET.SubElement(forums, 'discussion_forum', id=str(i + 1), title=f"Forum {i + 1}: {self.name()}")
+            ET.SubElement(forum, 'short-description').text = self.name(8)
+            self.attach(forum, 'Forums')
+
+            for t in range(self.counts['topics']):
+                topic = ET.SubElement(forum, 'discussion_topic', id=f"{i + 1}{t + 1}", title=f"Topic {t + 1}")
+                ET.SubElement(topic, 'description', {'description-enc': b64(self.html(1))})
+                self.attach(topic, 'Forums')
+
+        write_xml(root, os.path.join(self.folder, 'messageforum.xml'))
+
+    def generate_assignments(self):
+
+        root = archive_root(self.site_id)
+        service = ET.SubElement(root, 'org.sakaiproject.assignment.api.AssignmentServiceParser')
+        assignments = ET.SubElement(service, 'assignments')
+
+        for i in range(self.counts['assignments']):
+            assignment = ET.SubElement(assignments, 'Assignment', id=self.uuid())
+            ET.SubElement(assignment, 'title').text = f"Assignment {i + 1}: {self.name()}"
+            ET.SubElement(assignment, 'instructions').text = self.html(2)
+
+            attachments = ET.SubElement(assignment, 'attachments')
+            for _ in range(self.counts['attachments']):
+                ET.SubElement(attachments, 'attachment').text = self.add_attachment('Assignments')
+
+        write_xml(root, os.path.join(self.folder, 'assignment.xml'))
+
+    # Gradebook items for the assessments and assignments
+    def generate_gradebook(self):
+
+        root = archive_root(self.site_id)
+        gradebook = ET.SubElement(root, 'org.sakaiproject.gradebookng.business.GradebookNgEntityProducer')
+        ET.SubElement(ET.SubElement(gradebook, 'GradebookConfig'), 'CategoryType').text = 'NO_CATEGORIES'
+        items = ET.SubElement(gradebook, 'GradebookItems')
+
+        for i in range(self.counts['assessments']):
+            ET.SubElement(items, 'GradebookItem', externalAppName="sakai.samigo", externalId=str(500000 + i),
+                          name=f"Quiz {i + 1}", points="10.0")
+
+        for i in range(self.counts['assignments']):
+            ET.SubElement(items, 'GradebookItem', externalAppName="sakai.assignment.grades", name=f"Assignment {i + 1}",
+                          points="100.0")
+
+        write_xml(root, os.path.join(self.folder, 'GradebookNG.xml'))
+
+    def generate_syllabus(self):
+
+        root = archive_root(self.site_id)
+        service = ET.SubElement(root, 'org.sakaiproject.api.app.syllabus.SyllabusService')
+        site_archive = ET.SubElement(service, 'siteArchive', siteId=self.site_id, siteName=self.site_id)
+        syllabus = ET.SubElement(site_archive, 'syllabus', contextId=self.site_id, id="1", redirectUrl="",
+                                 userID="admin")
+
+        for i in range(self.counts['syllabus']):
+            data = ET.SubElement(syllabus, 'syllabus_data', emailNotification="none", position=str(i + 1),
+                                 status="posted", syllabus_id=str(i + 1), title=f"{self.name()} {i + 1}", view="no")
+            self.attach(data, 'Course Outline')
+            ET.SubElement(data, 'asset', {'syllabus_body-html': b64(self.html(2))})
+
+        write_xml(root, os.path.join(self.folder, 'syllabus.xml'))
+
+    def generate_qna(self):
+
+        root = archive_root(self.site_id)
+        qna = ET.SubElement(root, 'org.sakaiproject.qna')
+        category = None
+
+        for i in range(self.counts['qna']):
+            if i % 10 == 0:
+                category = ET.SubElement(qna, 'category', name=f"Category {i // 10 + 1}")
+
+            question = ET.SubElement(category, 'question', id=str(i + 1), created="2024-01-01 12:00:00.0")
+            question.text = ET.CDATA(f"<p>{self.name(10)}?</p>")
+
+            for _ in range(self.counts['attachments']):
+                ET.SubElement(question, 'attachment', id=f"{self.name(2)}.pdf",
+                              attachmentId=self.add_attachment('QNA', 'pdf'))
+
+            answer = ET.SubElement(question, 'answer', id=str(i + 1), created="2024-01-02 12:00:00.0")
+            answer.text = ET.CDATA(self.html(1))
+
+        write_xml(root, os.path.join(self.folder, 'qna.xml'))
+
+    def generate_site(self):
+
+        root = archive_root(self.site_id)
+        root.set('site', self.site_id)
+        service = ET.SubElement(root, 'site')
+
+        site = ET.SubElement(service, 'site', {'id': self.site_id, 'title': f"Synthetic site {self.site_id[:8]}",
+                                               'created-id': 'admin', 'type': 'course',
+                                               'description-enc': b64(self.html(2))})
+        add_properties(site, {'term': '2024'})
+
+        pages = ET.SubElement(site, 'pages')
+        for (i, tool_id) in enumerate(TOOLS):
+            page = ET.SubElement(pages, 'page', id=self.uuid(), title=tool_id.split('.')[-1], position=str(i))
+            tools = ET.SubElement(page, 'tools')
+            ET.SubElement(tools, 'tool', id=self.uuid(), toolId=tool_id, title=tool_id.split('.')[-1])
+
+        ET.SubElement(ET.SubElement(site, 'providers'), 'provider', providerId="SYN1001F,2024")
+
+        write_xml(root, os.path.join(self.folder, 'site.xml'))
+
+        users = archive_root(self.site_id)
+        directory = ET.SubElement(users, 'org.sakaiproject.user.api.UserDirectoryService')
+        ET.SubElement(directory, 'user', id='admin', eid='admin', email='admin@example.com')
+        write_xml(users, os.path.join(self.folder, 'user.xml'))
+
+    # Content first, so that the tools can link to resources; attachments last, once the tools have added them
+    def generate(self):
+        os.makedirs(self.folder, exist_ok=True)
+
+        self.generate_content()
+        self.generate_site()
+        self.generate_lessons()
+        self.generate_samigo()
+        self.generate_forums()
+        self.generate_assignments()
+        self.generate_gradebook()
+        self.generate_syllabus()
+        self.generate_qna()
+        self.generate_attachments()
+
+        return self.folder
+
+# Generate an archive in APP['archive_folder'] and return its folder
+def generate_archive(APP, site_id = None, seed = 1, **counts):
+    if site_id is None:
+        site_id = str(uuid.UUID(int=random.Random(seed).getrandbits(128), version=4))
+
+    return SyntheticArchive(APP, site_id, counts, seed).generate()
+
+# Body size in bytes: 'size' or 'min:max'
+def body_size(value):
+    sizes = [int(size) for size in value.split(':')]
+    return (sizes[0], sizes[-1])
+
+def main():
+    APP = config.config.APP
+    parser = argparse.ArgumentParser(description="Generate a synthetic Sakai site archive for scale testing",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("SITE_ID", nargs='?', help="Site ID (default: a UUID from the seed)")
+    parser.add_argument('-o', '--output', default=APP['archive_folder'], help="Folder for the <site_id>-archive folder")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed, for reproducible archives")
+    parser.add_argument('--pages', type=int, default=DEFAULTS['pages'], help="Top-level Lessons pages")
+    parser.add_argument('--items', type=int, default=DEFAULTS['items'], help="Text and multimedia items per Lessons page")
+    parser.add_argument('--subpages', type=int, default=DEFAULTS['subpages'], help="Subpages per Lessons page")
+    parser.add_argument('--depth', type=int, default=DEFAULTS['depth'], help="Levels of Lessons subpages")
+    parser.add_argument('--collections', type=int, default=DEFAULTS['collections'], help="Resources folders")
+    parser.add_argument('--resources', type=int, default=DEFAULTS['resources'], help="Resources files")
+    parser.add_argument('--assessments', type=int, default=DEFAULTS['assessments'], help="Tests & Quizzes assessments")
+    parser.add_argument('--questions', type=int, default=DEFAULTS['questions'], help="Questions per assessment")
+    parser.add_argument('--images', type=int, default=DEFAULTS['images'], help="Inline images (attachments) per question")
+    parser.add_argument('--forums', type=int, default=DEFAULTS['forums'], help="Discussion forums")
+    parser.add_argument('--topics', type=int, default=DEFAULTS['topics'], help="Topics per forum")
+    parser.add_argument('--assignments', type=int, default=DEFAULTS['assignments'], help="Assignments")
+    parser.add_argument('--syllabus', type=int, default=DEFAULTS['syllabus'], help="Syllabus items")
+    parser.add_argument('--qna', type=int, default=DEFAULTS['qna'], help="Q&A questions")
+    parser.add_argument('--attachments', type=int, default=DEFAULTS['attachments'], help="Attachments per forum, topic, assignment, syllabus item and Q&A question")
+    parser.add_argument('--body-size', type=body_size, default=DEFAULTS['body_size'], help="Size of the dummy body files in bytes, 'size' or 'min:max'")
+    parser.add_argument('--media', action='store_true', help="Include audio and video resources")
+    args = vars(parser.parse_args())
+
+    APP['archive_folder'] = os.path.join(args.pop('output'), '')
+    folder = generate_archive(APP, args.pop('SITE_ID'), **args)
+
+    print(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+
+## Summarise the performance metrics of workflow steps (APP['metrics']['file']) as percentiles per step
+
+import sys
+import os
+import json
+import argparse
+import math
+
+from collections import defaultdict
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import config.config
+
+# Nearest-rank percentile of a sorted list
+def percentile(values, p):
+    if not values:
+        return 0
+
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def read_metrics(metrics_file, workflow = None, since = None):
+
+    entries = []
+    with open(metrics_file, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            if workflow and entry['workflow'] != workflow:
+                continue
+
+            if since and entry['time'] < since:
+                continue
+
+            entries.append(entry)
+
+    return entries
+
+# Rows of (action, count, total wall time, {metric: [p50, p90, p99, max]}), slowest steps first.
+# Entries without a metric (e.g. cpu for steps which ran at the same time as other steps) are left out of
+# its percentiles.
+def summarise(entries, metrics, percentiles = (50, 90, 99, 100)):
+
+    by_action = defaultdict(list)
+    for entry in entries:
+        by_action[(entry['workflow'], entry['action'])].append(entry)
+
+    rows = []
+    for ((workflow, action), action_entries) in by_action.items():
+        stats = {}
+        for metric in metrics:
+            values = sorted(entry[metric] for entry in action_entries if metric in entry)
+            stats[metric] = [percentile(values, p) for p in percentiles]
+
+        total = sum(entry['wall'] for entry in action_entries)
+        rows.append((f"{workflow}:{action}", len(action_entries), total, stats))
+
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+def main():
+    APP = config.config.APP
+    parser = argparse.ArgumentParser(description="Percentiles of workflow step metrics across sites",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-f', '--file', default=str(APP['metrics']['file']), help="Metrics file")
+    parser.add_argument('-w', '--workflow', help="Only this workflow (workflow, upload, update)")
+    parser.add_argument('-s', '--since', help="Only steps run since this date (YYYY-MM-DD)")
+    parser.add_argument('-m', '--metric', action='append', help="Metric to show (wall, cpu, process_max_rss, read_bytes, write_bytes, files_changed, bytes_changed)")
+    args = vars(parser.parse_args())
+
+    metrics = args['metric'] or ['wall', 'cpu', 'process_max_rss', 'bytes_changed']
+    entries = read_metrics(args['file'], args['workflow'], args['since'])
+    rows = summarise(entries, metrics)
+
+    total_wall = sum(row[2] for row in rows) or 1
+    print(f"{len(entries)} steps from {len(set(e['site_id'] for e in entries))} sites. Percentiles: p50 / p90 / p99 / max\n")
+
+    print("{:50} {:>6} {:>7}  {}".format('step', 'count', 'time%', '  '.join(f"{m:>35}" for m in metrics)))
+    for (action, count, total, stats) in rows:
+        cols = ['{:>35}'.format(' / '.join(f"{v:.6g}" for v in stats[m])) for m in metrics]
+        print("{:50} {:>6} {:>6.1f}%  {}".format(action, count, 100 * total / total_wall, '  '.join(cols)))
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import logging
@@ -16,6 +15,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters_html
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Assignment: fix empty titles and sanitise instruction text: {}'.format(SITE_ID))
@@ -44,9 +44,7 @@ def run(SITE_ID, APP):
                 rewrite = True
 
     if rewrite:
-        xml_old = r'{}/assignment.old'.format(src_folder)
-        shutil.copyfile(xml_src, xml_old)
-        asn_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(asn_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
@@ -16,7 +16,8 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import rewrite_tool_ref
+from lib.rewrite import RefRewriter
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Attachments: fix missing extensions : {}'.format(SITE_ID))
@@ -36,6 +37,7 @@ def run(SITE_ID, APP):
     content_tree = ET.parse(xml_src, parser)
 
     rewrite = False
+    refs = RefRewriter()
 
     # find each resource with an id that contains that extension
     for item in content_tree.xpath(".//resource"):
@@ -87,17 +89,16 @@ def run(SITE_ID, APP):
                         # Assessments in qti/
                         qti_folder = f"{src_folder}/qti/"
                         qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-                        for qti in qti_files:
-                            rewrite_tool_ref(qti, src_id, target_id)
+                        refs.add(qti_files, src_id, target_id)
 
                         # Question Pools
                         qp = f"{src_folder}/samigo_question_pools.xml"
                         if os.path.exists(qp):
-                            rewrite_tool_ref(qp, src_id, target_id)
+                            refs.add([qp], src_id, target_id)
 
                     else:
                         tool_src = os.path.join(src_folder, tool_xml)
-                        rewrite_tool_ref(tool_src, src_id, target_id)
+                        refs.add([tool_src], src_id, target_id)
 
                     logging.info(f"Replaced id {src_id} with {target_id} for {content_type} in attachment.xml and {tool_xml}")
                     continue
@@ -114,15 +115,9 @@ def run(SITE_ID, APP):
 
                 if target_ext:
                     tool_xml_files = [entry for entry in os.scandir(src_folder) if entry.name.endswith('.xml')]
-                    for toolxml in tool_xml_files:
-
-                        if (toolxml.name in ["archive.xml", "site.xml", "content.xml", "attachment.xml", "user.xml"]):
-                            continue
-
-                        target_id = f"{src_id}{target_ext}"
-                        if rewrite_tool_ref(toolxml, src_id, target_id):
-                            logging.info(f"Fixed path {src_id} in {toolxml.name}")
+                    tool_xml_files = [entry for entry in tool_xml_files if entry.name not in ["archive.xml", "site.xml", "content.xml", "attachment.xml", "user.xml"]]
 
+                    refs.add(tool_xml_files, src_id, target_id)
                     continue
                 else:
                     raise Exception(f"No extension identified to use for {src_id}")
@@ -133,9 +128,14 @@ def run(SITE_ID, APP):
             if target_ext:
                 logging.warning(f"Attachment '{item.get('id')}' type {content_type} non-standard extension {file_extension}: expected {target_ext} AMA-451")
 
+    # Update the references to renamed items, each file once
+    for (path, found) in refs.rewrite().items():
+        for ref in found:
+            logging.info(f"Fixed path {ref} in {os.path.basename(path)}")
+
     if rewrite:
         # Update attachment.xml
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import logging
@@ -16,6 +15,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import read_yaml, create_folders
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Content: fix mime-types : {}'.format(SITE_ID))
@@ -26,8 +26,6 @@ def run(SITE_ID, APP):
     create_folders(src_folder)
 
     xml_src = r'{}/content.xml'.format(src_folder)
-    xml_old = r'{}/content.old'.format(src_folder)
-    shutil.copyfile(xml_src, xml_old)
 
     ET.register_namespace("sakai", "https://www.sakailms.org/")
     parser = ET.XMLParser(recover=True)
@@ -45,7 +43,7 @@ def run(SITE_ID, APP):
             if (f".{ext}" == file_extension):
                 item.set('content-type', type)
 
-    content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
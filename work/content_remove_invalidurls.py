@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import validators
@@ -16,6 +15,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Content: remove invalid URLs : {}'.format(SITE_ID))
@@ -42,9 +42,7 @@ def run(SITE_ID, APP):
 
     # Rewrite the XML if we need to
     if found_invalid_url:
-        xml_old = r'{}/content.old.pre-url'.format(src_folder)
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+## Report orphaned Resources (not referenced from any other tool), and optionally remove them
+## to reduce the size of the import zip
+## REF: AMA-903
+
+import sys
+import os
+import argparse
+import logging
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import config.logging_config
+from lib.resources import ContentIndex, find_orphans
+
+# Orphans which may still be used and are never removed:
+# - files in folders which are referenced as a whole (e.g. Lessons folder items, links to a folder)
+# - files next to a referenced HTML page, which may link to them with relative URLs
+def removable_orphans(content, used, orphaned, whole):
+
+    folders = {sakai_id for sakai_id in whole if sakai_id in content.collections}
+    folders |= {os.path.dirname(sakai_id) + '/' for sakai_id in used
+                if content.resources[sakai_id].get('content-type') == 'text/html'}
+
+    return {sakai_id: size for (sakai_id, size) in orphaned.items()
+            if not any(sakai_id.startswith(folder) for folder in folders)}
+
+def run(SITE_ID, APP):
+    logging.info('Content: orphaned resources : {}'.format(SITE_ID))
+
+    src_folder  = r'{}{}-archive/'.format(APP['archive_folder'], SITE_ID)
+    xml_src = os.path.join(src_folder, 'content.xml')
+
+    if not os.path.exists(xml_src):
+        logging.info(f"\t{xml_src} not found")
+        return
+
+    (used, orphaned, whole) = find_orphans(src_folder)
+    orphaned_size = sum(int(size or 0) for size in orphaned.values())
+
+    logging.info(f"\t{len(used)} referenced and {len(orphaned)} orphaned file(s), {orphaned_size} bytes orphaned")
+
+    for sakai_id in sorted(orphaned, key=lambda s: s.casefold()):
+        logging.debug(f"\tORPHANED: {orphaned[sakai_id]} {sakai_id}")
+
+    if not APP['content'].get('remove_orphans') or not orphaned:
+        return
+
+    content = ContentIndex.load(xml_src)
+    remove = removable_orphans(content, used, orphaned, whole)
+
+    for sakai_id in remove:
+        item = content.resources[sakai_id]
+        body = os.path.join(src_folder, item.get('body-location') or '')
+
+        content.remove(item)
+        if os.path.isfile(body):
+            os.remove(body)
+
+        logging.info(f"\tremoved orphaned file: {sakai_id}")
+
+    if content.dirty:
+        content.write()
+
+    logging.info(f"\tremoved {len(remove)} orphaned file(s), {sum(int(size or 0) for size in remove.values())} bytes")
+
+def main():
+    APP = config.config.APP
+    parser = argparse.ArgumentParser(description="Report orphaned resources, and remove them if content remove_orphans is set",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("SITE_ID", help="The SITE_ID on which to work")
+    parser.add_argument('-r', '--remove', action='store_true', help="Remove orphaned files")
+    parser.add_argument('-d', '--debug', action='store_true')
+    args = vars(parser.parse_args())
+
+    APP['debug'] = APP['debug'] or args['debug']
+    APP['content']['remove_orphans'] = APP['content'].get('remove_orphans') or args['remove']
+
+    run(args['SITE_ID'], APP)
+
+if __name__ == '__main__':
+    main()
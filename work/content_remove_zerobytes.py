@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import logging
@@ -15,6 +14,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Content: remove zero-byte files : {}'.format(SITE_ID))
@@ -38,9 +38,7 @@ def run(SITE_ID, APP):
 
     # Rewrite the XML if we need to
     if found_zero_bytes:
-        xml_old = r'{}/content.old.pre-zero'.format(src_folder)
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
@@ -18,6 +18,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import format_bytes, get_size, zipfolder
+from lib.snapshot import clear
 
 def run(SITE_ID, APP, now_st = None):
 
@@ -48,6 +49,9 @@ def run(SITE_ID, APP, now_st = None):
     for py in glob.glob('{}/*{}_fixed*.zip'.format(APP['output'], SITE_ID)):
         os.remove(py)
 
+    # The workflow snapshots aren't needed once the archive is final
+    clear(src_folder)
+
     zipfolder(zip_file, src_folder)
 
     if not os.path.exists(zip_file):
@@ -6,7 +6,6 @@
 
 import sys
 import os
-import shutil
 import json
 import argparse
 import lxml.etree as ET
@@ -18,6 +17,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import init__soup
+from lib.snapshot import write_tree
 
 def drop_content(toolid, archive_path):
     logging.info(f"Tool {toolid} is unused: dropping content")
@@ -34,7 +34,7 @@ def drop_content(toolid, archive_path):
         for child in list(archive_node):
             archive_node.remove(child)
 
-        tree.write(archive_path, encoding='utf-8', xml_declaration=True)
+        write_tree(tree, archive_path, encoding='utf-8', xml_declaration=True)
 
 def drop_attachments(site_folder, SITE_ID, path_segments):
 
@@ -78,9 +78,7 @@ def drop_attachments(site_folder, SITE_ID, path_segments):
             attachment_list.remove(item)
 
         # Update file
-        xml_old = xml_src.replace(".xml",".old")
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 
 def run(SITE_ID, APP):
@@ -4,7 +4,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import zipfile
 import lxml.etree as ET
@@ -16,7 +15,9 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import read_yaml, rewrite_tool_ref, get_size
+from lib.utils import read_yaml, get_size
+from lib.rewrite import RefRewriter
+from lib.snapshot import write_tree, replace_file
 
 def replace_with_zip(src_path, src_name):
 
@@ -25,7 +26,7 @@ def replace_with_zip(src_path, src_name):
     zipobj.write(src_path, src_name)
     zipobj.close()
 
-    shutil.move(zip_file, src_path)
+    replace_file(zip_file, src_path)
 
     return True
 
@@ -37,6 +38,7 @@ def check_resources(src_folder, disallowed, paths_map, collection):
         return None
 
     rewrite = False
+    refs = RefRewriter()
 
     parser = ET.XMLParser(recover=True)
     content_tree = ET.parse(xml_src, parser)
@@ -89,26 +91,26 @@ def check_resources(src_folder, disallowed, paths_map, collection):
                         # Assessments in qti/
                         qti_folder = f"{src_folder}/qti/"
                         qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-                        for qti in qti_files:
-                            rewrite_tool_ref(qti, src_id, target_id)
+                        refs.add(qti_files, src_id, target_id)
 
                         # Question Pools
                         qp = f"{src_folder}/samigo_question_pools.xml"
                         if os.path.exists(qp):
-                            rewrite_tool_ref(qp, src_id, target_id)
+                            refs.add([qp], src_id, target_id)
 
                     else:
                         tool_src = os.path.join(src_folder, tool_xml)
-                        rewrite_tool_ref(tool_src, src_id, target_id)
+                        refs.add([tool_src], src_id, target_id)
 
                     logging.info(f"Zipped {src_id} in {collection} and {tool_xml}")
                     continue
 
+    # Update the references to renamed items, each file once
+    refs.rewrite()
+
     if rewrite:
         # Update file
-        xml_old = xml_src.replace(".xml",".old")
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
     return True
 
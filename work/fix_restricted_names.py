@@ -6,7 +6,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import base64
@@ -17,7 +16,9 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import read_yaml, rewrite_tool_ref
+from lib.utils import read_yaml
+from lib.rewrite import RefRewriter
+from lib.snapshot import write_tree
 
 def has_restricted(name, disallowed):
 
@@ -42,6 +43,7 @@ def check_resources(src_folder, paths_map, collection, restricted_ext):
         return None
 
     rewrite = False
+    refs = RefRewriter()
 
     parser = ET.XMLParser(recover=True)
     content_tree = ET.parse(xml_src, parser)
@@ -138,17 +140,16 @@ def check_resources(src_folder, paths_map, collection, restricted_ext):
                         # Assessments in qti/
                         qti_folder = f"{src_folder}/qti/"
                         qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-                        for qti in qti_files:
-                            rewrite_tool_ref(qti, src_id, target_id)
+                        refs.add(qti_files, src_id, target_id)
 
                         # Question Pools
                         qp = f"{src_folder}/samigo_question_pools.xml"
                         if os.path.exists(qp):
-                            rewrite_tool_ref(qp, src_id, target_id)
+                            refs.add([qp], src_id, target_id)
 
                     else:
                         tool_src = os.path.join(src_folder, tool_xml)
-                        rewrite_tool_ref(tool_src, src_id, target_id)
+                        refs.add([tool_src], src_id, target_id)
 
                     logging.info(f"Updated id {src_id} in {collection} and {tool_xml}")
                     continue
@@ -162,24 +163,15 @@ def check_resources(src_folder, paths_map, collection, restricted_ext):
                 archive_files = [entry for entry in os.scandir(src_folder) if entry.name.endswith('.xml')]
                 qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
 
-                xml_files = archive_files + qti_files
+                refs.add(archive_files + qti_files, src_id, target_id)
 
-                for file in xml_files:
-
-                    with open(f'{file.path}', 'r+', encoding='utf8') as f:
-                        # read and replace content
-                        content = f.read().replace(src_id, target_id)
-                        # reset file cursor and write to file
-                        f.seek(0)
-                        f.write(content)
-                        f.truncate()
+    # Update the references to renamed items, each file once
+    refs.rewrite()
 
     if rewrite:
         # Update file
         logging.debug(f"Updating {xml_src}")
-        xml_old = xml_src.replace(".xml",".old")
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
     return True
 
@@ -7,7 +7,6 @@ import sys
 import os
 import argparse
 import lxml.etree as ET
-import shutil
 import logging
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -15,6 +14,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.snapshot import write_tree, open_replace
 
 def check_resources(src_folder, collection):
 
@@ -44,17 +44,15 @@ def check_resources(src_folder, collection):
                 continue
 
             file_body_path = os.path.join(src_folder, resource_body)
-            with open(file_body_path, 'wb') as binfile:
-                    binfile.write(b'\x00')
+            with open_replace(file_body_path, 'wb') as binfile:
+                binfile.write(b'\x00')
             item.set('content-length', '1')
             rewrite = True
             logging.info(f"Replaced zero-byte {resource_id} body {resource_body} with single-byte file")
 
     if rewrite:
         # Update file
-        xml_old = xml_src.replace(".xml",".old")
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
     return True
 
@@ -24,6 +24,7 @@ sys.path.append(parent)
 import config.config
 import config.logging_config
 from lib.utils import init__soup
+from lib.lessons import LessonsDocument
 from lib.conversion import *
 
 import lib.utils
@@ -317,6 +318,8 @@ def process(conf, issue_key, SITE_ID, APP, link_id, now_st):
     samigo_question_pools_soup = init__soup(site_folder, "samigo_question_pools.xml")
     lti_soup = init__soup(site_folder, "basiclti.xml")
     lessons_soup = init__soup(site_folder, "lessonbuilder.xml")
+    lessons_src = os.path.join(site_folder, "lessonbuilder.xml")
+    lessons = LessonsDocument.parse(lessons_src) if os.path.exists(lessons_src) else None
     gradebook_soup = init__soup(site_folder, "GradebookNG.xml")
 
     # restricted extensions
@@ -353,6 +356,7 @@ def process(conf, issue_key, SITE_ID, APP, link_id, now_st):
                                         samigo_question_pools_soup = samigo_question_pools_soup,
                                         lti_soup = lti_soup,
                                         lessons_soup = lessons_soup,
+                                        lessons = lessons,
                                         gradebook_soup = gradebook_soup,
                                         restricted_ext = restricted_ext,
                                         ignored_collections = ignored_collections,
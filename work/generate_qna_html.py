@@ -17,7 +17,7 @@ sys.path.append(parent)
 from bs4 import BeautifulSoup
 import config.logging_config
 from lib.utils import replace_wiris
-from lib.resources import move_attachments, add_resource
+from lib.resources import content_batch
 from urllib.parse import quote
 
 # def run(SITE_ID, APP):
@@ -89,11 +89,14 @@ def run(SITE_ID, APP):
         with open(output_file, "wb") as file:
             file.write(html_updated_bytes)
 
-        # Add qna.html itself
-        add_resource(SITE_ID, site_folder, output_file, output_file, "text/html", collection)
+        # content.xml and attachment.xml are written once for both changes
+        with content_batch(site_folder) as batch:
 
-        # Move any attachments
-        move_attachments(SITE_ID, site_folder, collection, move_list)
+            # Add qna.html itself
+            batch.add_resource(SITE_ID, output_file, output_file, "text/html", collection)
+
+            # Move any attachments
+            batch.move_attachments(SITE_ID, collection, move_list)
 
         logging.info(f'\tDone: QNA output in {output_file}')
 
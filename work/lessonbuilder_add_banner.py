@@ -6,65 +6,44 @@
 
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-def run(SITE_ID, APP):
-    logging.info('Lessons: Add Banner : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def add_banner(html, title):
 
-    if root.tag == 'archive':
+    rows = html.select('body > div[class="container-fluid"] > div[class="row"]')
+    if (len(rows) >= 1):
+        # we have the first row in the body
+        row = rows[0]
 
-        for item in root.findall(".//item[@type='5']"):
+        banner = html.select('body div[class="col-12 banner-img"]')
+        if (len(banner) == 0):
+            # there is no banner
+            col_tag = html.new_tag('div', **{"class":"col-12 banner-img"})
+            p_tag = html.new_tag('p')
+            img_tag = html.new_tag('img', alt="banner", src='/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/banner_001_basic.jpg')
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
+            p_tag.append(img_tag)
+            col_tag.append(p_tag)
+            row.insert(0, col_tag)
 
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-
-            rows = html.select('body > div[class="container-fluid"] > div[class="row"]')
-            if (len(rows) >= 1):
-                # we have the first row in the body
-                row = rows[0]
-
-                banner = html.select('body div[class="col-12 banner-img"]')
-                if (len(banner) == 0):
-                    # there is no banner
-                    col_tag = html.new_tag('div', **{"class":"col-12 banner-img"})
-                    p_tag = html.new_tag('p')
-                    img_tag = html.new_tag('img', alt="banner", src='/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/banner_001_basic.jpg')
-
-                    p_tag.append(img_tag)
-                    col_tag.append(p_tag)
-                    row.insert(0, col_tag)
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Add Banner : {}'.format(SITE_ID))
 
-            # write_test_case(html)
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('add_banner', add_banner, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
@@ -7,62 +7,32 @@
 import sys
 import os
 import re
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
-import cssutils
-
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
-
-def run(SITE_ID, APP):
-    logging.info('Lessons: Add CSS to : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
+from lib.styles import remove_style_properties
 
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+# Remove background colours from p tags
+def add_css(html, title):
 
-    if root.tag == 'archive':
+    for p in html.find_all('p', style=re.compile(r'(d9edf7)|(ffefd6)|(255,239,214)|(217,237,247)')):
+        remove_style_properties(p, ['background-color'])
 
-        for item in root.findall(".//item[@type='5']"):
-            # print(item.attrib['html'])
-
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
-
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-            # print(str(html))
-
-            # remove background colours from p tags
-            for p in html.find_all('p', style=re.compile(r'(d9edf7)|(ffefd6)|(255,239,214)|(217,237,247)')):
-                style = cssutils.parseStyle( p['style'] )
-                style.removeProperty('background-color')
-
-                if (style.length > 0):
-                    p['style'] = style.cssText
-                else:
-                    del p['style']
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Add CSS to : {}'.format(SITE_ID))
 
-            # write_test_case(html)
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('add_css', add_css, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
@@ -16,6 +16,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Lessons: Cross-site resources : {}'.format(SITE_ID))
@@ -86,9 +87,9 @@ def run(SITE_ID, APP):
 
     if updating:
         logging.info("Updating Lessons, Attachments and Content for embedded multimedia items")
-        lb_tree.write(lb_src, encoding='utf-8', xml_declaration=True)
-        content_tree.write(content_src, encoding='utf-8', xml_declaration=True)
-        attach_tree.write(attach_src, encoding='utf-8', xml_declaration=True)
+        write_tree(lb_tree, lb_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, content_src, encoding='utf-8', xml_declaration=True)
+        write_tree(attach_tree, attach_src, encoding='utf-8', xml_declaration=True)
 
     logging.info("Done")
 
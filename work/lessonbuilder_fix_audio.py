@@ -4,7 +4,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import xml.etree.ElementTree as ET
 import logging
@@ -18,6 +17,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters
+from lib.snapshot import open_replace, write_tree
 
 def run(SITE_ID, APP):
     logging.info(f'Lessons: Fix embedded audio .wav files : {SITE_ID}')
@@ -65,11 +65,9 @@ def run(SITE_ID, APP):
     # Update the lessonbuilder XML
     if rewrite:
         logging.info(f"Updating {xml_src}")
-        xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-        shutil.copyfile(xml_src, xml_old)
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(tree, xml_src, encoding='utf-8', xml_declaration=True)
 
-        with open(attachment_src, "wt") as af:
+        with open_replace(attachment_src, "wt") as af:
             af.write(attachment_xml)
 
 def main():
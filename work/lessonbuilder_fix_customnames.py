@@ -4,7 +4,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import xml.etree.ElementTree as ET
 import logging
@@ -17,6 +16,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info(f'Lessons: AMA-350 : {SITE_ID}')
@@ -40,9 +40,7 @@ def run(SITE_ID, APP):
     # Update the lessonbuilder XML
     if rewrite:
         logging.info(f"Updating {xml_src}")
-        xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-        shutil.copyfile(xml_src, xml_old)
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
@@ -14,58 +14,37 @@
 import sys
 import os
 import re
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-def run(SITE_ID, APP):
-    logging.info('Lessons: Fix FontAwesome : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def fix_fontawesome(html, title):
 
-    if root.tag == 'archive':
+    for el in html.find_all(class_=re.compile(r'fa fa-file-text')):
+        el['class'] = 'fas fa-file-alt'
 
-        for item in root.findall(".//item[@type='5']"):
+    for el in html.find_all(class_=re.compile(r'fa-3x fa-lightbulb-o')):
+        el['class'] = 'far fa-2x fa-lightbulb'
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
+    for el in html.find_all(style=re.compile(r'color: rgb\(0,0,0\);font-size: 25.0px;')):
+        del el['style']
 
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-
-            for el in html.find_all(class_=re.compile(r'fa fa-file-text')):
-                el['class'] = 'fas fa-file-alt'
-
-            for el in html.find_all(class_=re.compile(r'fa-3x fa-lightbulb-o')):
-                el['class'] = 'far fa-2x fa-lightbulb'
-
-            for el in html.find_all(style=re.compile(r'color: rgb\(0,0,0\);font-size: 25.0px;')):
-                del el['style']
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Fix FontAwesome : {}'.format(SITE_ID))
 
-            # write_test_case(html)
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('fix_fontawesome', fix_fontawesome, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
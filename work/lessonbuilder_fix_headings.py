@@ -12,57 +12,36 @@
 import sys
 import os
 import re
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-def run(SITE_ID, APP):
-    logging.info('Lessons: Fix headings : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def fix_headings(html, title):
 
-    if root.tag == 'archive':
+    for el in html.find_all(class_ = re.compile(r'(fa-book)|(fa-play-circle)|(fa-file-alt)​|(fa-file-text)|(fa-comments)')):
+        if el.parent.name == 'h3':
+            el.parent.name = 'h2'
 
-        for item in root.findall(".//item[@type='5']"):
+    for el in html.find_all(string = re.compile(r'(Reading Title)|(Video Title)|(Assignment Title)​|(Discussion Forum)')):
+        if el.parent.name == 'h3':
+            el.parent.name = 'h2'
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
-
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-
-            for el in html.find_all(class_ = re.compile(r'(fa-book)|(fa-play-circle)|(fa-file-alt)​|(fa-file-text)|(fa-comments)')):
-                if el.parent.name == 'h3':
-                    el.parent.name = 'h2'
-
-            for el in html.find_all(string = re.compile(r'(Reading Title)|(Video Title)|(Assignment Title)​|(Discussion Forum)')):
-                if el.parent.name == 'h3':
-                    el.parent.name = 'h2'
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Fix headings : {}'.format(SITE_ID))
 
-            # write_test_case(html)
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('fix_headings', fix_headings, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
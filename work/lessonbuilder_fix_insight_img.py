@@ -6,55 +6,33 @@
 
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
-
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
-
-def run(SITE_ID, APP):
-    logging.info('Lessons: Fix insight-section images : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def fix_insight_img(html, title):
 
-    if root.tag == 'archive':
+    for img in html.select('div[class="left-insight"] img'):
+        img.wrap(html.new_tag("div"))
 
-        for item in root.findall(".//item[@type='5']"):
+    for img in html.select('div[class="right-insight"] img'):
+        img.wrap(html.new_tag("div"))
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
-
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-
-            for img in html.select('div[class="left-insight"] img'):
-                img.wrap(html.new_tag("div"))
-
-            for img in html.select('div[class="right-insight"] img'):
-                img.wrap(html.new_tag("div"))
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Fix insight-section images : {}'.format(SITE_ID))
 
-            # write_test_case(html, item.attrib['id'])
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('fix_insight_img', fix_insight_img, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
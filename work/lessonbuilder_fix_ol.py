@@ -11,65 +11,37 @@
 import sys
 import os
 import re
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
-import cssutils
-
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
-
-def run(SITE_ID, APP):
-    logging.info('Lessons: Fix OL and LI : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
+from lib.styles import remove_style_properties
 
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def fix_ol(html, title):
 
-    if root.tag == 'archive':
+    for ol in html.select('div[class="col-sm-10 offset-sm-1"] ol'):
+        # we don't add the class to list elements inside other lists
+        if ol.parent.name in ['ol', 'ul', 'li']:
+            continue
+        ol['class'] = 'large-number'
 
-        for item in root.findall(".//item[@type='5']"):
+    for li in html.find_all('li', style=re.compile(r'(40.0px)')):
+        remove_style_properties(li, ['margin-left'])
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
-
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
-
-            for ol in html.select('div[class="col-sm-10 offset-sm-1"] ol'):
-                # we don't add the class to list elements inside other lists
-                if ol.parent.name in ['ol', 'ul', 'li']:
-                    continue
-                ol['class'] = 'large-number'
-
-            for li in html.find_all('li', style=re.compile(r'(40.0px)')):
-                style = cssutils.parseStyle( li['style'] )
-                style.removeProperty('margin-left')
-
-                if (style.length > 0):
-                    li['style'] = style.cssText
-                else:
-                    del li['style']
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Fix OL and LI : {}'.format(SITE_ID))
 
-            # write_test_case(html)
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('fix_ol', fix_ol, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
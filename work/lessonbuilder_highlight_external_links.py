@@ -9,10 +9,8 @@
 import sys
 import os
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 import re
-import shutil
 from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -20,51 +18,39 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-def run(SITE_ID, APP):
-    logging.info('Highlight Sakai tools : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+# Returns False if there are no domains to highlight, so the item is left as it was
+def highlight_links(html, domains):
 
-    if root.tag == 'archive':
+    for link in domains:
+        pattern = re.compile(f'{link}(/\S+)?', re.IGNORECASE)
+        occurrences = html.find_all(string=pattern)
 
-        for item in root.findall(".//item[@type='5']"):
+        occurrences_links = html.find_all('a')
+        for occurrences_link in occurrences_links:
+            if link in str(occurrences_link):
+                occurrences_link['style'] = 'color: red; font-weight: bold;'
+                occurrences_link['data-type'] = 'link'
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
+        for rep in occurrences:
+            replacement = r'<span style="color: red; font-weight: bold;" data-type="link">{}</span>'.format(link)
+            highlighted = pattern.sub(replacement, rep)
+            highlighted_html = BeautifulSoup(highlighted, 'html.parser')
+            rep.replace_with(highlighted_html)
 
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
+    return len(domains) > 0
 
-            for link in APP['lessons']['highlight_domains']:
-                pattern = re.compile(f'{link}(/\S+)?', re.IGNORECASE)
-                occurrences = html.find_all(string=pattern)
-
-                occurrences_links = html.find_all('a')
-                for occurrences_link in occurrences_links:
-                    if link in str(occurrences_link):
-                        occurrences_link['style'] = 'color: red; font-weight: bold;'
-                        occurrences_link['data-type'] = 'link'
-
-                for rep in occurrences:
-                    replacement = r'<span style="color: red; font-weight: bold;" data-type="link">{}</span>'.format(link)
-                    highlighted = pattern.sub(replacement, rep)
-                    highlighted_html = BeautifulSoup(highlighted, 'html.parser')
-                    rep.replace_with(highlighted_html)
+def run(SITE_ID, APP, archive = None):
+    logging.info('Highlight Sakai tools : {}'.format(SITE_ID))
 
-                item.set('html', str(html))
+    transforms = HtmlTransforms()
+    domains = APP['lessons']['highlight_domains']
+    transforms.dom('highlight_external_links', lambda html, title: highlight_links(html, domains), well_formed=True, key=domains)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 
 def main():
@@ -9,9 +9,7 @@
 import sys
 import os
 import argparse
-import xml.etree.ElementTree as ET
 import re
-import shutil
 import logging
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -19,45 +17,37 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 from bs4 import BeautifulSoup
 
 
-def run(SITE_ID, APP):
-    logging.info('Highlight Sakai tools : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
+# Returns False if no tool names are found, so the item is left as it was
+def highlight_tools(html, names):
 
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+    found = False
 
-    if root.tag == 'archive':
+    for tool in names:
+        pattern = re.compile(r'\b{}\b'.format(tool), re.IGNORECASE)
+        occurrences = html.find_all(string=pattern)
+        for rep in occurrences:
+            replacement = r'<span style="color: red; font-weight: bold;" data-type="tool">{}</span>'.format(tool)
+            highlighted = pattern.sub(replacement, rep)
+            highlighted_html = BeautifulSoup(highlighted, 'html.parser')
+            rep.replace_with(highlighted_html)
+            found = True
 
-        for item in root.findall(".//item[@type='5']"):
+    return found
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
-
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
+def run(SITE_ID, APP, archive = None):
+    logging.info('Highlight Sakai tools : {}'.format(SITE_ID))
 
-            for tool in APP['lessons']['highlight_names']:
-                pattern = re.compile(r'\b{}\b'.format(tool), re.IGNORECASE)
-                occurrences = html.find_all(string=pattern)
-                for rep in occurrences:
-                    replacement = r'<span style="color: red; font-weight: bold;" data-type="tool">{}</span>'.format(tool)
-                    highlighted = pattern.sub(replacement, rep)
-                    highlighted_html = BeautifulSoup(highlighted, 'html.parser')
-                    rep.replace_with(highlighted_html)
-                    item.set('html', str(html))
+    transforms = HtmlTransforms()
+    names = APP['lessons']['highlight_names']
+    transforms.dom('highlight_tools', lambda html, title: highlight_tools(html, names), well_formed=True, key=names)
 
-            tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 
 def main():
@@ -22,6 +22,7 @@ from lib.lessons import ItemType, \
         parse_youtube, generic_iframe, link_item, \
         folder_list_embed, generic_embed, youtube_embed, twitter_embed, audio_embed, \
         is_image, is_youtube, is_twitter, is_audio_video, is_url_html, is_audio_url
+from lib.snapshot import replace_file
 
 def update_item_types(APP, SITE_ID, items):
 
@@ -296,7 +297,6 @@ def run(SITE_ID, APP):
     output = r'{}{}-archive/lessonbuilder.new'.format(APP['archive_folder'], SITE_ID)
 
     xml_dest = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_backup = r'{}{}-archive/lessonbuilder.xml.orig'.format(APP['archive_folder'], SITE_ID)
 
     if APP['debug']:
         ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -336,8 +336,7 @@ def run(SITE_ID, APP):
     with open(output, 'w') as f:
         f.write(all_xml.prettify())
 
-    os.rename(xml_dest, xml_backup)
-    os.rename(output, xml_dest)
+    replace_file(output, xml_dest)
 
 
 def main():
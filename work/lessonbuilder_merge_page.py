@@ -5,7 +5,6 @@ import os
 import argparse
 import base64
 import logging
-import shutil
 from bs4 import BeautifulSoup
 from html import escape
 
@@ -18,6 +17,7 @@ import config.logging_config
 from lib.utils import remove_unwanted_characters
 from lib.lessons import ItemType, link_item
 from lib.resources import get_resource_ids
+from lib.snapshot import open_replace
 
 def run(SITE_ID, APP):
     logging.info('Merge lessons page: {}'.format(SITE_ID))
@@ -28,8 +28,6 @@ def run(SITE_ID, APP):
     content_ids = get_resource_ids(content_src)
 
     xml_src = r'{}{}-archive/lessonbuilder.xml'.format(site_folder, SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(site_folder, SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     remove_unwanted_characters(xml_src)
 
@@ -101,7 +99,7 @@ def run(SITE_ID, APP):
                     item.extract()
 
         updated_xml = soup.prettify()
-        with open(file_path, 'w') as file:
+        with open_replace(file_path, 'w') as file:
             file.write(updated_xml)
 
 
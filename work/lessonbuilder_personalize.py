@@ -7,9 +7,7 @@
 import sys
 import os
 import re
-import shutil
 import argparse
-import lxml.etree as ET
 import logging
 
 from bs4 import BeautifulSoup
@@ -19,7 +17,8 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.utils import make_well_formed
 
 REPLACE_DICT = [', {{firstname}}',
                 ', {{fullname}}',
@@ -34,51 +33,44 @@ REPLACE_DICT = [', {{firstname}}',
                 '{{firstname}}, {{lastname}}, {{fullname}}',
                 '{{firstname}}', '{{lastname}}', '{{fullname}}']
 
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, archive = None):
     logging.info('Lessons: Remove Personalization from : {}'.format(SITE_ID))
 
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
+    with site_archive(APP, SITE_ID, archive) as session:
+        lesson_tree = session.tree('lessonbuilder.xml', sanitize=True)
 
-    remove_unwanted_characters(xml_src)
+        # in name attribute
+        for item in lesson_tree.xpath(".//*[contains(@name,'firstname')]") + \
+                    lesson_tree.xpath(".//*[contains(@name,'lastname')]") + \
+                    lesson_tree.xpath(".//*[contains(@name,'fullname')]"):
+            item.set('name', re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', item.get('name')).strip())
 
-    # ET.register_namespace("sakai", "https://www.sakailms.org/")
-    # parser = ET.XMLParser(recover=True)
+            if APP['debug']:
+                print(item.get('name'))
 
-    lesson_tree = ET.parse(xml_src)
+        # in description attribute
+        for item in lesson_tree.xpath(".//*[contains(@description,'firstname')]") + \
+                    lesson_tree.xpath(".//*[contains(@description,'lastname')]") + \
+                    lesson_tree.xpath(".//*[contains(@description,'fullname')]"):
+            item.set('description', re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', item.get('description')).strip())
 
-    # in name attribute
-    for item in lesson_tree.xpath(".//*[contains(@name,'firstname')]") + \
-                lesson_tree.xpath(".//*[contains(@name,'lastname')]") + \
-                lesson_tree.xpath(".//*[contains(@name,'fullname')]"):
-        item.set('name', re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', item.get('name')).strip())
+            if APP['debug']:
+                print(item.get('description'))
 
-        if APP['debug']:
-            print(item.get('name'))
+        # let's handle the html body
+        for item in lesson_tree.xpath(".//item[@type='5' and contains(@html,'firstname')]") + \
+                    lesson_tree.xpath(".//item[@type='5' and contains(@html,'lastname')]") + \
+                    lesson_tree.xpath(".//item[@type='5' and contains(@html,'fullname')]"):
 
-    # in description attribute
-    for item in lesson_tree.xpath(".//*[contains(@description,'firstname')]") + \
-                lesson_tree.xpath(".//*[contains(@description,'lastname')]") + \
-                lesson_tree.xpath(".//*[contains(@description,'fullname')]"):
-        item.set('description', re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', item.get('description')).strip())
+            html = BeautifulSoup(item.get('html'), 'html.parser')
+            html = make_well_formed(html)
 
-        if APP['debug']:
-            print(item.get('description'))
+            new_html = re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', str(html))
 
-    # let's handle the html body
-    for item in lesson_tree.xpath(".//item[@type='5' and contains(@html,'firstname')]") + \
-                lesson_tree.xpath(".//item[@type='5' and contains(@html,'lastname')]") + \
-                lesson_tree.xpath(".//item[@type='5' and contains(@html,'fullname')]"):
+            item.set('html', str(new_html))
 
-        html = BeautifulSoup(item.get('html'), 'html.parser')
-        html = make_well_formed(html)
+        session.changed('lessonbuilder.xml')
 
-        new_html = re.sub(r"|".join(sorted(REPLACE_DICT, key = len, reverse = True)), '', str(html))
-
-        item.set('html', str(new_html))
-
-    lesson_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
     logging.info('\tDone')
 
 def main():
@@ -6,192 +6,176 @@
 import sys
 import os
 import argparse
-import shutil
-import lxml.etree as ET
 import logging
+import lxml.etree as ET
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+import lib.sanitize as sanitize
 from lib.utils import remove_unwanted_characters
-from lib.lessons import ItemType
+from lib.lessons import LessonsDocument, ItemType
 
-def update_page(page, level, max_levels):
-    page_title = page.get("title")
-    page_id = page.get("pageid")
+# Highest item sequence on a page (at least 1)
+def highest_sequence(page):
+    sequence = 1
+    for item in page.findall(".//item[@sequence]"):
+        item_sequence = int(item.get("sequence"))
+        if item_sequence > sequence:
+            sequence = item_sequence
+    return sequence
 
-    if debug:
-        print(f"Reading tree page title='{page_title}' id={page_id} level={level}")
+def get_top_parent(lessons):
+    valid_top_parents = [page for page in lessons.root.iter('page') if page.get('topparent') not in (None, '0')]
 
-    child_pages = lessonbuilder_root.xpath(f".//page[@parent='{page_id}']")
-    child_page_count = len(child_pages)
+    logging.debug(f"Top parent LEN {len(valid_top_parents)}")
 
-    if child_page_count == 0:
-        if debug:
-            print("No child pages")
-    else:
-        if debug:
-            print(f"{child_page_count} child page{'s' if child_page_count > 1 else ''}")
-
-    for child_page in child_pages:
-        update_page(child_page, level + 1, max_levels)
-        if level >= max_levels:
-            move_down(page, page_title, page_id, child_page)
-
-def move_down(page, page_title, page_id, child_page):
-    child_page_title = child_page.get("title")
-
-    if debug:
-        print("Move items from {}({}) down to {}({})".format(
-            child_page_title,
-            child_page.get("pageid"),
-            page_title,
-            page_id
-        ))
-
-    items = child_page.xpath(".//item")
-    if not items:
-        if debug:
-            print(f"No items in page {child_page_title}({child_page.get('pageid')}), ignoring page")
-        return
+    if len(valid_top_parents) == 0:
+        # so we don't have a topparent value
+        # return the first page if there is one
+        return lessons.root.find(".//page")
 
-    sequence = highest_sequence(page)
-    for item in items:
+    top_parent_id = valid_top_parents[0].get("topparent")
+    logging.debug(f"Top parent id {top_parent_id}")
 
-        item_type = item.get('type')
-        name = item.get("name")
+    return lessons.page(top_parent_id)
 
-        if debug:
-            print(f"Moving item {item.get('id')}")
+# Flatten the pages below top_page to max_levels: the items of each page deeper than that are moved to
+# its ancestor at max_levels (with new ids and sequences), and the page is removed. Each page is visited
+# once, after its sub-pages, in document order.
+# Returns the moves in the order they were made: (from page, to page, number of items)
+def reduce_levels(lessons, top_page, max_levels):
 
-        sequence += 1
-        item.set("pageId", page_id)
-        item.set("sequence", str(sequence))
-        item.set("id", str(new_item_id()))
+    last_item_id = max([1] + [int(item_id) for item_id in lessons.items])
 
-        # Change the item name for text items only
-        if item_type == ItemType.TEXT:
+    # Highest sequence on each page that items have been moved to
+    sequences = {}
+    moves = []
 
-            if name:
-                name = page_title + " - " + name
-            else:
-                name = page_title + " - " + child_page_title
+    def move_down(page, child_page):
+        nonlocal last_item_id
 
-            item.set("name", name)
+        page_title = page.get("title")
+        child_page_title = child_page.get("title")
 
-        page.append(item)
+        items = child_page.findall(".//item")
+        if not items:
+            logging.debug(f"No items in page {child_page_title}({child_page.get('pageid')}), ignoring page")
+            return
 
-    lessonbuilder_element.remove(child_page)
+        if page not in sequences:
+            sequences[page] = highest_sequence(page)
 
-def highest_sequence(page):
-    sequence = 1
-    for item in page.findall(".//item[@sequence]"):
-        item_sequence = int(item.get("sequence"))
-        if item_sequence > sequence:
-            sequence = item_sequence
-    return sequence
+        for item in items:
 
-def highest_item_id(root):
-    highest_id = 1
-    for item in root.findall(".//item[@id]"):
-        item_id = int(item.get("id"))
-        if item_id > highest_id:
-            highest_id = item_id
+            item_type = item.get('type')
+            name = item.get("name")
 
-    return highest_id
+            sequences[page] += 1
+            last_item_id += 1
 
-def new_item_id():
-    global last_item_id
-    last_item_id += 1
+            item.set("pageId", page.get("pageid"))
+            item.set("sequence", str(sequences[page]))
+            lessons.set(item, "id", str(last_item_id))
 
-    return last_item_id
+            # Change the item name for text items only
+            if item_type == ItemType.TEXT:
 
-def get_top_parent(root):
-    pages_with_top_parent = root.xpath(".//page[@topparent]")
+                if name:
+                    name = page_title + " - " + name
+                else:
+                    name = page_title + " - " + child_page_title
 
-    valid_top_parents = list(filter(lambda x: x.get('topparent') != '0', pages_with_top_parent))
+                item.set("name", name)
 
-    if debug:
-        # print(pages_with_top_parent)
-        print("Top parent LEN {}".format(len(valid_top_parents)))
+            page.append(item)
 
-    if len(valid_top_parents) == 0:
-        # so we don't have a topparent value
-        # see if we have ANY pages
-        any_page = root.xpath(".//page")
+        lessons.remove(child_page)
+        moves.append((child_page, page, len(items)))
 
-        # if any_page has pages return the first one otherwise return empty
-        return any_page[0] if any_page else None
-    else:
-        top_parent_id = valid_top_parents[0].get("topparent")
-        if debug:
-            print(f"Top parent id {top_parent_id}")
+    # (page, parent page, level, sub-pages visited)
+    stack = [(top_page, None, 1, False)]
+    seen = {top_page}
+
+    while stack:
+        (page, parent_page, level, visited) = stack.pop()
 
-        return root.xpath(f".//page[@pageid='{top_parent_id}']")[0]
+        if not visited:
+            stack.append((page, parent_page, level, True))
 
-def run(SITE_ID, APP):
-    global debug
-    debug = APP['debug'] # :p
+            child_pages = [child for child in lessons.subpages_of(page.get("pageid")) if child not in seen]
+            seen.update(child_pages)
+            logging.debug(f"Reading tree page title='{page.get('title')}' id={page.get('pageid')} level={level}: {len(child_pages)} child page(s)")
+
+            stack.extend((child, page, level + 1, False) for child in reversed(child_pages))
+
+        elif parent_page is not None and level > max_levels:
+            move_down(parent_page, page)
+
+    return moves
+
+def run(SITE_ID, APP, dry_run = False):
 
     max_levels = APP['lessons']['max_depth']
 
     logging.info(f'Lessons: Reduce depth to max {max_levels} levels : {SITE_ID}')
 
     xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
 
-    lessonbuilder_xml = ET.parse(xml_src)
-    global lessonbuilder_root # really a global variable to store the tree ?
-    lessonbuilder_root = lessonbuilder_xml.getroot()
+    if dry_run:
+        # Sanitized in memory, so that the file isn't changed
+        with open(xml_src, 'r', encoding='utf-8', newline='') as f:
+            lessons = LessonsDocument(ET.ElementTree(ET.fromstring(sanitize.ARCHIVE.text(f.read()).encode('utf-8'))))
+    else:
+        remove_unwanted_characters(xml_src)
+        lessons = LessonsDocument.parse(xml_src)
 
-    section_count = len(lessonbuilder_root.xpath(".//item[@format='section']"))
+    section_count = len(lessons.root.findall(".//item[@format='section']"))
     if section_count > 0:
         logging.warning(f"There are {section_count} section items in Lessons, exiting.")
+        return
 
-    else:
-        global lessonbuilder_element
-        lessonbuilder_list = lessonbuilder_root.xpath(".//lessonbuilder")
-
-        if len(lessonbuilder_list) > 0:
-            lessonbuilder_element = lessonbuilder_list[0]
+    if lessons.root.find(".//lessonbuilder") is None:
+        logging.info('No Lesson pages.')
+        return
 
-            global last_item_id
-            last_item_id = highest_item_id(lessonbuilder_root)
+    top_page = get_top_parent(lessons)
+    if top_page is None:
+        logging.info('No Lessons pages with topparent')
+        return
 
-            if debug:
-                print(f"last_item_id {last_item_id}")
+    moves = reduce_levels(lessons, top_page, max_levels)
 
-            top_parent_list = get_top_parent(lessonbuilder_root)
+    for (child_page, page, count) in moves:
+        message = f"\tMove {count} item(s) from {child_page.get('title')}({child_page.get('pageid')}) to {page.get('title')}({page.get('pageid')})"
+        if dry_run:
+            logging.info(message)
+        else:
+            logging.debug(message)
 
-            if debug:
-                print(f"top_parent_list {top_parent_list} {top_parent_list is not None}")
+    if dry_run:
+        logging.info(f"\tDry run: {len(moves)} page(s) would be moved")
+        return
 
-            if top_parent_list is not None:
-                update_page(top_parent_list, 1, max_levels)
-                lessonbuilder_xml.write(xml_src, encoding='utf-8', xml_declaration=True)
+    if moves:
+        lessons.write(xml_src)
 
-                logging.info('\tDone')
-            else:
-                logging.info('No Lessons pages with topparent')
-        else:
-            logging.info('No Lesson pages.')
+    logging.info(f'\tDone: {len(moves)} page(s) moved')
 
 def main():
     APP = config.config.APP
     parser = argparse.ArgumentParser(description="This script will check lessons and restructure the XML to enforce a maximum page depth",
                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("SITE_ID", help="The SITE_ID to change lessons for")
+    parser.add_argument('--dry-run', action='store_true', help="Report the pages which would be moved without changing the file")
     parser.add_argument('-d', '--debug', action='store_true')
     args = vars(parser.parse_args())
 
     APP['debug'] = APP['debug'] or args['debug']
 
-    run(args['SITE_ID'], APP)
+    run(args['SITE_ID'], APP, dry_run = args['dry_run'])
 
 if __name__ == '__main__':
     main()
@@ -7,7 +7,6 @@
 import sys
 import os
 import argparse
-import shutil
 import lxml.etree as ET
 import logging
 
@@ -19,6 +18,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.snapshot import write_tree
 
 def is_deleted(item, content_xml, site_id):
     sakai_id = item.get("sakaiid")
@@ -58,8 +58,6 @@ def run(SITE_ID, APP):
 
     content_file = r'{}{}-archive/content.xml'.format(APP['archive_folder'], SITE_ID)
     lessons_file = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    lessons_file_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(lessons_file, lessons_file_old)
 
     remove_unwanted_characters(lessons_file)
     remove_unwanted_characters(content_file)
@@ -87,7 +85,7 @@ def run(SITE_ID, APP):
     # we can handle image files in another way later on - because they are type="5" (normal html)
     # <img ... src="https://[server]/access/content/[sakaiid]">
 
-    lesson_tree.write(lessons_file, encoding='utf-8', xml_declaration=True)
+    write_tree(lesson_tree, lessons_file, encoding='utf-8', xml_declaration=True)
     logging.info('\tDone')
 
 def main():
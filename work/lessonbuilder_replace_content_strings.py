@@ -1,8 +1,6 @@
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -10,6 +8,8 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
 current = os.path.dirname(os.path.realpath(__file__))
 
@@ -19,23 +19,15 @@ def replace_with_text(replace_map, st):
         st = st.replace(key, value)
     return st
 
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, archive = None):
     logging.info('Lessons: Replace content strings with strings set in config : {}'.format(SITE_ID))
 
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
+    transforms = HtmlTransforms()
+    replace_map = APP['lessons']['replace_strings']
+    transforms.text('replace_content_strings', lambda html: replace_with_text(replace_map, html), key=replace_map)
 
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
-
-    if root.tag == 'archive':
-        for item in root.findall(".//item[@type='5']"):
-            # pass the html here
-            new_content = replace_with_text(APP['lessons']['replace_strings'], item.attrib['html'])
-            item.set('html', new_content)
-
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms)
 
 def main():
     APP = config.config.APP
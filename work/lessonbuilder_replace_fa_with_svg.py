@@ -5,19 +5,17 @@
 
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
 shared_path = '/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/'
 
@@ -32,58 +30,40 @@ def replace_with_img(html, path, img, _cls = None):
 
         icon.replace_with(new_span)
 
-def run(SITE_ID, APP):
-    logging.info('Lessons: Replace fa icons with SVG : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    remove_unwanted_characters(xml_src)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+def replace_fa_with_svg(html, title):
 
-    if root.tag == 'archive':
-        for item in root.findall(".//item[@type='5']"):
+    # headings
+    replace_with_img(html, 'h2 span[class="fa fa-bullseye fa-fw"]', 'icon_learning_outcomes.svg')
+    replace_with_img(html, 'h2 span[class="fa fa-fw fa-key"]', 'icon_key_information.svg')
+    replace_with_img(html, 'h2 span[class="fa fa-check-square fa-fw"]', 'icon_key_activities.svg')
 
-            title = None
-            parent = root.findall('.//item[@id="{}"]...'.format(item.attrib['id']))
-            if len(parent) > 0:
-                title = parent[0].attrib['title']
+    replace_with_img(html, 'h2 span[class="fa fa-book"]', 'icon_reading.svg')
+    replace_with_img(html, 'h3 span[class="fa fa-book"]', 'icon_reading.svg')
 
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-            html = make_well_formed(html, title)
+    replace_with_img(html, 'h2 span[class="fa fa-play-circle"]', 'icon_video.svg')
+    replace_with_img(html, 'h3 span[class="fa fa-play-circle"]', 'icon_video.svg')
 
-            # headings
-            replace_with_img(html, 'h2 span[class="fa fa-bullseye fa-fw"]', 'icon_learning_outcomes.svg')
-            replace_with_img(html, 'h2 span[class="fa fa-fw fa-key"]', 'icon_key_information.svg')
-            replace_with_img(html, 'h2 span[class="fa fa-check-square fa-fw"]', 'icon_key_activities.svg')
+    replace_with_img(html, 'h2[class!="sectionheader"] span[class="fas fa-file-alt"]', 'icon_assignment.svg')
+    replace_with_img(html, 'h3 span[class="fa fa-file-text"]', 'icon_assignment.svg')
 
-            replace_with_img(html, 'h2 span[class="fa fa-book"]', 'icon_reading.svg')
-            replace_with_img(html, 'h3 span[class="fa fa-book"]', 'icon_reading.svg')
+    replace_with_img(html, 'h2 span[class="fa fa-comments"]', 'icon_discussion.svg')
+    replace_with_img(html, 'h3 span[class="fa fa-comments"]', 'icon_discussion.svg')
 
-            replace_with_img(html, 'h2 span[class="fa fa-play-circle"]', 'icon_video.svg')
-            replace_with_img(html, 'h3 span[class="fa fa-play-circle"]', 'icon_video.svg')
+    # alerts
+    replace_with_img(html, 'div[class*="alert"] div span[class*="fa-lightbulb"]', 'icon_lightbulb.svg', 'lightbulb')
+    replace_with_img(html, 'div[class*="alert"] div span[class*="fa-star"]', 'icon_star.svg', 'star')
 
-            replace_with_img(html, 'h2[class!="sectionheader"] span[class="fas fa-file-alt"]', 'icon_assignment.svg')
-            replace_with_img(html, 'h3 span[class="fa fa-file-text"]', 'icon_assignment.svg')
+    # panel
+    replace_with_img(html, 'div[class*="panel"] div span[class*="fa-exclamation-triangle"]', 'icon_warning.svg')
 
-            replace_with_img(html, 'h2 span[class="fa fa-comments"]', 'icon_discussion.svg')
-            replace_with_img(html, 'h3 span[class="fa fa-comments"]', 'icon_discussion.svg')
-
-            # alerts
-            replace_with_img(html, 'div[class*="alert"] div span[class*="fa-lightbulb"]', 'icon_lightbulb.svg', 'lightbulb')
-            replace_with_img(html, 'div[class*="alert"] div span[class*="fa-star"]', 'icon_star.svg', 'star')
-
-            # panel
-            replace_with_img(html, 'div[class*="panel"] div span[class*="fa-exclamation-triangle"]', 'icon_warning.svg')
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Replace fa icons with SVG : {}'.format(SITE_ID))
 
-            # write_test_case(html, item.attrib['id'])
-            item.set('html', str(html))
-            # print(ET.tostring(item))
+    transforms = HtmlTransforms()
+    transforms.dom('replace_fa_with_svg', replace_fa_with_svg, well_formed=True)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
 def main():
     APP = config.config.APP
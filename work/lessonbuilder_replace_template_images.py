@@ -6,7 +6,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import xml.etree.ElementTree as ET
 import logging
@@ -19,13 +18,12 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters, make_well_formed
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Lessons: Replace Template images in : {}'.format(SITE_ID))
 
     xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     remove_unwanted_characters(xml_src)
 
@@ -45,7 +43,7 @@ def run(SITE_ID, APP):
             item.set('html', str(html))
             # print(ET.tostring(item))
 
-        tree.write(xml_src)
+        write_tree(tree, xml_src)
 
 def main():
     APP = config.config.APP
@@ -6,7 +6,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import xml.etree.ElementTree as ET
 import logging
@@ -17,13 +16,12 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters, replace_wiris
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Lessons: Replace wiris in : {}'.format(SITE_ID))
 
     xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     remove_unwanted_characters(xml_src)
 
@@ -35,7 +33,7 @@ def run(SITE_ID, APP):
         for item in root.findall(".//item[@type='5']"):
             item.set('html', replace_wiris(item.attrib['html']))
 
-        tree.write(xml_src)
+        write_tree(tree, xml_src)
 
 def main():
     APP = config.config.APP
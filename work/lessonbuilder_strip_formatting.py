@@ -6,57 +6,39 @@
 import json
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
-import cssutils
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import remove_unwanted_characters
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
+from lib.styles import remove_style_properties
 
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, archive = None):
 
     with open(APP['lessons']['styles']) as json_file:
         config = json.load(json_file)
 
-        logging.info('Lessons: Strip custom formatting : {}'.format(SITE_ID))
+    logging.info('Lessons: Strip custom formatting : {}'.format(SITE_ID))
 
-        xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-        xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-        shutil.copyfile(xml_src, xml_old)
+    tags_to_search = config["general"]['tags.to.search']
+    bad_attr = config["general"]["bad.attr"]
 
-        remove_unwanted_characters(xml_src)
+    def strip_formatting(html_soup, title):
+        for tag in html_soup.find_all(tags_to_search, style=lambda value: value and any(v in value for v in bad_attr)):
+            remove_style_properties(tag, bad_attr)
 
-        tree = ET.parse(xml_src)
-        root = tree.getroot()
+    transforms = HtmlTransforms()
+    transforms.dom('strip_formatting', strip_formatting, key=[tags_to_search, bad_attr])
 
-        if root.tag == 'archive':
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms, sanitize=True)
 
-            for item in root.findall(".//item[@type='5']"):
-                html_soup = BeautifulSoup(item.attrib['html'], 'html.parser')
-                tags_to_search = config["general"]['tags.to.search']
-                bad_attr = config["general"]["bad.attr"]
-                for tag in html_soup.find_all(tags_to_search, style=lambda value: value and any(v in value for v in bad_attr)):
-                    style = cssutils.parseStyle(tag['style'])
-                    for attr in bad_attr:
-                        style.removeProperty(attr)
-
-                    if style.length > 0:
-                        tag['style'] = style.cssText
-                    else:
-                        del tag['style']
-
-                item.set('html', str(html_soup))
-
-            tree.write(xml_src, encoding='utf-8', xml_declaration=True)
-
-        logging.info('\tDone')
+    logging.info('\tDone')
 
 
 def main():
@@ -1,40 +1,30 @@
 import sys
 import os
-import shutil
 import argparse
-import xml.etree.ElementTree as ET
 import logging
 
-from bs4 import BeautifulSoup
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.archive import site_archive
+from lib.htmltransforms import HtmlTransforms
 
-def run(SITE_ID, APP):
-    logging.info('Lessons: Update links add target = _blank for links without target attribute : {}'.format(SITE_ID))
-
-    xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
-
-    tree = ET.parse(xml_src)
-    root = tree.getroot()
+# Add target = _blank to links without a target attribute
+def update_links_attr(html, title):
+    for link in html.find_all('a', target=False):
+        link['target'] = '_blank'
 
-    if root.tag == 'archive':
-        for item in root.findall(".//item[@type='5']"):
-
-            # pass the html here
-            html = BeautifulSoup(item.attrib['html'], 'html.parser')
-
-            for link in html.find_all('a', target=False):
-                link['target'] = '_blank'
+def run(SITE_ID, APP, archive = None):
+    logging.info('Lessons: Update links add target = _blank for links without target attribute : {}'.format(SITE_ID))
 
-            item.set('html', str(html))
+    transforms = HtmlTransforms()
+    transforms.dom('update_links_attr', update_links_attr)
 
-        tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.transform_lessons(transforms)
 
 def main():
     APP = config.config.APP
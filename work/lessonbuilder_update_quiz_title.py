@@ -4,7 +4,6 @@ import sys
 import os
 import argparse
 import xml.etree.ElementTree as ET
-import shutil
 import logging
 
 current = os.path.dirname(os.path.realpath(__file__))
@@ -14,13 +13,12 @@ sys.path.append(parent)
 import config.config
 import config.logging_config
 from lib.utils import remove_unwanted_characters
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Lessons: Updating quiz title : {}'.format(SITE_ID))
 
     xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     remove_unwanted_characters(xml_src)
 
@@ -40,7 +38,7 @@ def run(SITE_ID, APP):
                     new_quiz_name = "Question {}".format(i + 1)
                     question.set("name", new_quiz_name)
 
-        tree.write(xml_src, encoding="UTF-8", xml_declaration=True)
+        write_tree(tree, xml_src, encoding="UTF-8", xml_declaration=True)
 
     except Exception as e:
         print(e)
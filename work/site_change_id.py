@@ -16,8 +16,10 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.archive import site_archive
+from lib.textrules import TextRules
 
-def run(SITE_ID, APP, new_id):
+def run(SITE_ID, APP, new_id, archive = None):
     logging.info('Site: Changing site ID to: {}'.format(new_id))
 
     if APP['debug']:
@@ -36,30 +38,13 @@ def run(SITE_ID, APP, new_id):
 
         # we have not run this script before - the site id is intact
         if root.attrs['site'] == SITE_ID:
-            # root.attrs['site'] = new_id
+            # Replace the site id in all the XML files, including qti/, with the rules from
+            # any other steps in the same archive session
+            rules = TextRules()
+            rules.literal('site_id', SITE_ID, new_id)
 
-            # with open(f"{xml_src}", 'w', encoding = 'utf-8') as file:
-            #     file.write(str(tree))
-
-            xml_folder = "{}{}-archive/".format(APP['archive_folder'], SITE_ID)
-            qti_folder = "{}{}-archive/qti/".format(APP['archive_folder'], SITE_ID)
-
-            archive_files = [entry for entry in os.scandir(xml_folder) if entry.name.endswith('.xml')]
-            qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-
-            xml_files = archive_files + qti_files
-
-            for file in xml_files:
-                if APP['debug']:
-                    print(file.path)
-
-                with open(f'{file.path}', 'r+', encoding='utf8') as f:
-                    # read and replace content
-                    content = f.read().replace(SITE_ID, new_id)
-                    # reset file cursor and write to file
-                    f.seek(0)
-                    f.write(content)
-                    f.truncate()
+            with site_archive(APP, SITE_ID, archive) as session:
+                session.rewrite_text(rules)
 
     if APP['debug']:
         print("all done")
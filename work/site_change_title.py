@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import logging
 
@@ -17,6 +16,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.snapshot import open_replace
 
 def run(SITE_ID, APP, now_st = None):
 
@@ -30,8 +30,6 @@ def run(SITE_ID, APP, now_st = None):
     logging.info('Site: Add title prefix to: {} {}'.format(SITE_ID, now_st))
 
     xml_src = r'{}{}-archive/site.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/site.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     with open(xml_src, 'r', encoding='utf8') as f:
         contents = f.read()
@@ -48,7 +46,7 @@ def run(SITE_ID, APP, now_st = None):
             site.attrs['title'] = "{}{} [{}]".format(APP['site']['prefix'], site.attrs['title'], now_st)
             site.attrs['original-title'] = original_title
 
-            with open(f"{xml_src}", 'w', encoding = 'utf-8') as file:
+            with open_replace(xml_src, 'w', encoding = 'utf-8') as file:
                 file.write(str(tree))
 
     return True
@@ -15,8 +15,10 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.archive import site_archive
+from lib.textrules import TextRules
 
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, archive = None):
     logging.info('Site: Updating Emoji\'s path: {}'.format(SITE_ID))
     sakai_url = APP['sakai_url']
 
@@ -31,22 +33,14 @@ def run(SITE_ID, APP):
         if APP['debug']:
             print("{} run: {}".format(root.attrs['site'], root.attrs['site'] == SITE_ID))
 
-        xml_folder = "{}{}-archive/".format(APP['archive_folder'], SITE_ID)
-        xml_files = [entry for entry in os.scandir(xml_folder) if entry.name.endswith('.xml')] + \
-                        [entry for entry in os.scandir(f"{xml_folder}/qti") if entry.name.endswith('.xml')]
-
-        for file in xml_files:
-            if APP['debug']:
-                print(file.path)
-
-            with open(f'{file.path}', 'r+', encoding='utf8') as f:
-                # read and replace content
-                content = f.read().replace('/library/editor/ckeditor/plugins/smiley/images/', '/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/smiley/')
-                content = content.replace(f'{sakai_url}/shared/','/shared/')
-                # reset file cursor and write to file
-                f.seek(0)
-                f.write(content)
-                f.truncate()
+        rules = TextRules()
+        rules.literal('smiley', '/library/editor/ckeditor/plugins/smiley/images/', '/shared/HTML-Template-Library/HTML-Templates-V4/_assets/img/smiley/')
+        rules.literal('shared', f'{sakai_url}/shared/','/shared/')
+
+        # Applied to all the XML files, with the rules from any following steps in the same archive session
+        with site_archive(APP, SITE_ID, archive) as session:
+            session.rewrite_text(rules)
+
     return True
 
 def main():
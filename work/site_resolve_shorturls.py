@@ -15,63 +15,42 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import resolve_redirect
+from lib.archive import site_archive
+from lib.textrules import TextRules
 
-def run(SITE_ID, APP):
+def run(SITE_ID, APP, archive = None):
     logging.info('Site: Resolving shortened URLs : {}'.format(SITE_ID))
 
-    xml_folder = "{}{}-archive/".format(APP['archive_folder'], SITE_ID)
-    qti_folder = "{}{}-archive/qti/".format(APP['archive_folder'], SITE_ID)
-
-    archive_files = [entry for entry in os.scandir(xml_folder) if entry.name.endswith('.xml')]
-    qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
-
-    xml_files = archive_files + qti_files
-
     shorturl_prefix = f"{APP['sakai_url']}/x/"
 
     # print(f"Resolving prefixes: {shorturl_prefix}")
 
-    for file in xml_files:
-        if APP['debug']:
-            print(file.path)
-
-        with open(f'{file.path}', 'r+', encoding='utf8') as f:
-            # read and replace content
-            content = f.read()
-
-            if shorturl_prefix in content:
-                print(f"Updating short URLs in {file.name}")
-                # reset file cursor and write to file
-                f.seek(0)
-                f.write(replace_urls(shorturl_prefix, content))
-                f.truncate()
+    # Each short URL is resolved once, and the XML files are rewritten with the rules from any following
+    # steps in the same archive session
+    with site_archive(APP, SITE_ID, archive) as session:
+        session.rewrite_text(shorturl_rules(shorturl_prefix))
 
     if APP['debug']:
         print("all done")
 
     return True
 
-def replace_urls(shorturl_prefix, content):
-
-    re_pattern = shorturl_prefix.replace("/","\\/") + "[A-Za-z]{6}"
-    print(f"pattern: {re_pattern}")
-    shorturls = re.findall(re_pattern, content)
-
-    replacements = {}
+def shorturl_rules(shorturl_prefix):
 
-    for url in shorturls:
-        # print(f"Found shorturl: {url}")
+    def resolve(url):
         resolved_url = resolve_redirect(url)
         if resolved_url:
-            replacements[url] = resolved_url
+            print(f"Replacing {url} with {resolved_url}")
 
-    # print(f"Replacements: {replacements}")
+        return resolved_url
 
-    for shorturl in replacements.keys():
-        print(f"Replacing {shorturl} with {replacements[shorturl]}")
-        content = content.replace(shorturl, replacements[shorturl])
+    rules = TextRules()
+    rules.resolve('shorturl', re.escape(shorturl_prefix) + "[A-Za-z]{6}", resolve)
 
-    return content
+    return rules
+
+def replace_urls(shorturl_prefix, content):
+    return shorturl_rules(shorturl_prefix).apply_text(content)
 
 def main():
     APP = config.config.APP
@@ -8,7 +8,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import base64
@@ -25,6 +24,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import make_well_formed
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
     logging.info('Syllabus: rewrite into one page: {}'.format(SITE_ID))
@@ -61,14 +61,10 @@ def run(SITE_ID, APP):
 
         # Update attachment.xml if needed
         if have_attachments:
-            attachment_old = r'{}{}-archive/attachment.old'.format(APP['archive_folder'], SITE_ID)
-            shutil.copyfile(attachment_src, attachment_old)
-            attachment_tree.write(attachment_src, xml_declaration=True)
+            write_tree(attachment_tree, attachment_src, xml_declaration=True)
 
     # Now rewrite the Syllabus file
     xml_src = r'{}{}-archive/syllabus.xml'.format(APP['archive_folder'], SITE_ID)
-    xml_old = r'{}{}-archive/syllabus.old'.format(APP['archive_folder'], SITE_ID)
-    shutil.copyfile(xml_src, xml_old)
 
     tree = ET.parse(xml_src)
     root = tree.getroot()
@@ -132,7 +128,7 @@ def run(SITE_ID, APP):
 
     # Write the modified XML to a new file
     logging.info(f'Site {SITE_ID} syllabus data has been updated.')
-    tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+    write_tree(tree, xml_src, encoding='utf-8', xml_declaration=True)
 
 def main():
     APP = config.config.APP
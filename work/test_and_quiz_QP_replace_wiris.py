@@ -16,6 +16,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters, replace_wiris
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
 
@@ -41,7 +42,7 @@ def run(SITE_ID, APP):
                 if item.text.find('data-mathml') > 0:
                     item.text = ET.CDATA(replace_wiris(item.text.replace("<![CDATA[", "").replace("]]>", "")))
 
-        tree.write(xml_src)
+        write_tree(tree, xml_src)
 
 def main():
     APP = config.config.APP
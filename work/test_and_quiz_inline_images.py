@@ -18,7 +18,8 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.resources import get_resource_ids, move_attachments, rename_attachments
+from lib.resources import get_resource_ids, content_batch
+from lib.snapshot import write_tree
 
 def fix_inline(APP, SITE_ID, content_ids, attachment_ids, collection, move_list, rename_list, xml_src):
 
@@ -116,7 +117,7 @@ def fix_inline(APP, SITE_ID, content_ids, attachment_ids, collection, move_list,
 
     if update_file:
         print(f"Fixing inline media: {xml_src}")
-        tree.write(xml_src)
+        write_tree(tree, xml_src)
 
     return
 
@@ -145,13 +146,16 @@ def run(SITE_ID, APP):
     if os.path.exists(qp):
         fix_inline(APP, SITE_ID, content_ids, attachment_ids, collection, move_list, rename_list, qp)
 
-    if len(move_list):
-        print(f"\nMoving attachments to {collection}:\n{move_list}")
-        move_attachments(SITE_ID, site_folder, collection, move_list)
+    # attachment.xml is written once for the moves and renames
+    with content_batch(site_folder) as batch:
 
-    if len(rename_list):
-        print(f"\nRenaming attachments for {collection}:\n{rename_list}")
-        rename_attachments(SITE_ID, site_folder, collection, rename_list)
+        if len(move_list):
+            print(f"\nMoving attachments to {collection}:\n{move_list}")
+            batch.move_attachments(SITE_ID, collection, move_list)
+
+        if len(rename_list):
+            print(f"\nRenaming attachments for {collection}:\n{rename_list}")
+            batch.rename_attachments(SITE_ID, collection, rename_list)
 
 
 def main():
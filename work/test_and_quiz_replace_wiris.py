@@ -16,6 +16,7 @@ sys.path.append(parent)
 
 import config.logging_config
 from lib.utils import remove_unwanted_characters, replace_wiris
+from lib.snapshot import write_tree
 
 def work_on_TQ(xml_src):
 
@@ -35,7 +36,7 @@ def work_on_TQ(xml_src):
                     if item.text.find('data-mathml') > 0:
                         item.text = ET.CDATA(replace_wiris(item.text))
 
-            tree.write(xml_src)
+            write_tree(tree, xml_src)
     except Exception as e:
         raise Exception(f'{xml_src} : {e}')
 
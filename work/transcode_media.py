@@ -5,7 +5,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import lxml.etree as ET
 import base64
@@ -18,8 +17,10 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
-from lib.utils import read_yaml, rewrite_tool_ref, get_size
+from lib.utils import read_yaml, get_size
+from lib.rewrite import RefRewriter
 from lib.ffprobe_uct import FFProbe_UCT
+from lib.snapshot import write_tree, replace_file
 
 def transcode(src_path):
 
@@ -39,7 +40,7 @@ def transcode(src_path):
         os.system(ffmpeg_cmd)
 
         if os.path.exists(dest_path):
-            shutil.move(dest_path, src_path)
+            replace_file(dest_path, src_path)
             return ("audio/mp4", "m4a")
         else:
             raise Exception(f"Transcoding failed: {ffmpeg_cmd}")
@@ -52,7 +53,7 @@ def transcode(src_path):
         os.system(ffmpeg_cmd)
 
         if os.path.exists(dest_path):
-            shutil.move(dest_path, src_path)
+            replace_file(dest_path, src_path)
             return ("video/mp4", "mp4")
         else:
             raise Exception(f"Transcoding failed: {ffmpeg_cmd}")
@@ -70,6 +71,7 @@ def check_resources(src_folder, restricted_ext, paths_map, collection):
     supported_video = restricted_ext['SUPPORTED_VIDEO']
 
     rewrite = False
+    refs = RefRewriter()
 
     parser = ET.XMLParser(recover=True)
     content_tree = ET.parse(xml_src, parser)
@@ -134,19 +136,18 @@ def check_resources(src_folder, restricted_ext, paths_map, collection):
                     continue
 
                 tool_xml_files = [entry for entry in os.scandir(src_folder) if entry.name.endswith('.xml')]
-                for toolxml in tool_xml_files:
+                tool_xml_files = [entry for entry in tool_xml_files if entry.name not in ["archive.xml", "site.xml", "content.xml", "attachment.xml", "user.xml"]]
 
-                    if (toolxml.name in ["archive.xml", "site.xml", "content.xml", "attachment.xml", "user.xml"]):
-                        continue
+                refs.add(tool_xml_files, src_id, new_id)
 
-                    if rewrite_tool_ref(toolxml, src_id, new_id):
-                        logging.info(f"Fixed path {src_id} in {toolxml.name}")
+    # Update the references to transcoded items, each file once
+    for (path, found) in refs.rewrite().items():
+        for ref in found:
+            logging.info(f"Fixed path {ref} in {os.path.basename(path)}")
 
     if rewrite:
         # Update file
-        xml_old = xml_src.replace(".xml",".old")
-        shutil.copyfile(xml_src, xml_old)
-        content_tree.write(xml_src, encoding='utf-8', xml_declaration=True)
+        write_tree(content_tree, xml_src, encoding='utf-8', xml_declaration=True)
 
     return True
 
@@ -13,17 +13,16 @@ sys.path.append(parent)
 import config.logging_config
 from lib.utils import get_site_creator, get_user_by_email
 from lib.d2l import get_imported_content, update_content_owner, get_brightspace_user
-from lib.resources import get_resource_ids, get_content_owner
+from lib.resources import ContentIndex, get_content_owner
 
-def find_resource_owner(site_folder, content_ids, filename):
+def find_resource_owner(site_folder, content, filename):
 
     # There could be multiple videos with the same filename in different parts of the content tree,
     # owned by different users. We only use the first match here.
-    for sakai_id in content_ids:
-        if sakai_id.endswith("/" + filename):
-            owner_info = get_content_owner(site_folder, sakai_id)
-            if owner_info:
-                return owner_info[1]
+    for el in content.find_filename(filename):
+        owner_info = get_content_owner(site_folder, el.get('id'))
+        if owner_info:
+            return owner_info[1]
 
     return None
 
@@ -57,8 +56,7 @@ def run(SITE_ID, APP, import_id, started_by):
         logging.warning("- no default owner id is available")
 
     # Get the set of files from the Sakai site
-    content_src = f'{site_folder}/content.xml'
-    content_ids = get_resource_ids(content_src)
+    content = ContentIndex.load(f'{site_folder}/content.xml')
 
     # Get the content items from the Brightspace Content Service
     content_items = get_imported_content(APP, import_id)
@@ -69,7 +67,7 @@ def run(SITE_ID, APP, import_id, started_by):
 
         content_name = content_items[content_id]
         resource_owner_id = None
-        resource_owner_eid = find_resource_owner(site_folder, content_ids, content_name)
+        resource_owner_eid = find_resource_owner(site_folder, content, content_name)
         if resource_owner_eid:
             resource_owner_user = get_brightspace_user(APP, resource_owner_eid)
             if resource_owner_user:
@@ -4,7 +4,6 @@
 
 import sys
 import os
-import shutil
 import argparse
 import xml.etree.ElementTree as ET
 import logging
@@ -14,17 +13,16 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 import config.logging_config
+from lib.snapshot import write_tree
 
 def run(SITE_ID, APP):
 
         logging.info('XML rewrite test : {}'.format(SITE_ID))
 
         xml_src = r'{}{}-archive/lessonbuilder.xml'.format(APP['archive_folder'], SITE_ID)
-        xml_old = r'{}{}-archive/lessonbuilder.old'.format(APP['archive_folder'], SITE_ID)
-        shutil.copyfile(xml_src, xml_old)
 
         tree = ET.parse(xml_src)
-        tree.write(xml_src, xml_declaration=True)
+        write_tree(tree, xml_src, xml_declaration=True)
 
         logging.info('\tDone')
 
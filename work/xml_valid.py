@@ -1,15 +1,21 @@
 #!/usr/bin/python3
 
-## This script takes as input the 'lessonbuilder.xml' file inside the site-archive folder
-## and adds a default banner to the body if it doesn't exist yet
-## REF: AMA-85
+## This script checks that all the XML files in the site archive (including qti/) can be parsed.
+## Files are checked in parallel, and files which were valid the last time the step ran for the
+## site (log/<site_id>_xml_valid.json) and haven't changed since are not checked again.
 
 import sys
+import io
 import os
+import json
+import hashlib
 import argparse
+import multiprocessing
 import xml.etree.ElementTree as ET
 import logging
 
+from concurrent.futures import ProcessPoolExecutor
+
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
@@ -17,6 +23,47 @@ sys.path.append(parent)
 import config.config
 import config.logging_config
 
+# Use a process pool when there is at least this much to check
+POOL_MIN_BYTES = 32 * 1024 * 1024
+
+# Check one file: returns (sha1, error message or None).
+# If the file still has the hash it had when it was last found valid (known_sha), it isn't parsed again.
+# Without full_parse, the file is parsed the same way by ElementTree, but each element is discarded once
+# it has been read rather than building the whole tree.
+def check_file(path, known_sha = None, full_parse = False):
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sha = hashlib.sha1(data).hexdigest()
+    if sha == known_sha:
+        return (sha, None)
+
+    try:
+        if full_parse:
+            ET.fromstring(data)
+        else:
+            for (event, el) in ET.iterparse(io.BytesIO(data)):
+                el.clear()
+    except ET.ParseError as e:
+        return (sha, str(e))
+
+    return (sha, None)
+
+def load_record(record_file):
+    try:
+        with open(record_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_record(record_file, record):
+    try:
+        with open(record_file, 'w') as f:
+            json.dump(record, f)
+    except OSError as e:
+        logging.warning(f"Could not save {record_file}: {e}")
+
 def run(SITE_ID, APP):
     logging.info('XML: Parseable : {}'.format(SITE_ID))
 
@@ -27,22 +74,65 @@ def run(SITE_ID, APP):
     qti_files = [entry for entry in os.scandir(qti_folder) if entry.name.endswith('.xml')]
     xml_files = archive_files + qti_files
 
+    full_parse = APP['xml_valid']['full_parse']
+    workers = APP['xml_valid']['workers']
+
+    # name: {size, mtime, sha1, valid} from the last run
+    record_file = os.path.join(APP['log_folder'], f'{SITE_ID}_xml_valid.json')
+    record = load_record(record_file)
+
+    checks = {}
+    new_record = {}
     for xml_file in xml_files:
-        try:
-            ET.parse(xml_file)
-        except Exception as e:
-            logging.error(f"Parse error for {xml_file.name}: {str(e)}")
-            raise e
+        name = os.path.relpath(xml_file.path, xml_folder)
+        stat = xml_file.stat()
+        last = record.get(name, {})
+
+        if last.get('valid') and last.get('size') == stat.st_size and last.get('mtime') == stat.st_mtime_ns:
+            new_record[name] = last
+        else:
+            known_sha = last.get('sha1') if last.get('valid') else None
+            checks[name] = (xml_file.path, known_sha, full_parse, stat)
+
+    check_bytes = sum(stat.st_size for (_, _, _, stat) in checks.values())
+    logging.info(f"\tChecking {len(checks)} of {len(xml_files)} file(s), {check_bytes} bytes")
+
+    args = [check[:3] for check in checks.values()]
+    workers = min(workers, len(checks), os.cpu_count() or 1)
+
+    if workers > 1 and check_bytes >= POOL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(check_file, *zip(*args), chunksize=max(1, len(args) // (workers * 4))))
+    else:
+        results = [check_file(*arg) for arg in args]
+
+    errors = []
+    for (name, (sha, error)) in zip(checks, results):
+        stat = checks[name][3]
+        new_record[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': sha, 'valid': error is None}
+
+        if error is not None:
+            logging.error(f"Parse error for {os.path.basename(name)}: {error}")
+            errors.append((name, error))
+
+    save_record(record_file, new_record)
+
+    if errors:
+        (name, error) = errors[0]
+        raise Exception(f"Parse error for {os.path.basename(name)}: {error}")
 
 def main():
     APP = config.config.APP
-    parser = argparse.ArgumentParser(description="This script takes as input the 'lessonbuilder.xml' file inside the site-archive folder and adds a default banner to the body if it doesn't exist yet",
+    parser = argparse.ArgumentParser(description="This script checks that all the XML files in the site archive can be parsed",
                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("SITE_ID", help="The SITE_ID on which to work")
+    parser.add_argument('-f', '--full', action='store_true', help="Build the full tree for each file instead of only checking it is well-formed")
     parser.add_argument('-d', '--debug', action='store_true')
     args = vars(parser.parse_args())
 
     APP['debug'] = APP['debug'] or args['debug']
+    if args['full']:
+        APP['xml_valid']['full_parse'] = True
 
     run(args['SITE_ID'], APP)
 